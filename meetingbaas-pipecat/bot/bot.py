@@ -3,27 +3,16 @@ import os
 import sys
 from loguru import logger
 from dotenv import load_dotenv
-from pipecat.audio.vad.silero import SileroVADAnalyzer
-from pipecat.frames.frames import LLMMessagesFrame
-from pipecat.pipeline.pipeline import Pipeline
-from pipecat.pipeline.runner import PipelineRunner
-from pipecat.pipeline.task import PipelineParams, PipelineTask
-from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
-from pipecat.services.cartesia import CartesiaTTSService
-from pipecat.services.deepgram import DeepgramSTTService
-from pipecat.services.openai import OpenAILLMService
-from pipecat.transports.network.websocket_server import (
-  WebsocketServerParams,
-  WebsocketServerTransport,
-)
-
-from openai.types.chat import ChatCompletionToolParam
 
 from .runner import configure
-
-import aiohttp
-from datetime import datetime
-import pytz
+from .startup import (
+  StartupProfile,
+  WebsocketPreconnector,
+  cartesia_websocket_url,
+  preload,
+  warm_openai,
+  warm_vad,
+)
 
 load_dotenv(override=True)
 
@@ -31,150 +20,142 @@ logger.remove(0)
 logger.add(sys.stderr, level="DEBUG")
 
 
-async def get_weather(
-  function_name, tool_call_id, arguments, llm, context, result_callback
-):
-  location = arguments["location"]
-  format = arguments["format"]  # Default to Celsius if not specified
-  unit = (
-    "m" if format == "celsius" else "u"
-  )  # "m" for metric, "u" for imperial in wttr.in
-
-  url = f"https://wttr.in/{location}?format=%t+%C&{unit}"
-
-  async with aiohttp.ClientSession() as session:
-    async with session.get(url) as response:
-      if response.status == 200:
-        weather_data = await response.text()
-        await result_callback(
-          f"The weather in {location} is currently {weather_data} ({format.capitalize()})."
-        )
-      else:
-        await result_callback(f"Failed to fetch the weather data for {location}.")
-
-
-async def get_time(
-  function_name, tool_call_id, arguments, llm, context, result_callback
-):
-  location = arguments["location"]
-
-  # Set timezone based on the provided location
-  try:
-    timezone = pytz.timezone(location)
-    current_time = datetime.now(timezone)
-    formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S")
-    await result_callback(f"The current time in {location} is {formatted_time}.")
-  except pytz.UnknownTimeZoneError:
-    await result_callback(
-      f"Invalid location specified. Could not determine time for {location}."
-    )
-
-
 async def main():
-  (host, port, system_prompt, voice_id, args) = await configure()
-
-  transport = WebsocketServerTransport(
-    host=host,
-    port=port,
-    params=WebsocketServerParams(
-      audio_out_sample_rate=16000,
-      audio_out_enabled=True,
-      add_wav_header=False,
-      vad_enabled=True,
-      vad_analyzer=SileroVADAnalyzer(),
-      vad_audio_passthrough=True,
-    ),
-  )
-
-  llm = OpenAILLMService(api_key=os.getenv("OPENAI_API_KEY"), model="gpt-4o-mini")
-  llm.register_function("get_weather", get_weather)
-  llm.register_function("get_time", get_time)
-
-  tools = [
-    ChatCompletionToolParam(
-      type="function",
-      function={
-        "name": "get_weather",
-        "description": "Get the current weather",
-        "parameters": {
-          "type": "object",
-          "properties": {
-            "location": {
-              "type": "string",
-              "description": "The city and state, e.g. San Francisco, CA",
-            },
-            "format": {
-              "type": "string",
-              "enum": ["celsius", "fahrenheit"],
-              "description": "The temperature unit to use. Infer this from the users location.",
-            },
-          },
-          "required": ["location", "format"],
-        },
-      },
-    ),
-    ChatCompletionToolParam(
-      type="function",
-      function={
-        "name": "get_time",
-        "description": "Get the current time for a specific location",
-        "parameters": {
-          "type": "object",
-          "properties": {
-            "location": {
-              "type": "string",
-              "description": "The location for which to retrieve the current time (e.g., 'Asia/Kolkata', 'America/New_York')",
-            },
-          },
-          "required": ["location"],
-        },
-      },
-    ),
-  ]
-
-  stt = DeepgramSTTService(
-    api_key=os.getenv("DEEPGRAM_API_KEY"), encoding="linear16", sample_rate=16000
+  profile = StartupProfile()
+  with profile.phase("configure"):
+    (host, port, system_prompt, voice_id, args) = await configure()
+
+  # Opened while the modules load, so that the first meeting can take it
+  preconnector = None
+  cartesia_url = cartesia_websocket_url(os.getenv("CARTESIA_API_KEY"))
+  if args.preconnect:
+    preconnector = WebsocketPreconnector(args.preconnect)
+    preconnector.keep(cartesia_url)
+
+  with profile.phase("imports"):
+    await asyncio.to_thread(preload, profile, __package__)
+
+  # Already loaded by preload()
+  from pipecat.pipeline.runner import PipelineRunner
+
+  from ..prometheus import serve_metrics
+  from .pipeline import create_task, create_transport_params
+  from .server import BotServer
+  from .timezones import timezone_index
+  from .tools import runtime as tool_runtime
+  from .tracing import TraceStats
+  from .transport import (
+    InterruptibleWebsocketServerTransport,
+    WebsocketSessionTransport,
   )
-
-  tts = CartesiaTTSService(
-    api_key=os.getenv("CARTESIA_API_KEY"),
-    voice_id=voice_id,
-    sample_rate=16000,
-  )
-
-  messages = [
-    {
-      "role": "system",
-      "content": system_prompt,
-    },
-  ]
-
-  context = OpenAILLMContext(messages, tools)
-  context_aggregator = llm.create_context_aggregator(context)
-
-  pipeline = Pipeline(
-    [
-      transport.input(),
-      stt,
-      context_aggregator.user(),
-      llm,
-      tts,
-      transport.output(),
-      context_aggregator.assistant(),
-    ]
-  )
-
-  task = PipelineTask(pipeline, params=PipelineParams(allow_interruptions=True))
-
-  @transport.event_handler("on_client_connected")
-  async def on_client_connected(transport, client):
-    messages.append(
-      {"role": "system", "content": "Please introduce yourself to the user."}
+  from .tts_cache import CartesiaSynthesizer, TTSCache, presynthesize
+  from .vad import SharedSileroVADAnalyzer, vad_batcher
+
+  tts_cache = TTSCache(args.tts_cache_mb * 1024 * 1024, args.tts_cache_dir)
+  synthesizer = CartesiaSynthesizer(os.getenv("CARTESIA_API_KEY"))
+  # What create_task is given to say without the LLM, plus the user's own lines
+  phrases = [text for text in (args.greeting, args.tool_filler) if text]
+  if args.tts_phrases:
+    with open(args.tts_phrases) as f:
+      phrases.extend(line.strip() for line in f if line.strip())
+  # Without a cache directory, every start would pay Cartesia for them again
+  if not (args.tts_cache_dir or args.tts_presynthesize):
+    phrases = []
+
+  trace_stats = None
+  metrics_runner = None
+  if args.trace or args.trace_file or args.trace_metrics_port:
+    trace_stats = TraceStats()
+    if args.trace_file:
+      trace_stats.open(args.trace_file)
+    if args.trace_metrics_port:
+      metrics_runner = await serve_metrics(
+        trace_stats, args.trace_metrics_host, args.trace_metrics_port
+      )
+
+  output_lead = args.output_lead_ms / 1000
+
+  def new_task(transport):
+    return create_task(
+      transport,
+      system_prompt,
+      voice_id,
+      tts_cache,
+      synthesizer,
+      args.greeting,
+      args.speculative_llm,
+      args.context_budget,
+      args.context_recent_tokens,
+      trace_stats,
+      preconnector,
+      tool_deadline=args.tool_deadline,
+      tool_filler=args.tool_filler or None,
+      tool_filler_after=args.tool_filler_after,
     )
-    await task.queue_frames([LLMMessagesFrame(messages)])
 
-  runner = PipelineRunner()
-  await runner.run(task)
+  try:
+    # Everything a meeting's first turn would otherwise wait for
+    await asyncio.gather(
+      profile.timed("vad model", asyncio.to_thread(warm_vad)),
+      # The get_time index
+      profile.timed("timezones", asyncio.to_thread(timezone_index)),
+      profile.timed("openai connection", warm_openai(os.getenv("OPENAI_API_KEY"))),
+      *(
+        [
+          profile.timed(
+            "tts phrases",
+            presynthesize(tts_cache, synthesizer, phrases, voice_id, 16000),
+          )
+        ]
+        if phrases
+        else []
+      ),
+      *(
+        [profile.timed("cartesia websocket", preconnector.ready(cartesia_url))]
+        if preconnector
+        else []
+      ),
+    )
+    if args.profile_startup:
+      logger.info(profile.report())
+      return
+    logger.info(f"Ready to serve after {profile.elapsed():.2f}s")
+    logger.debug(profile.report())
+
+    if args.multi_session:
+      batcher = None
+      if args.vad_batch_window_ms > 0:
+        batcher = vad_batcher(args.vad_batch_window_ms, args.vad_max_batch)
+      server = BotServer(
+        lambda websocket: WebsocketSessionTransport(
+          websocket,
+          create_transport_params(SharedSileroVADAnalyzer(batcher=batcher)),
+          output_lead=output_lead,
+        ),
+        new_task,
+        max_sessions=args.max_sessions,
+      )
+      await server.serve(host, port)
+    else:
+      transport = InterruptibleWebsocketServerTransport(
+        host=host,
+        port=port,
+        # The model warmed up above, rather than a fresh copy
+        params=create_transport_params(SharedSileroVADAnalyzer()),
+        output_lead=output_lead,
+      )
+      task = new_task(transport)
+      runner = PipelineRunner()
+      await runner.run(task)
+  finally:
+    await tool_runtime.close()
+    await synthesizer.close()
+    if preconnector:
+      await preconnector.close()
+    if metrics_runner:
+      await metrics_runner.cleanup()
+    if trace_stats:
+      trace_stats.close()
 
 
 def start():
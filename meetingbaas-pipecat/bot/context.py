@@ -0,0 +1,207 @@
+"""Keep a meeting's LLM context within a token budget.
+
+Without this, every turn is appended to the context for the whole meeting,
+so the prompt and the LLM's latency grow with it. `ContextCompactor` sits
+after the assistant context aggregator and, once a turn has been added,
+checks the context's size. Over budget, it keeps the system prompt and the
+most recent turns verbatim and folds everything older into a running
+summary. The summary is written by the LLM in the background, and if that
+fails the older turns are dropped instead.
+"""
+
+import asyncio
+import json
+
+from loguru import logger
+from pipecat.frames.frames import Frame
+from pipecat.processors.aggregators.openai_llm_context import (
+  OpenAILLMContext,
+  OpenAILLMContextFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+try:
+  import tiktoken
+
+  _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+  _encoding = None
+
+SUMMARY_PREFIX = "Summary of the meeting so far:"
+
+SUMMARY_PROMPT = """\
+You maintain a running summary of a meeting between a voice assistant and its users. \
+Merge the previous summary and the new conversation into one updated summary. \
+Keep names, decisions, questions still open and facts the assistant gave. \
+Write at most a short paragraph, in plain sentences."""
+
+
+def count_text_tokens(text: str) -> int:
+  """Tokens in `text`, estimated when tiktoken isn't installed"""
+  if _encoding:
+    return len(_encoding.encode(text))
+  return len(text) // 4
+
+
+def count_tokens(message: dict) -> int:
+  """Tokens a message adds to the prompt"""
+  content = message.get("content") or ""
+  if not isinstance(content, str):
+    content = json.dumps(content)
+  if message.get("tool_calls"):
+    content += json.dumps(message["tool_calls"])
+  return count_text_tokens(content) + 4
+
+
+def _is_summary(message: dict) -> bool:
+  return message.get("role") == "system" and str(message.get("content", "")).startswith(
+    SUMMARY_PREFIX
+  )
+
+
+class ContextCompactor(FrameProcessor):
+  """Compacts `context` once it grows beyond `budget` tokens.
+
+  The turns kept verbatim are the most recent ones that fit in `recent`
+  tokens, starting at a user message so that tool calls are never separated
+  from their results. Without a `client`, older turns are simply dropped.
+  """
+
+  def __init__(
+    self,
+    context: OpenAILLMContext,
+    budget: int = 8000,
+    recent: int = 3000,
+    client=None,
+    model: str = "gpt-4o-mini",
+    summary_tokens: int = 300,
+  ):
+    super().__init__()
+    self._context = context
+    self._budget = budget
+    self._recent = recent
+    self._client = client
+    self._model = model
+    self._summary_tokens = summary_tokens
+    self._task: asyncio.Task | None = None
+
+  async def process_frame(self, frame: Frame, direction: FrameDirection):
+    await super().process_frame(frame, direction)
+    # The assistant aggregator pushes the context after adding each turn
+    if isinstance(frame, OpenAILLMContextFrame) and (
+      self._task is None or self._task.done()
+    ):
+      self._task = self.get_event_loop().create_task(self.compact())
+    await self.push_frame(frame, direction)
+
+  async def cleanup(self):
+    await super().cleanup()
+    if self._task and not self._task.done():
+      self._task.cancel()
+
+  def _split(self, messages: list) -> tuple[list, dict | None, int]:
+    """The pinned system prompt, the current summary, and where recent turns start"""
+    # Only the prompt the context starts with. Later system messages, such as
+    # the instruction to introduce itself, age out with the turns around them.
+    pinned = messages[:1]
+    if pinned and (pinned[0].get("role") != "system" or _is_summary(pinned[0])):
+      pinned = []
+    summary = next((m for m in messages if _is_summary(m)), None)
+
+    cut = len(messages)
+    size = 0
+    for i in range(len(messages) - 1, len(pinned) - 1, -1):
+      size += count_tokens(messages[i])
+      if size > self._recent:
+        break
+      if messages[i].get("role") == "user":
+        cut = i
+    # Always keep the latest user turn, however long it is
+    if cut == len(messages):
+      cut = next(
+        (
+          i
+          for i in range(len(messages) - 1, len(pinned) - 1, -1)
+          if messages[i].get("role") == "user"
+        ),
+        len(messages),
+      )
+    return pinned, summary, cut
+
+  async def compact(self):
+    messages = self._context.get_messages()
+    total = sum(count_tokens(m) for m in messages)
+    if total <= self._budget:
+      return
+
+    pinned, summary, cut = self._split(messages)
+    snapshot = list(messages[:cut])
+    older = [m for m in snapshot[len(pinned) :] if m is not summary]
+    if not older:
+      return
+
+    text = await self._summarize(summary, older) if self._client else None
+    # Turns may have been added while summarizing, but never removed
+    messages = self._context.get_messages()
+    if len(messages) < cut or any(a is not b for a, b in zip(snapshot, messages)):
+      logger.debug("Context changed while compacting, will retry after the next turn")
+      return
+
+    compacted = list(pinned)
+    if text:
+      compacted.append({"role": "system", "content": f"{SUMMARY_PREFIX} {text}"})
+    elif summary:
+      compacted.append(summary)
+    compacted.extend(messages[cut:])
+    compacted = self._dedupe_system_messages(compacted)
+    self._context.set_messages(compacted)
+
+    after = sum(count_tokens(m) for m in compacted)
+    action = "summarized" if text else "dropped"
+    logger.info(
+      f"Context compacted from {total} to {after} tokens, "
+      f"{action} {len(older)} older messages"
+    )
+
+  async def _summarize(self, summary: dict | None, older: list) -> str | None:
+    lines = []
+    for message in older:
+      if message.get("tool_calls"):
+        for call in message["tool_calls"]:
+          function = call["function"]
+          lines.append(f"assistant called {function['name']}({function['arguments']})")
+      elif message.get("content"):
+        lines.append(f"{message['role']}: {message['content']}")
+    previous = summary["content"][len(SUMMARY_PREFIX) :].strip() if summary else ""
+    try:
+      response = await self._client.chat.completions.create(
+        model=self._model,
+        messages=[
+          {"role": "system", "content": SUMMARY_PROMPT},
+          {
+            "role": "user",
+            "content": f"Previous summary:\n{previous or '(none)'}\n\n"
+            "New conversation:\n" + "\n".join(lines),
+          },
+        ],
+        max_tokens=self._summary_tokens,
+      )
+      return response.choices[0].message.content.strip()
+    except Exception as e:
+      logger.warning(f"Could not summarize the context, dropping older turns: {e}")
+      return None
+
+  @staticmethod
+  def _dedupe_system_messages(messages: list) -> list:
+    """`messages` without repeated system messages, such as instructions re-sent
+    on reconnect"""
+    seen = set()
+    deduped = []
+    for message in messages:
+      if message.get("role") == "system":
+        content = str(message.get("content"))
+        if content in seen:
+          continue
+        seen.add(content)
+      deduped.append(message)
+    return deduped
@@ -0,0 +1,303 @@
+"""OpenAI LLM services shared by the bot's sessions.
+
+`SpeculativeOpenAILLMService` can also start a turn's completion from a
+stable interim transcript, spotted by `InterimTranscriptTap`, instead of
+waiting the few hundred milliseconds until Deepgram's final one. Its chunks
+are held back, then replayed if the final user message matches and thrown
+away otherwise.
+"""
+
+import asyncio
+import re
+
+import httpx
+from loguru import logger
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from pipecat.frames.frames import (
+  Frame,
+  InterimTranscriptionFrame,
+  TextFrame,
+  TranscriptionFrame,
+  UserStartedSpeakingFrame,
+  UserStoppedSpeakingFrame,
+)
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.openai import OpenAILLMService
+
+from .context import count_text_tokens
+
+_PUNCTUATION = re.compile(r"[^\w\s']+")
+
+
+_clients: dict[tuple, AsyncOpenAI] = {}
+
+
+def shared_openai_client(api_key=None, base_url=None) -> AsyncOpenAI:
+  """One client, and connection pool, per key and URL for the whole process"""
+  key = (api_key, base_url)
+  if key not in _clients:
+    # The same client OpenAILLMService.create_client makes for each service
+    _clients[key] = AsyncOpenAI(
+      api_key=api_key,
+      base_url=base_url,
+      http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+          max_keepalive_connections=100, max_connections=1000, keepalive_expiry=None
+        )
+      ),
+    )
+  return _clients[key]
+
+
+class SharedClientOpenAILLMService(OpenAILLMService):
+  """Reuses one AsyncOpenAI client, and its connection pool, across sessions.
+
+  `client` replaces the shared client, e.g. with a scripted stand-in.
+
+  With a `tool_dispatcher`, the tool calls of a response are only collected
+  while it streams, and run together once it has been read. Its filler goes
+  out as text of the response, so the cached audio plays for it.
+
+  When the user interrupts, pipecat cancels the response being processed
+  but leaves its stream to the garbage collector, and OpenAI goes on
+  generating into an open connection. The stream is closed here instead.
+  """
+
+  def __init__(
+    self, *, client: AsyncOpenAI | None = None, tool_dispatcher=None, **kwargs
+  ):
+    # Set first: the base constructor calls create_client
+    self._given_client = client
+    super().__init__(**kwargs)
+    self._tool_dispatcher = tool_dispatcher
+    self._stream = None
+
+  def create_client(self, api_key=None, base_url=None, **kwargs):
+    return self._given_client or shared_openai_client(api_key, base_url)
+
+  async def _stream_chat_completions(self, context: OpenAILLMContext):
+    self._stream = await super()._stream_chat_completions(context)
+    return self._stream
+
+  async def _process_context(self, context: OpenAILLMContext):
+    try:
+      if self._tool_dispatcher is None:
+        await super()._process_context(context)
+        return
+      self._tool_dispatcher.reset()
+      await super()._process_context(context)
+      await self._tool_dispatcher.run(self._speak)
+    finally:
+      stream, self._stream = self._stream, None
+      if stream is not None:
+        await stream.close()
+
+  async def _speak(self, text: str):
+    # As text of the response, not a TTSSpeakFrame: Cartesia holds every frame
+    # after one until it has been spoken, results and the next reply included
+    await self.push_frame(TextFrame(text))
+
+
+def normalize(text: str) -> str:
+  """Finals often differ from interims only in punctuation and case"""
+  return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+
+class Speculation:
+  """A completion running ahead of the turn, with its chunks held back"""
+
+  def __init__(self, text: str, base_messages: list):
+    self.text = text
+    self.key = normalize(text)
+    self.base_messages = base_messages
+    self.chunks: list = []
+    self.done = False
+    self.error: Exception | None = None
+    self.completion_tokens = 0
+    self.task: asyncio.Task | None = None
+    self._updated = asyncio.Event()
+
+  def add(self, chunk):
+    if chunk.usage:
+      # Exact, but only sent once the completion has run to its end
+      self.completion_tokens = chunk.usage.completion_tokens
+    elif chunk.choices:
+      delta = chunk.choices[0].delta
+      text = delta.content or ""
+      for call in delta.tool_calls or ():
+        if call.function:
+          text += (call.function.name or "") + (call.function.arguments or "")
+      self.completion_tokens += count_text_tokens(text)
+    self.chunks.append(chunk)
+    self._updated.set()
+
+  def finish(self, error: Exception | None = None):
+    self.done = True
+    self.error = error
+    self._updated.set()
+
+  def matches(self, messages: list) -> bool:
+    if len(messages) != len(self.base_messages) + 1:
+      return False
+    last = messages[-1]
+    return (
+      last.get("role") == "user"
+      and normalize(str(last.get("content", ""))) == self.key
+      and messages[:-1] == self.base_messages
+    )
+
+  async def replay(self):
+    """Every chunk held so far, then the rest as the completion streams in"""
+    i = 0
+    while True:
+      if i < len(self.chunks):
+        yield self.chunks[i]
+        i += 1
+      elif self.done:
+        if self.error:
+          raise self.error
+        return
+      else:
+        self._updated.clear()
+        await self._updated.wait()
+
+
+class SpeculativeOpenAILLMService(SharedClientOpenAILLMService):
+  """An OpenAI LLM service that can start a turn's completion early"""
+
+  # Across every session in the process
+  turns = 0
+  hits = 0
+  started = 0
+  wasted_tokens = 0
+
+  def __init__(self, **kwargs):
+    super().__init__(**kwargs)
+    self._speculation: Speculation | None = None
+    # The speculation the response being processed is replaying
+    self._replaying: Speculation | None = None
+
+  def speculate(self, context: OpenAILLMContext, text: str):
+    """Start a completion for `context` with `text` as the user's turn"""
+    if self._speculation and self._speculation.key == normalize(text):
+      return
+    self.discard_speculation()
+
+    base_messages = list(context.get_messages())
+    speculation = Speculation(text, base_messages)
+    speculative_context = OpenAILLMContext(
+      base_messages + [{"role": "user", "content": text}],
+      context.tools,
+      context.tool_choice,
+    )
+    speculation.task = self.get_event_loop().create_task(
+      self._run_speculation(speculation, speculative_context)
+    )
+    self._speculation = speculation
+    SpeculativeOpenAILLMService.started += 1
+    logger.debug(f"Speculating on interim transcript: [{text}]")
+
+  async def _run_speculation(self, speculation: Speculation, context):
+    stream = None
+    try:
+      # Not through our override, which would close it with the response
+      # being processed
+      stream = await OpenAILLMService._stream_chat_completions(self, context)
+      async for chunk in stream:
+        speculation.add(chunk)
+      speculation.finish()
+    except asyncio.CancelledError:
+      speculation.finish(asyncio.CancelledError())
+      raise
+    except Exception as e:
+      speculation.finish(e)
+    finally:
+      if stream is not None:
+        await stream.close()
+
+  async def _process_context(self, context: OpenAILLMContext):
+    try:
+      await super()._process_context(context)
+    finally:
+      # Interrupted or not, its stream must not outlive the response
+      speculation, self._replaying = self._replaying, None
+      if speculation and speculation.task and not speculation.task.done():
+        speculation.task.cancel()
+        await asyncio.gather(speculation.task, return_exceptions=True)
+
+  def discard_speculation(self):
+    speculation, self._speculation = self._speculation, None
+    if speculation is None:
+      return
+    if speculation.task and not speculation.task.done():
+      speculation.task.cancel()
+    SpeculativeOpenAILLMService.wasted_tokens += speculation.completion_tokens
+
+  async def _stream_chat_completions(self, context: OpenAILLMContext):
+    speculation, self._speculation = self._speculation, None
+    SpeculativeOpenAILLMService.turns += 1
+    messages = context.get_messages()
+    if speculation and speculation.error is None and speculation.matches(messages):
+      SpeculativeOpenAILLMService.hits += 1
+      self._log_result("hit", speculation.text)
+      self._replaying = speculation
+      return speculation.replay()
+
+    if speculation:
+      self._speculation = speculation
+      self.discard_speculation()
+      self._log_result("miss", speculation.text)
+    return await super()._stream_chat_completions(context)
+
+  def _log_result(self, result: str, text: str):
+    cls = SpeculativeOpenAILLMService
+    logger.info(
+      f"Speculation {result} for [{text}]: {cls.hits}/{cls.turns} turns hit "
+      f"({cls.hits / cls.turns:.0%}), {cls.started} completions started, "
+      f"{cls.wasted_tokens} completion tokens discarded"
+    )
+
+  @classmethod
+  def stats(cls) -> dict[str, float]:
+    return {
+      "turns": cls.turns,
+      "hits": cls.hits,
+      "hit_rate": cls.hits / cls.turns if cls.turns else 0.0,
+      "started": cls.started,
+      "wasted_tokens": cls.wasted_tokens,
+    }
+
+
+class InterimTranscriptTap(FrameProcessor):
+  """Starts speculation once an interim transcript looks stable"""
+
+  def __init__(self, llm: SpeculativeOpenAILLMService, context: OpenAILLMContext):
+    super().__init__()
+    self._llm = llm
+    self._context = context
+    self._finals: list[str] = []
+    self._interim = ""
+
+  def _turn_text(self) -> str:
+    # Joined the way the user context aggregator joins transcriptions
+    return " ".join(self._finals + [self._interim]).strip()
+
+  async def process_frame(self, frame: Frame, direction: FrameDirection):
+    await super().process_frame(frame, direction)
+
+    if isinstance(frame, UserStartedSpeakingFrame):
+      self._finals = []
+      self._interim = ""
+    elif isinstance(frame, TranscriptionFrame):
+      self._finals.append(frame.text)
+      self._interim = ""
+    elif isinstance(frame, InterimTranscriptionFrame):
+      if self._interim and normalize(frame.text) == normalize(self._interim):
+        self._llm.speculate(self._context, self._turn_text())
+      self._interim = frame.text
+    elif isinstance(frame, UserStoppedSpeakingFrame) and self._interim:
+      # The final transcript is still on its way; this is where speculating pays
+      self._llm.speculate(self._context, self._turn_text())
+
+    await self.push_frame(frame, direction)
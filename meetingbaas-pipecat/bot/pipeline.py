@@ -0,0 +1,164 @@
+"""The pipeline that serves one meeting.
+
+Building it needs pipecat and every service, which take seconds to import,
+so `bot.py` only imports this module once startup is under way.
+"""
+
+import asyncio
+import os
+
+from pipecat.audio.vad.vad_analyzer import VADParams
+from pipecat.frames.frames import (
+  BotStartedSpeakingFrame,
+  LLMMessagesFrame,
+  TextFrame,
+  TranscriptionFrame,
+  TTSAudioRawFrame,
+  TTSSpeakFrame,
+  UserStoppedSpeakingFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.task import PipelineParams, PipelineTask
+from pipecat.processors.aggregators.openai_llm_context import (
+  OpenAILLMContext,
+  OpenAILLMContextFrame,
+)
+from pipecat.processors.frame_processor import FrameProcessor
+from pipecat.services.deepgram import DeepgramSTTService
+from pipecat.transports.network.websocket_server import WebsocketServerParams
+
+from .context import ContextCompactor
+from .llm import (
+  InterimTranscriptTap,
+  SharedClientOpenAILLMService,
+  SpeculativeOpenAILLMService,
+  shared_openai_client,
+)
+from .startup import WebsocketPreconnector
+from .tools import ToolDispatcher
+from .tools import runtime as tool_runtime
+from .tracing import TraceStats, TurnTracer
+from .tts_cache import CachedCartesiaTTSService, CartesiaSynthesizer, TTSCache
+
+
+def create_transport_params(vad_analyzer) -> WebsocketServerParams:
+  return WebsocketServerParams(
+    audio_out_sample_rate=16000,
+    audio_out_enabled=True,
+    add_wav_header=False,
+    vad_enabled=True,
+    vad_analyzer=vad_analyzer,
+    vad_audio_passthrough=True,
+  )
+
+
+def create_task(
+  transport,
+  system_prompt: str,
+  voice_id: str,
+  tts_cache: TTSCache,
+  synthesizer: CartesiaSynthesizer | None = None,
+  greeting: str | None = None,
+  speculative: bool = False,
+  context_budget: int = 0,
+  context_recent: int = 3000,
+  trace_stats: TraceStats | None = None,
+  preconnector: WebsocketPreconnector | None = None,
+  stt: FrameProcessor | None = None,
+  llm_client=None,
+  tool_deadline: float = 4.0,
+  tool_filler: str | None = None,
+  tool_filler_after: float = 0.7,
+) -> PipelineTask:
+  """Build the pipeline and task for one meeting served by `transport`.
+
+  `stt` and `llm_client` replace Deepgram and the OpenAI client, which lets
+  `scripts/bench_pipeline.py` run the pipeline without either.
+  """
+  llm_class = (
+    SpeculativeOpenAILLMService if speculative else SharedClientOpenAILLMService
+  )
+  tool_dispatcher = ToolDispatcher(
+    tool_runtime, tool_deadline, tool_filler, tool_filler_after
+  )
+  if llm_client is None:
+    llm_client = shared_openai_client(os.getenv("OPENAI_API_KEY"))
+  llm = llm_class(
+    client=llm_client,
+    model="gpt-4o-mini",
+    tool_dispatcher=tool_dispatcher,
+  )
+  tool_runtime.register(llm, tool_dispatcher)
+  tools = tool_runtime.schemas()
+
+  if stt is None:
+    stt = DeepgramSTTService(
+      api_key=os.getenv("DEEPGRAM_API_KEY"), encoding="linear16", sample_rate=16000
+    )
+
+  tts = CachedCartesiaTTSService(
+    api_key=os.getenv("CARTESIA_API_KEY"),
+    voice_id=voice_id,
+    sample_rate=16000,
+    cache=tts_cache,
+    synthesizer=synthesizer,
+    preconnector=preconnector,
+  )
+
+  messages = [
+    {
+      "role": "system",
+      "content": system_prompt,
+    },
+  ]
+
+  context = OpenAILLMContext(messages, tools)
+  context_aggregator = llm.create_context_aggregator(context)
+
+  tracer = TurnTracer(trace_stats, VADParams().stop_secs) if trace_stats else None
+
+  def traced(processor, mark, *frame_types):
+    return tracer.watch(processor, mark, *frame_types) if tracer else processor
+
+  processors = [
+    traced(transport.input(), "vad_stop", UserStoppedSpeakingFrame),
+    traced(stt, "transcript", TranscriptionFrame),
+    *([InterimTranscriptTap(llm, context)] if speculative else []),
+    traced(
+      context_aggregator.user(),
+      "llm_request",
+      OpenAILLMContextFrame,
+      LLMMessagesFrame,
+    ),
+    traced(llm, "llm_first_text", TextFrame),
+    traced(tts, "tts_first_audio", TTSAudioRawFrame),
+    traced(transport.output(), "bot_started", BotStartedSpeakingFrame),
+    context_aggregator.assistant(),
+  ]
+  if context_budget:
+    processors.append(
+      ContextCompactor(context, context_budget, context_recent, client=llm_client)
+    )
+  pipeline = Pipeline(processors)
+
+  task = PipelineTask(pipeline, params=PipelineParams(allow_interruptions=True))
+
+  introduced = asyncio.Event()
+
+  @transport.event_handler("on_client_connected")
+  async def on_client_connected(transport, client):
+    # The proxy reconnects after network trouble; only introduce ourselves once
+    if introduced.is_set():
+      return
+    introduced.set()
+    if greeting:
+      # Pre-synthesized at startup, so it plays at once without the LLM
+      messages.append({"role": "assistant", "content": greeting})
+      await task.queue_frames([TTSSpeakFrame(greeting)])
+      return
+    messages.append(
+      {"role": "system", "content": "Please introduce yourself to the user."}
+    )
+    await task.queue_frames([LLMMessagesFrame(messages)])
+
+  return task
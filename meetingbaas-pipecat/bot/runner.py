@@ -22,6 +22,136 @@ async def configure(
     required=False,
     help="Cartesia voice ID for text-to-speech conversion",
   )
+  parser.add_argument(
+    "--multi-session",
+    action="store_true",
+    help="Serve every connection with its own pipeline instead of one client",
+  )
+  parser.add_argument(
+    "--max-sessions",
+    type=int,
+    default=0,
+    help="Connections served at once with --multi-session (0 for no limit)",
+  )
+  parser.add_argument(
+    "--vad-batch-window-ms",
+    type=float,
+    default=0,
+    help="With --multi-session, batch VAD inference across sessions within this window (0 disables)",
+  )
+  parser.add_argument(
+    "--vad-max-batch",
+    type=int,
+    default=32,
+    help="Most audio chunks in one batched VAD inference",
+  )
+
+  parser.add_argument(
+    "--greeting",
+    type=str,
+    default=None,
+    help="Fixed introduction spoken when a meeting connects, instead of asking the LLM for one",
+  )
+  parser.add_argument(
+    "--tts-phrases",
+    type=str,
+    default=None,
+    help="File of extra utterances, one per line, to synthesize at startup",
+  )
+  parser.add_argument(
+    "--tts-cache-mb",
+    type=int,
+    default=64,
+    help="Memory budget for cached speech",
+  )
+  parser.add_argument(
+    "--tts-cache-dir",
+    type=str,
+    default=None,
+    help="Directory that keeps cached speech across restarts",
+  )
+  parser.add_argument(
+    "--tts-presynthesize",
+    action="store_true",
+    help="Synthesize --greeting, --tool-filler and --tts-phrases at startup even without --tts-cache-dir",
+  )
+
+  parser.add_argument(
+    "--speculative-llm",
+    action="store_true",
+    help="Start the LLM on stable interim transcripts and keep the reply if the final transcript matches",
+  )
+  parser.add_argument(
+    "--context-budget",
+    type=int,
+    default=8000,
+    help="Tokens of LLM context before older turns are summarized (0 keeps everything)",
+  )
+  parser.add_argument(
+    "--context-recent-tokens",
+    type=int,
+    default=3000,
+    help="Tokens of the most recent turns always kept verbatim",
+  )
+  parser.add_argument(
+    "--output-lead-ms",
+    type=int,
+    default=0,
+    help="Send the bot's speech this far ahead of playback to absorb network jitter; sent speech can't be cut off by an interruption",
+  )
+  parser.add_argument(
+    "--tool-deadline",
+    type=float,
+    default=4.0,
+    help="Seconds a tool call may take before the LLM is told it failed",
+  )
+  parser.add_argument(
+    "--tool-filler",
+    type=str,
+    default="Give me a moment to check that.",
+    help="Said when tool calls are still running after --tool-filler-after (empty to stay silent)",
+  )
+  parser.add_argument(
+    "--tool-filler-after",
+    type=float,
+    default=0.7,
+    help="Seconds of tool calls before the filler is said",
+  )
+  parser.add_argument(
+    "--trace",
+    action="store_true",
+    help="Time each stage of every turn and log p50/p95/p99 latencies",
+  )
+  parser.add_argument(
+    "--trace-file",
+    type=str,
+    default=None,
+    help="Append a JSON record per turn to this file (implies --trace)",
+  )
+  parser.add_argument(
+    "--trace-metrics-port",
+    type=int,
+    default=0,
+    help="Serve turn latency histograms on /metrics at this port (implies --trace)",
+  )
+  parser.add_argument(
+    "--trace-metrics-host",
+    type=str,
+    default="127.0.0.1",
+    help="Host for --trace-metrics-port",
+  )
+
+  parser.add_argument(
+    "--preconnect",
+    type=int,
+    default=1,
+    help="Cartesia websockets kept open for the next sessions to take (0 disables)",
+  )
+  parser.add_argument(
+    "--profile-startup",
+    action="store_true",
+    help="Go through startup, log how long each step took and exit",
+  )
 
   args, unknown = parser.parse_known_args()
   system_prompt = (
@@ -0,0 +1,84 @@
+"""Serve many meetings from one bot process.
+
+Every accepted connection gets its own transport, pipeline, context and task,
+all run by one `PipelineRunner`, while everything that is expensive to create
+(the VAD model, HTTP clients) is created once and shared by every session.
+When a meeting disconnects, its task is cancelled so that its STT and TTS
+connections close with it.
+"""
+
+import asyncio
+import signal
+from contextlib import suppress
+from typing import Callable
+
+import websockets
+from loguru import logger
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineTask
+
+from ..protocol import READY_PATH
+from .transport import WebsocketSessionTransport
+
+
+class BotServer:
+  """Runs `create_task(transport)` for every connection, up to `max_sessions`"""
+
+  def __init__(
+    self,
+    create_transport: Callable[[object], WebsocketSessionTransport],
+    create_task: Callable[[WebsocketSessionTransport], PipelineTask],
+    max_sessions: int = 0,
+  ):
+    self.create_transport = create_transport
+    self.create_task = create_task
+    self.max_sessions = max_sessions
+    self.sessions: dict[int, PipelineTask] = {}
+    self._ids = 0
+    self._runner = PipelineRunner(handle_sigint=False)
+
+  async def _handle(self, websocket):
+    if websocket.path == READY_PATH:
+      await websocket.close()
+      return
+    if self.max_sessions and len(self.sessions) >= self.max_sessions:
+      logger.warning(
+        f"Rejecting {websocket.remote_address}, at {self.max_sessions} sessions"
+      )
+      await websocket.close(code=1013, reason="Bot is at capacity")
+      return
+
+    self._ids += 1
+    session = self._ids
+    logger.info(f"Session {session} started for {websocket.remote_address}")
+    task = self.create_task(self.create_transport(websocket))
+    self.sessions[session] = task
+    running = asyncio.create_task(self._runner.run(task))
+    closed = asyncio.create_task(websocket.wait_closed())
+    try:
+      await asyncio.wait((running, closed), return_when=asyncio.FIRST_COMPLETED)
+      if not running.done():
+        await task.cancel()
+      await running
+    except Exception as e:
+      logger.error(f"Session {session} failed: {e}")
+      logger.exception(e)
+    finally:
+      closed.cancel()
+      del self.sessions[session]
+      logger.info(f"Session {session} ended, {len(self.sessions)} still running")
+
+  async def serve(self, host: str, port: int):
+    """Accept meetings until SIGINT or SIGTERM, then cancel the open sessions"""
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+      with suppress(NotImplementedError):  # not available on Windows
+        loop.add_signal_handler(sig, stopping.set)
+
+    async with websockets.serve(self._handle, host, port):
+      limit = self.max_sessions or "unlimited"
+      logger.info(f"Bot server started on ws://{host}:{port} ({limit} sessions)")
+      await stopping.wait()
+      logger.info(f"Shutting down, cancelling {len(self.sessions)} sessions...")
+      await self._runner.cancel()
@@ -0,0 +1,208 @@
+"""Get the bot ready before it accepts its first meeting.
+
+Importing pipecat and its services takes seconds, so `bot.py` only imports
+what parsing the command line needs. Everything else is loaded by
+`preload()` on a worker thread while the event loop opens the connections
+meetings will need. Then the Silero model is loaded and run once, since
+ONNX Runtime sizes its buffers on the first inference. The OpenAI client's
+connection pool gets a live connection, and a spare Cartesia websocket is
+kept open for the next session to take. `StartupProfile` times every step
+for `--profile-startup`.
+
+This module is imported before everything else, so it must stay light.
+"""
+
+import asyncio
+import importlib
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import websockets
+from loguru import logger
+
+# Imported by preload() in this order, which is also roughly from the most
+# to the least expensive, so that the profile attributes shared dependencies
+# (numpy, scipy, onnxruntime, httpx) to the first module that needs them
+HEAVY_MODULES = (
+  "pipecat.audio.vad.silero",
+  "pipecat.services.openai",
+  "pipecat.services.deepgram",
+  "pipecat.services.cartesia",
+  "pipecat.transports.network.websocket_server",
+  "pipecat.pipeline.task",
+)
+
+# The bot's own modules, relative to this package
+BOT_MODULES = (".pipeline", ".server", ".vad")
+
+_started = time.perf_counter()
+
+
+def cartesia_websocket_url(
+  api_key: str,
+  url: str = "wss://api.cartesia.ai/tts/websocket",
+  cartesia_version: str = "2024-06-10",
+) -> str:
+  """The URL CartesiaTTSService connects to, with the defaults it uses"""
+  return f"{url}?api_key={api_key}&cartesia_version={cartesia_version}"
+
+
+class StartupProfile:
+  """How long each step of startup took, from when this module was imported"""
+
+  def __init__(self):
+    self.phases: list[tuple[str, float, float]] = []
+    self.imports: list[tuple[str, float]] = []
+
+  @contextmanager
+  def phase(self, name: str):
+    """Time the enclosed block; phases may overlap when run concurrently"""
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.phases.append((name, start - _started, time.perf_counter() - start))
+
+  async def timed(self, name: str, awaitable):
+    with self.phase(name):
+      return await awaitable
+
+  def elapsed(self) -> float:
+    return time.perf_counter() - _started
+
+  def report(self) -> str:
+    lines = [f"Startup took {self.elapsed():.2f}s"]
+    for name, start, seconds in sorted(self.phases, key=lambda phase: phase[1]):
+      lines.append(f"  {name:<28} at {start:6.2f}s  took {seconds * 1000:8.1f} ms")
+    if self.imports:
+      lines.append("  Imports, each including what earlier ones hadn't loaded:")
+      for module, seconds in self.imports:
+        lines.append(f"    {module:<48} {seconds * 1000:8.1f} ms")
+    return "\n".join(lines)
+
+
+def preload(profile: StartupProfile, package: str):
+  """Import the heavy dependencies, then the bot modules that use them"""
+  modules = HEAVY_MODULES + tuple(package + module for module in BOT_MODULES)
+  for module in modules:
+    start = time.perf_counter()
+    importlib.import_module(module)
+    profile.imports.append((module, time.perf_counter() - start))
+
+
+def warm_vad(runs: int = 3):
+  """Load the shared Silero model and run it on silence"""
+  import numpy as np
+
+  from .vad import silero_session
+
+  session = silero_session()
+  # 512 samples and the 64 of context the model expects at 16 kHz
+  inputs = {
+    "input": np.zeros((1, 576), dtype="float32"),
+    "state": np.zeros((2, 1, 128), dtype="float32"),
+    "sr": np.array(16000, dtype="int64"),
+  }
+  for _ in range(runs):
+    session.run(None, inputs)
+
+
+async def warm_openai(api_key: str | None):
+  """Open a connection in the pool of the client every session shares"""
+  from .llm import shared_openai_client
+
+  try:
+    # The cheapest authenticated request, which also checks the API key early
+    await shared_openai_client(api_key).models.list()
+  except Exception as e:
+    logger.warning(f"Could not warm up the OpenAI connection: {e}")
+
+
+class WebsocketPreconnector:
+  """Keeps `spares` open websockets per URL for sessions to take.
+
+  A new session takes a spare instead of waiting for a TCP and TLS handshake
+  of its own, and another connection opens in the background to replace it.
+  Spares are replaced once they are `max_age` seconds old, before the server
+  closes them for being idle.
+  """
+
+  def __init__(self, spares: int = 1, max_age: float = 120):
+    self.spares = spares
+    self.max_age = max_age
+    self._spares: dict[str, deque] = {}
+    self._filling: dict[str, asyncio.Task] = {}
+    self._refresh_task: asyncio.Task | None = None
+    self.taken = 0
+    self.missed = 0
+
+  def keep(self, url: str):
+    """Start keeping spares for `url`"""
+    self._spares.setdefault(url, deque())
+    self._fill(url)
+    if self._refresh_task is None:
+      self._refresh_task = asyncio.get_running_loop().create_task(self._refresh())
+
+  async def ready(self, url: str):
+    """Wait until the spares for `url` have been opened, or failed to"""
+    task = self._filling.get(url)
+    if task:
+      await asyncio.wait({task})
+
+  def take(self, url: str):
+    """An open websocket to `url`, or None if none is ready"""
+    spares = self._spares.get(url)
+    if spares is None:
+      return None
+    websocket = None
+    while spares and websocket is None:
+      opened, candidate = spares.popleft()
+      if candidate.open and time.monotonic() - opened < self.max_age:
+        websocket = candidate
+      else:
+        asyncio.get_running_loop().create_task(candidate.close())
+    if websocket is None:
+      self.missed += 1
+    else:
+      self.taken += 1
+    self._fill(url)
+    return websocket
+
+  def _fill(self, url: str):
+    task = self._filling.get(url)
+    if task is None or task.done():
+      self._filling[url] = asyncio.get_running_loop().create_task(self._open(url))
+
+  async def _open(self, url: str):
+    spares = self._spares[url]
+    while len(spares) < self.spares:
+      try:
+        websocket = await websockets.connect(url)
+      except Exception as e:
+        # Sessions connect on their own meanwhile; try again on the next take
+        logger.warning(f"Could not pre-open a websocket: {e}")
+        return
+      spares.append((time.monotonic(), websocket))
+
+  async def _refresh(self):
+    while True:
+      await asyncio.sleep(self.max_age / 4)
+      for url, spares in self._spares.items():
+        now = time.monotonic()
+        while spares and (
+          now - spares[0][0] >= self.max_age * 3 / 4 or not spares[0][1].open
+        ):
+          _, websocket = spares.popleft()
+          await websocket.close()
+        self._fill(url)
+
+  async def close(self):
+    if self._refresh_task:
+      self._refresh_task.cancel()
+    for task in self._filling.values():
+      task.cancel()
+    for spares in self._spares.values():
+      while spares:
+        _, websocket = spares.popleft()
+        await websocket.close()
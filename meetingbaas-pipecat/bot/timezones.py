@@ -0,0 +1,401 @@
+"""Resolve natural-language locations to IANA time zones.
+
+The LLM rarely produces an exact zone name like `Asia/Kolkata`; it passes on
+whatever the user said ("Mumbai", "new york", "Tokyo, Japan", "PST"). The
+index maps normalized city, country and abbreviation keys to zones, built
+once from pytz's own data plus a table of aliases for places and
+abbreviations that tzdata doesn't name. Lookups that miss fall back to a
+prefix match and then a fuzzy match.
+"""
+
+import bisect
+import difflib
+import re
+import unicodedata
+from functools import cache, lru_cache
+
+import pytz
+
+# Countries spanning several zones resolve to their most populous one rather
+# than the first zone pytz lists (Kaliningrad for Russia, St Johns for Canada)
+COUNTRY_ZONES = {
+  "AU": "Australia/Sydney",
+  "BR": "America/Sao_Paulo",
+  "CA": "America/Toronto",
+  "CL": "America/Santiago",
+  "ES": "Europe/Madrid",
+  "PT": "Europe/Lisbon",
+  "RU": "Europe/Moscow",
+}
+
+# US states and Canadian provinces by postal abbreviation, only looked up after
+# a comma ("Fresno, CA"). None marks the ones spanning several zones or shared
+# with an Australian state, where only a known city can tell.
+REGION_CODES = {
+  "al": "America/Chicago",
+  "ak": "America/Anchorage",
+  "az": "America/Phoenix",
+  "ar": "America/Chicago",
+  "ca": "America/Los_Angeles",
+  "co": "America/Denver",
+  "ct": "America/New_York",
+  "dc": "America/New_York",
+  "de": "America/New_York",
+  "fl": "America/New_York",
+  "ga": "America/New_York",
+  "hi": "Pacific/Honolulu",
+  "ia": "America/Chicago",
+  "id": None,
+  "il": "America/Chicago",
+  "in": "America/Indiana/Indianapolis",
+  "ks": None,
+  "ky": None,
+  "la": "America/Chicago",
+  "ma": "America/New_York",
+  "md": "America/New_York",
+  "me": "America/New_York",
+  "mi": "America/Detroit",
+  "mn": "America/Chicago",
+  "mo": "America/Chicago",
+  "ms": "America/Chicago",
+  "mt": "America/Denver",
+  "nc": "America/New_York",
+  "nd": None,
+  "ne": None,
+  "nh": "America/New_York",
+  "nj": "America/New_York",
+  "nm": "America/Denver",
+  "nv": "America/Los_Angeles",
+  "ny": "America/New_York",
+  "oh": "America/New_York",
+  "ok": "America/Chicago",
+  "or": "America/Los_Angeles",
+  "pa": "America/New_York",
+  "pr": "America/Puerto_Rico",
+  "ri": "America/New_York",
+  "sc": "America/New_York",
+  "sd": None,
+  "tn": None,
+  "tx": "America/Chicago",
+  "ut": "America/Denver",
+  "va": "America/New_York",
+  "vt": "America/New_York",
+  "wa": None,
+  "wi": "America/Chicago",
+  "wv": "America/New_York",
+  "wy": "America/Denver",
+  "ab": "America/Edmonton",
+  "bc": "America/Vancouver",
+  "mb": "America/Winnipeg",
+  "nb": "America/Moncton",
+  "nl": "America/St_Johns",
+  "ns": "America/Halifax",
+  "nt": None,
+  "nu": None,
+  "on": "America/Toronto",
+  "pe": "America/Halifax",
+  "qc": "America/Toronto",
+  "sk": "America/Regina",
+  "yt": "America/Whitehorse",
+}
+
+ALIASES = {
+  # Abbreviations, mapped to a zone that follows daylight saving time
+  "est": "America/New_York",
+  "edt": "America/New_York",
+  "et": "America/New_York",
+  "eastern": "America/New_York",
+  "cst": "America/Chicago",
+  "cdt": "America/Chicago",
+  "ct": "America/Chicago",
+  "central": "America/Chicago",
+  "mst": "America/Denver",
+  "mdt": "America/Denver",
+  "mt": "America/Denver",
+  "mountain": "America/Denver",
+  "pst": "America/Los_Angeles",
+  "pdt": "America/Los_Angeles",
+  "pt": "America/Los_Angeles",
+  "pacific": "America/Los_Angeles",
+  "akst": "America/Anchorage",
+  "hst": "Pacific/Honolulu",
+  "gmt": "Etc/GMT",
+  "utc": "UTC",
+  "zulu": "UTC",
+  "bst": "Europe/London",
+  "wet": "Europe/Lisbon",
+  "cet": "Europe/Paris",
+  "cest": "Europe/Paris",
+  "eet": "Europe/Athens",
+  "eest": "Europe/Athens",
+  "msk": "Europe/Moscow",
+  "ist": "Asia/Kolkata",
+  "pkt": "Asia/Karachi",
+  "sgt": "Asia/Singapore",
+  "hkt": "Asia/Hong_Kong",
+  "jst": "Asia/Tokyo",
+  "kst": "Asia/Seoul",
+  "awst": "Australia/Perth",
+  "acst": "Australia/Adelaide",
+  "aest": "Australia/Sydney",
+  "aedt": "Australia/Sydney",
+  "nzst": "Pacific/Auckland",
+  "nzdt": "Pacific/Auckland",
+  # Countries and regions known by other names
+  "usa": "America/New_York",
+  "america": "America/New_York",
+  "uk": "Europe/London",
+  "england": "Europe/London",
+  "scotland": "Europe/London",
+  "wales": "Europe/London",
+  "great britain": "Europe/London",
+  "holland": "Europe/Amsterdam",
+  "korea": "Asia/Seoul",
+  "south korea": "Asia/Seoul",
+  "north korea": "Asia/Pyongyang",
+  "russia": "Europe/Moscow",
+  "vietnam": "Asia/Ho_Chi_Minh",
+  "taiwan": "Asia/Taipei",
+  "uae": "Asia/Dubai",
+  "hawaii": "Pacific/Honolulu",
+  "alaska": "America/Anchorage",
+  # US states
+  "california": "America/Los_Angeles",
+  "washington state": "America/Los_Angeles",
+  "oregon": "America/Los_Angeles",
+  "nevada": "America/Los_Angeles",
+  "arizona": "America/Phoenix",
+  "colorado": "America/Denver",
+  "utah": "America/Denver",
+  "texas": "America/Chicago",
+  "illinois": "America/Chicago",
+  "minnesota": "America/Chicago",
+  "louisiana": "America/Chicago",
+  "new york state": "America/New_York",
+  "florida": "America/New_York",
+  "georgia state": "America/New_York",
+  "massachusetts": "America/New_York",
+  "pennsylvania": "America/New_York",
+  "virginia": "America/New_York",
+  "michigan": "America/Detroit",
+  # Cities that tzdata doesn't name
+  "new york city": "America/New_York",
+  "nyc": "America/New_York",
+  "washington": "America/New_York",
+  "washington dc": "America/New_York",
+  "boston": "America/New_York",
+  "philadelphia": "America/New_York",
+  "atlanta": "America/New_York",
+  "miami": "America/New_York",
+  "orlando": "America/New_York",
+  "charlotte": "America/New_York",
+  "pittsburgh": "America/New_York",
+  "houston": "America/Chicago",
+  "dallas": "America/Chicago",
+  "austin": "America/Chicago",
+  "san antonio": "America/Chicago",
+  "new orleans": "America/Chicago",
+  "minneapolis": "America/Chicago",
+  "st louis": "America/Chicago",
+  "nashville": "America/Chicago",
+  "salt lake city": "America/Denver",
+  "las vegas": "America/Los_Angeles",
+  "san francisco": "America/Los_Angeles",
+  "sf": "America/Los_Angeles",
+  "la": "America/Los_Angeles",
+  "san diego": "America/Los_Angeles",
+  "san jose": "America/Los_Angeles",
+  "silicon valley": "America/Los_Angeles",
+  "seattle": "America/Los_Angeles",
+  "portland": "America/Los_Angeles",
+  "montreal": "America/Toronto",
+  "ottawa": "America/Toronto",
+  "calgary": "America/Edmonton",
+  "rio de janeiro": "America/Sao_Paulo",
+  "rio": "America/Sao_Paulo",
+  "brasilia": "America/Sao_Paulo",
+  "munich": "Europe/Berlin",
+  "hamburg": "Europe/Berlin",
+  "frankfurt": "Europe/Berlin",
+  "cologne": "Europe/Berlin",
+  "milan": "Europe/Rome",
+  "naples": "Europe/Rome",
+  "florence": "Europe/Rome",
+  "venice": "Europe/Rome",
+  "barcelona": "Europe/Madrid",
+  "seville": "Europe/Madrid",
+  "valencia": "Europe/Madrid",
+  "lyon": "Europe/Paris",
+  "marseille": "Europe/Paris",
+  "nice": "Europe/Paris",
+  "geneva": "Europe/Zurich",
+  "manchester": "Europe/London",
+  "edinburgh": "Europe/London",
+  "birmingham": "Europe/London",
+  "rotterdam": "Europe/Amsterdam",
+  "krakow": "Europe/Warsaw",
+  "st petersburg": "Europe/Moscow",
+  "saint petersburg": "Europe/Moscow",
+  "kiev": "Europe/Kyiv",
+  "mumbai": "Asia/Kolkata",
+  "bombay": "Asia/Kolkata",
+  "delhi": "Asia/Kolkata",
+  "new delhi": "Asia/Kolkata",
+  "bangalore": "Asia/Kolkata",
+  "bengaluru": "Asia/Kolkata",
+  "chennai": "Asia/Kolkata",
+  "hyderabad": "Asia/Kolkata",
+  "pune": "Asia/Kolkata",
+  "beijing": "Asia/Shanghai",
+  "shenzhen": "Asia/Shanghai",
+  "guangzhou": "Asia/Shanghai",
+  "hangzhou": "Asia/Shanghai",
+  "osaka": "Asia/Tokyo",
+  "kyoto": "Asia/Tokyo",
+  "busan": "Asia/Seoul",
+  "hanoi": "Asia/Bangkok",
+  "saigon": "Asia/Ho_Chi_Minh",
+  "abu dhabi": "Asia/Dubai",
+  "doha": "Asia/Qatar",
+  "tel aviv": "Asia/Jerusalem",
+  "islamabad": "Asia/Karachi",
+  "lahore": "Asia/Karachi",
+  "canberra": "Australia/Sydney",
+  "gold coast": "Australia/Brisbane",
+  "wellington": "Pacific/Auckland",
+  "cape town": "Africa/Johannesburg",
+  "abuja": "Africa/Lagos",
+}
+
+_SEPARATORS = re.compile(r"[\s_\-./,()']+")
+
+
+def normalize(text: str) -> str:
+  """Lowercase, strip accents and collapse separators: 'São_Paulo' -> 'sao paulo'"""
+  text = unicodedata.normalize("NFKD", text)
+  text = "".join(c for c in text if not unicodedata.combining(c))
+  return _SEPARATORS.sub(" ", text.lower()).strip()
+
+
+class TimezoneIndex:
+  """Maps normalized location keys to IANA zone names"""
+
+  def __init__(self):
+    self.zones: dict[str, str] = {}
+    self._sorted: list[str] = []
+    self._buckets: dict[tuple[str, int], list[str]] = {}
+    self._exact_only: set[str] = set()
+
+  def add(self, key: str, zone: str, replace: bool = False, fuzzy: bool = True):
+    """Map `key` to `zone`; keys added with `fuzzy=False` only match exactly"""
+    key = normalize(key)
+    if key and (replace or key not in self.zones):
+      self.zones[key] = zone
+      if not fuzzy:
+        self._exact_only.add(key)
+
+  def freeze(self):
+    """Build the prefix and fuzzy lookup tables once all keys are added"""
+    self._sorted = sorted(self.zones)
+    self._buckets = {}
+    for key in self._sorted:
+      if key in self._exact_only:
+        continue
+      self._buckets.setdefault((key[0], len(key)), []).append(key)
+
+  def _prefix(self, key: str) -> str | None:
+    # The shortest key starting with `key`, e.g. 'los ang' -> 'los angeles'
+    i = bisect.bisect_left(self._sorted, key)
+    matches = []
+    while i < len(self._sorted) and self._sorted[i].startswith(key):
+      matches.append(self._sorted[i])
+      i += 1
+    if not matches:
+      return None
+    return self.zones[min(matches, key=len)]
+
+  def _fuzzy(self, key: str) -> str | None:
+    # A similarity ratio of 0.8 needs lengths within 2:3 of each other, and
+    # typos rarely change the first letter, which keeps the candidates few
+    n = len(key)
+    candidates = [
+      candidate
+      for length in range(-(-2 * n // 3), 3 * n // 2 + 1)
+      for candidate in self._buckets.get((key[0], length), ())
+    ]
+    match = difflib.get_close_matches(key, candidates, n=1, cutoff=0.8)
+    return self.zones[match[0]] if match else None
+
+  def resolve(self, location: str) -> str | None:
+    """The zone for `location`, or None when nothing matches closely enough"""
+    key = normalize(location)
+    if not key:
+      return None
+    if key in self.zones:
+      return self.zones[key]
+
+    parts = [normalize(part) for part in location.split(",")]
+    if len(parts) > 1 and len(parts[-1]) == 2:
+      return self._resolve_code(parts[0], parts[-1])
+
+    # "Paris, France" or "Austin Texas": the place usually comes first
+    words = key.split()
+    candidates = [p for p in parts if p] + [
+      " ".join(words[:n]) for n in range(len(words) - 1, 0, -1)
+    ]
+    for candidate in candidates:
+      if candidate in self.zones:
+        return self.zones[candidate]
+
+    if len(key) >= 3:
+      return self._prefix(key) or self._fuzzy(key)
+    return None
+
+  def _resolve_code(self, place: str, code: str) -> str | None:
+    # "Toronto, CA" or "Fresno, CA": a known city in the country with that
+    # code wins, otherwise the code is a state or province. Two letters are
+    # too little to guess from, so nothing else is tried.
+    city = self.zones.get(place)
+    if city and city in pytz.country_timezones.get(code.upper(), ()):
+      return city
+    if code not in REGION_CODES:
+      return city
+    zone = REGION_CODES[code]
+    if zone is None and city and city.startswith(("America/", "Australia/")):
+      return city
+    return zone
+
+
+def build_index() -> TimezoneIndex:
+  index = TimezoneIndex()
+
+  def add_zones(zones):
+    for zone in zones:
+      # Full names crowd out the fuzzy candidates for a, e and p, and nobody
+      # misspells 'America/New_York' while also getting the region right
+      index.add(zone, zone, fuzzy="/" not in zone)
+      # City names: 'America/Argentina/Buenos_Aires' -> 'buenos aires'
+      index.add(zone.rsplit("/", 1)[-1], zone)
+
+  # Current zones go first, so that they win over deprecated links that
+  # share a city or country name ('Singapore' vs 'Asia/Singapore')
+  add_zones(pytz.common_timezones)
+  for code, zones in pytz.country_timezones.items():
+    zone = COUNTRY_ZONES.get(code, zones[0])
+    index.add(pytz.country_names[code], zone)
+  add_zones(pytz.all_timezones)
+  for key, zone in ALIASES.items():
+    index.add(key, zone, replace=True)
+  index.freeze()
+  return index
+
+
+@cache
+def timezone_index() -> TimezoneIndex:
+  """The process-wide index, built the first time it is needed"""
+  return build_index()
+
+
+@lru_cache(maxsize=4096)
+def resolve_timezone(location: str) -> str | None:
+  return timezone_index().resolve(location)
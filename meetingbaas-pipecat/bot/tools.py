@@ -0,0 +1,342 @@
+"""The bot's LLM functions and the runtime that executes them.
+
+Every session registers the same functions, so the runtime is process-wide:
+one pooled HTTP session, a per-tool timeout, a TTL/LRU cache of results,
+and single-flight execution, which lets concurrent identical calls (many
+meetings asking about the same city) share one upstream request.
+
+Each session's `ToolDispatcher` runs all the calls of one LLM response
+together instead of one after another, and can say a short filler line
+while they run so the meeting doesn't hear dead air.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Awaitable, Callable
+from urllib.parse import quote
+
+import aiohttp
+import pytz
+from loguru import logger
+from openai.types.chat import ChatCompletionToolParam
+
+from .timezones import resolve_timezone
+
+
+class ToolError(Exception):
+  """A tool failure whose message is passed to the LLM but never cached"""
+
+
+class TTLCache:
+  """A least-recently-used cache whose entries also expire after `ttl` seconds"""
+
+  def __init__(self, maxsize: int = 1024):
+    self.maxsize = maxsize
+    self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+  def get(self, key: str) -> str | None:
+    entry = self._entries.get(key)
+    if entry is None:
+      return None
+    expires, value = entry
+    if expires < time.monotonic():
+      del self._entries[key]
+      return None
+    self._entries.move_to_end(key)
+    return value
+
+  def set(self, key: str, value: str, ttl: float) -> None:
+    self._entries[key] = (time.monotonic() + ttl, value)
+    self._entries.move_to_end(key)
+    while len(self._entries) > self.maxsize:
+      self._entries.popitem(last=False)
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+
+Handler = Callable[["ToolRuntime", dict], Awaitable[str]]
+
+
+class Tool:
+  def __init__(
+    self, name: str, handler: Handler, schema: dict, timeout: float, ttl: float
+  ):
+    self.name = name
+    self.handler = handler
+    self.schema = schema
+    self.timeout = timeout
+    self.ttl = ttl
+
+
+def _normalize(value):
+  if isinstance(value, str):
+    return " ".join(value.lower().split())
+  if isinstance(value, dict):
+    return {k: _normalize(v) for k, v in value.items()}
+  if isinstance(value, list):
+    return [_normalize(v) for v in value]
+  return value
+
+
+class ToolRuntime:
+  """Runs registered tools for every session in the process"""
+
+  def __init__(self, cache_size: int = 1024):
+    self.tools: dict[str, Tool] = {}
+    self.cache = TTLCache(cache_size)
+    self._inflight: dict[str, asyncio.Task] = {}
+    self._http: aiohttp.ClientSession | None = None
+    self.calls = 0
+    self.hits = 0
+    self.coalesced = 0
+
+  def tool(
+    self,
+    name: str,
+    description: str,
+    parameters: dict,
+    timeout: float = 5.0,
+    ttl: float = 0,
+  ):
+    """Register a handler; results are cached for `ttl` seconds when positive"""
+
+    def register(handler: Handler) -> Handler:
+      schema = {"name": name, "description": description, "parameters": parameters}
+      self.tools[name] = Tool(name, handler, schema, timeout, ttl)
+      return handler
+
+    return register
+
+  @property
+  def http(self) -> aiohttp.ClientSession:
+    """The HTTP session tools share, created on first use"""
+    if self._http is None or self._http.closed:
+      self._http = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300)
+      )
+    return self._http
+
+  async def close(self):
+    if self._http is not None:
+      await self._http.close()
+
+  def schemas(self) -> list[ChatCompletionToolParam]:
+    return [
+      ChatCompletionToolParam(type="function", function=tool.schema)
+      for tool in self.tools.values()
+    ]
+
+  def register(self, llm, dispatcher: "ToolDispatcher | None" = None) -> None:
+    """Register every tool as a function of `llm`, run by `dispatcher` if given"""
+    callback = dispatcher.collect if dispatcher else self._callback
+    for name in self.tools:
+      llm.register_function(name, callback)
+
+  async def _callback(
+    self, function_name, tool_call_id, arguments, llm, context, result_callback
+  ):
+    await result_callback(await self.call(function_name, arguments))
+
+  async def call(
+    self, name: str, arguments: dict, deadline: float | None = None
+  ) -> str:
+    """The tool's result, or an apology once `deadline` seconds have passed.
+
+    The handler gets `arguments` normalized the way the cache key is, so calls
+    sharing a cache entry or a call in flight also share what the tool sees.
+    """
+    tool = self.tools[name]
+    arguments = _normalize(arguments)
+    key = f"{name}:{json.dumps(arguments, sort_keys=True)}"
+    self.calls += 1
+
+    if tool.ttl > 0:
+      cached = self.cache.get(key)
+      if cached is not None:
+        self.hits += 1
+        logger.debug(f"{name} cache hit for {arguments}")
+        return cached
+
+    task = self._inflight.get(key)
+    if task is None:
+      task = asyncio.create_task(self._run(tool, key, arguments))
+      self._inflight[key] = task
+      task.add_done_callback(lambda _: self._inflight.pop(key, None))
+    else:
+      self.coalesced += 1
+      logger.debug(f"{name} joined an identical call in flight for {arguments}")
+    # Shielded so a caller whose meeting ends doesn't cancel it for the others
+    if deadline is None or deadline >= tool.timeout:
+      return await asyncio.shield(task)
+    try:
+      return await asyncio.wait_for(asyncio.shield(task), deadline)
+    except asyncio.TimeoutError:
+      # It keeps running for any other caller, and its result is still cached
+      logger.warning(f"{name} missed its {deadline}s deadline for {arguments}")
+      return f"Sorry, {name.replace('_', ' ')} took too long to respond."
+
+  async def _run(self, tool: Tool, key: str, arguments: dict) -> str:
+    try:
+      result = await asyncio.wait_for(tool.handler(self, arguments), tool.timeout)
+    except ToolError as e:
+      return str(e)
+    except asyncio.TimeoutError:
+      logger.warning(f"{tool.name} timed out after {tool.timeout}s for {arguments}")
+      return f"Sorry, {tool.name.replace('_', ' ')} took too long to respond."
+    except Exception as e:
+      logger.error(f"{tool.name} failed for {arguments}: {e}")
+      return f"Sorry, {tool.name.replace('_', ' ')} failed."
+    if tool.ttl > 0:
+      self.cache.set(key, result, tool.ttl)
+    return result
+
+  def stats(self) -> dict[str, int]:
+    return {
+      "calls": self.calls,
+      "cache_hits": self.hits,
+      "coalesced": self.coalesced,
+      "cached": len(self.cache),
+    }
+
+
+class ToolDispatcher:
+  """Runs the tool calls of one LLM response concurrently.
+
+  pipecat calls the functions of a response one after another, awaiting
+  each, so a turn asking for two cities' weather waited for both requests in
+  turn. Registered through a dispatcher, each function only records the
+  call. Once the LLM service has read the whole response, it calls `run()`,
+  which starts every call at once, each limited to `deadline` seconds. If
+  they haven't all returned after `filler_after` seconds, `speak(filler)`
+  fills the silence. Results go back in the order the calls were made, after
+  the last one is in, so the LLM runs once with all of them.
+  """
+
+  def __init__(
+    self,
+    runtime: ToolRuntime,
+    deadline: float = 4.0,
+    filler: str | None = None,
+    filler_after: float = 0.7,
+  ):
+    self.runtime = runtime
+    self.deadline = deadline
+    self.filler = filler
+    self.filler_after = filler_after
+    self._calls: list[tuple[str, dict, Callable]] = []
+    self.batches = 0
+    self.fillers = 0
+
+  async def collect(
+    self, function_name, tool_call_id, arguments, llm, context, result_callback
+  ):
+    self._calls.append((function_name, arguments, result_callback))
+
+  def reset(self):
+    """Forget calls collected for a response that was never run"""
+    self._calls.clear()
+
+  async def run(self, speak: Callable[[str], Awaitable[None]]):
+    calls, self._calls = self._calls, []
+    if not calls:
+      return
+    self.batches += 1
+    started = time.perf_counter()
+    tasks = [
+      asyncio.ensure_future(self.runtime.call(name, arguments, self.deadline))
+      for name, arguments, _ in calls
+    ]
+    try:
+      if self.filler:
+        _, pending = await asyncio.wait(tasks, timeout=self.filler_after)
+        if pending:
+          self.fillers += 1
+          await speak(self.filler)
+      results = await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+      # Interrupted; the calls themselves are shielded inside the runtime
+      for task in tasks:
+        task.cancel()
+      raise
+    logger.debug(
+      f"Ran {len(calls)} tool calls together in {time.perf_counter() - started:.2f}s"
+    )
+    for (_, _, result_callback), result in zip(calls, results):
+      await result_callback(result)
+
+
+runtime = ToolRuntime()
+
+
+@runtime.tool(
+  "get_weather",
+  "Get the current weather",
+  {
+    "type": "object",
+    "properties": {
+      "location": {
+        "type": "string",
+        "description": "The city and state, e.g. San Francisco, CA",
+      },
+      "format": {
+        "type": "string",
+        "enum": ["celsius", "fahrenheit"],
+        "description": "The temperature unit to use. Infer this from the users location.",
+      },
+    },
+    "required": ["location", "format"],
+  },
+  timeout=5.0,
+  ttl=600,
+)
+async def get_weather(runtime: ToolRuntime, arguments: dict) -> str:
+  location = arguments["location"]
+  format = arguments["format"]
+  unit = "m" if format == "celsius" else "u"  # "m" for metric, "u" for imperial
+
+  base_url = os.getenv("WEATHER_API_URL", "https://wttr.in")
+  url = f"{base_url}/{quote(location)}?format=%t+%C&{unit}"
+  async with runtime.http.get(url) as response:
+    if response.status != 200:
+      raise ToolError(f"Failed to fetch the weather data for {location}.")
+    weather_data = await response.text()
+  return (
+    f"The weather in {location} is currently {weather_data} ({format.capitalize()})."
+  )
+
+
+@runtime.tool(
+  "get_time",
+  "Get the current time for a specific location",
+  {
+    "type": "object",
+    "properties": {
+      "location": {
+        "type": "string",
+        "description": "The city, country, time zone abbreviation or IANA time zone for which to retrieve the current time (e.g., 'Mumbai', 'Tokyo, Japan', 'PST', 'America/New_York')",
+      },
+    },
+    "required": ["location"],
+  },
+  timeout=1.0,
+)
+async def get_time(runtime: ToolRuntime, arguments: dict) -> str:
+  location = arguments["location"]
+  zone = resolve_timezone(location)
+  if zone is None:
+    raise ToolError(
+      f"Invalid location specified. Could not determine time for {location}."
+    )
+  formatted_time = datetime.now(_timezone(zone)).strftime("%Y-%m-%d %H:%M:%S")
+  return f"The current time in {location} ({zone}) is {formatted_time}."
+
+
+@lru_cache(maxsize=512)
+def _timezone(name: str):
+  return pytz.timezone(name)
@@ -0,0 +1,200 @@
+"""Per-turn latency tracing across the bot's pipeline.
+
+`TurnTracer.watch` hooks the `push_frame` of a stage of the pipeline and
+stamps the time that stage first pushes a frame of a given kind in each turn:
+VAD deciding the user stopped, Deepgram's final transcript, the context
+reaching the LLM, its first text, Cartesia's first audio and the bot
+starting to speak. When the bot starts speaking, `TurnTracer` turns the
+stamps into per-stage durations. These are written as one JSON record per
+turn and added to process-wide histograms, which are exported over HTTP and
+summarized as p50/p95/p99 in the log.
+
+Watching a stage adds an `isinstance` to each frame it pushes rather than a
+processor of its own, which would give every frame another queue hop.
+"""
+
+import itertools
+import json
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from loguru import logger
+from pipecat.frames.frames import Frame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from ..prometheus import Histogram, render_families
+
+# Seconds, from 10 ms to 10 s
+STAGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0)
+
+# Each stage runs from the first mark to the second
+STAGES = (
+  ("stt", "vad_stop", "transcript"),
+  ("aggregation", "transcript", "llm_request"),
+  ("llm_ttft", "llm_request", "llm_first_text"),
+  ("tts_ttfb", "llm_first_text", "tts_first_audio"),
+  ("output", "tts_first_audio", "bot_started"),
+  ("total", "vad_stop", "bot_started"),
+)
+
+
+class TraceStats:
+  """Stage durations of every traced turn in the process"""
+
+  def __init__(self, window: int = 1000, log_every: int = 20):
+    self.histograms = {stage: Histogram(STAGE_BUCKETS) for stage, *_ in STAGES}
+    self.recent = {stage: deque(maxlen=window) for stage, *_ in STAGES}
+    self.turns = 0
+    self.log_every = log_every
+    self._file = None
+
+  def open(self, path: str):
+    """Append every turn's record to `path` as a line of JSON"""
+    self._file = open(path, "a", buffering=1)
+
+  def close(self):
+    if self._file:
+      self._file.close()
+      self._file = None
+
+  def record(self, record: dict):
+    self.turns += 1
+    for stage, seconds in record["stages"].items():
+      self.histograms[stage].observe(seconds)
+      self.recent[stage].append(seconds)
+    if self._file:
+      self._file.write(json.dumps(record) + "\n")
+    if self.turns % self.log_every == 0:
+      logger.info(f"Turn latency after {self.turns} turns: {self.summary()}")
+
+  def quantiles(self, stage: str) -> dict[str, float]:
+    values = sorted(self.recent[stage])
+    if not values:
+      return {}
+    return {
+      q: values[min(len(values) - 1, int(len(values) * float(q)))]
+      for q in ("0.5", "0.95", "0.99")
+    }
+
+  def summary(self) -> str:
+    parts = []
+    for stage, *_ in STAGES:
+      q = self.quantiles(stage)
+      if q:
+        parts.append(
+          f"{stage} p50/p95/p99 {q['0.5'] * 1000:.0f}/{q['0.95'] * 1000:.0f}/"
+          f"{q['0.99'] * 1000:.0f} ms"
+        )
+    return ", ".join(parts)
+
+  def collect(self) -> list:
+    histogram_samples = []
+    quantile_samples = []
+    for stage, *_ in STAGES:
+      histogram_samples.extend(
+        self.histograms[stage].samples("bot_turn_stage_seconds", {"stage": stage})
+      )
+      quantile_samples.extend(
+        ("bot_turn_stage_recent_seconds", {"stage": stage, "quantile": q}, value)
+        for q, value in self.quantiles(stage).items()
+      )
+    return [
+      (
+        "bot_turn_stage_seconds",
+        "histogram",
+        "Time spent in each stage of a turn, from the user stopping to the bot speaking",
+        histogram_samples,
+      ),
+      (
+        "bot_turn_stage_recent_seconds",
+        "gauge",
+        "Quantiles of each stage over the most recent turns",
+        quantile_samples,
+      ),
+      (
+        "bot_turns_traced_total",
+        "counter",
+        "Turns traced",
+        [("bot_turns_traced_total", {}, self.turns)],
+      ),
+    ]
+
+  def render(self) -> str:
+    return render_families(self.collect())
+
+
+_sessions = itertools.count(1)
+
+
+class TurnTracer:
+  """Collects the marks of one session's turns and reports each turn"""
+
+  def __init__(self, stats: TraceStats, vad_stop_secs: float = 0):
+    self.stats = stats
+    self.session = next(_sessions)
+    self.vad_stop_secs = vad_stop_secs
+    self.turn = 0
+    self._marks: dict[str, float] | None = None
+    self._transcript: float | None = None
+
+  def watch(
+    self, processor: FrameProcessor, mark: str, *frame_types: type[Frame]
+  ) -> FrameProcessor:
+    """Mark `mark` whenever `processor` pushes a frame of `frame_types`
+    downstream, and return `processor`"""
+    push_frame = processor.push_frame
+
+    async def traced_push_frame(
+      frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM
+    ):
+      if direction == FrameDirection.DOWNSTREAM and isinstance(frame, frame_types):
+        self.mark(mark)
+      await push_frame(frame, direction)
+
+    processor.push_frame = traced_push_frame
+    return processor
+
+  def mark(self, mark: str):
+    now = time.perf_counter()
+    if mark == "vad_stop":
+      # The user paused and went on before we answered, so the turn starts
+      # again; once the LLM has the request, a new stop starts a new turn
+      if self._marks is None or "llm_request" in self._marks:
+        self._marks = {}
+      self._marks["vad_stop"] = now
+      if self._transcript is not None:
+        # The final transcript came in before VAD called the end of speech
+        self._marks["transcript"] = now
+        self._transcript = None
+    elif self._marks is None:
+      if mark == "transcript":
+        self._transcript = now
+    elif mark == "transcript":
+      self._marks["transcript"] = now  # the last final of the turn counts
+    elif mark not in self._marks and "vad_stop" in self._marks:
+      self._marks[mark] = now
+      if mark == "bot_started":
+        self._finish()
+
+  def _finish(self):
+    marks, self._marks = self._marks, None
+    marks.setdefault("transcript", marks["vad_stop"])
+    if "llm_request" not in marks:
+      return  # the bot spoke without a request, e.g. a cached greeting
+    stages = {
+      stage: max(0.0, marks[end] - marks[start])
+      for stage, start, end in STAGES
+      if start in marks and end in marks
+    }
+    self.turn += 1
+    self.stats.record(
+      {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "session": self.session,
+        "turn": self.turn,
+        "vad_stop_secs": self.vad_stop_secs,
+        "stages": stages,
+        "perceived_total": stages.get("total", 0.0) + self.vad_stop_secs,
+      }
+    )
@@ -0,0 +1,246 @@
+"""A pipecat transport for one already-accepted WebSocket connection.
+
+`WebsocketServerTransport` owns its server and keeps a single client, so it
+can only ever serve one meeting per process. This transport instead wraps a
+connection accepted elsewhere, which lets a server run one pipeline per
+connection. It speaks the same protobuf frames as `WebsocketServerTransport`.
+
+Both this transport and `InterruptibleWebsocketServerTransport` send audio
+through `InterruptibleOutputTransport`, which stops the bot's speech as soon
+as the user interrupts it.
+"""
+
+import asyncio
+import time
+
+from loguru import logger
+from pipecat.frames.frames import (
+  AudioRawFrame,
+  CancelFrame,
+  EndFrame,
+  Frame,
+  InputAudioRawFrame,
+  OutputAudioRawFrame,
+  StartFrame,
+  StartInterruptionFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.transports.base_input import BaseInputTransport
+from pipecat.transports.base_output import BaseOutputTransport
+from pipecat.transports.base_transport import BaseTransport
+from pipecat.transports.network.websocket_server import (
+  WebsocketServerInputTransport,
+  WebsocketServerOutputTransport,
+  WebsocketServerParams,
+  WebsocketServerTransport,
+)
+from websockets.exceptions import ConnectionClosed
+
+from ..protocol import READY_PATH, encode_interruption
+
+INTERRUPTION_MESSAGE = encode_interruption()
+
+
+class WebsocketSessionInputTransport(BaseInputTransport):
+  def __init__(self, transport, websocket, params: WebsocketServerParams, **kwargs):
+    super().__init__(params, **kwargs)
+    self._transport = transport
+    self._websocket = websocket
+    self._params = params
+    self._receive_task = None
+
+  async def start(self, frame: StartFrame):
+    await super().start(frame)
+    self._receive_task = self.get_event_loop().create_task(self._receive_messages())
+    await self._transport._call_event_handler("on_client_connected", self._websocket)
+
+  async def stop(self, frame: EndFrame):
+    await super().stop(frame)
+    await self._stop_receiving()
+
+  async def cancel(self, frame: CancelFrame):
+    await super().cancel(frame)
+    await self._stop_receiving()
+
+  async def _stop_receiving(self):
+    await self._websocket.close()
+    if self._receive_task and self._receive_task is not asyncio.current_task():
+      self._receive_task.cancel()
+      await asyncio.gather(self._receive_task, return_exceptions=True)
+    self._receive_task = None
+
+  async def _receive_messages(self):
+    try:
+      async for message in self._websocket:
+        frame = self._params.serializer.deserialize(message)
+        if not frame:
+          continue
+        if isinstance(frame, AudioRawFrame):
+          await self.push_audio_frame(
+            InputAudioRawFrame(
+              audio=frame.audio,
+              sample_rate=frame.sample_rate,
+              num_channels=frame.num_channels,
+            )
+          )
+        else:
+          await self.push_frame(frame)
+    except ConnectionClosed:
+      pass
+    logger.info(f"Client {self._websocket.remote_address} disconnected")
+    await self._transport._call_event_handler("on_client_disconnected", self._websocket)
+
+
+class InterruptibleOutputTransport(BaseOutputTransport):
+  """Sends audio to `self._websocket` in real time, or `lead` seconds ahead.
+
+  Audio that has been sent can't be taken back, so only `lead` seconds of it
+  ever leave early; a lead absorbs network jitter at the cost of that much
+  speech after an interruption. The rest waits in the sink queue, which
+  pipecat empties when the user interrupts. The transport then also drops
+  its partial chunk, which would otherwise start the next reply, and tells
+  the proxy to drop what it still holds for the meeting. Each interruption
+  logs its stop latency: how long flushing took plus what the meeting may
+  still play of the audio already sent.
+
+  What is still waiting to be sent is counted as audio frames come in and
+  are written out, rather than read off pipecat's internal queues.
+  """
+
+  def __init__(self, params: WebsocketServerParams, lead: float = 0.0, **kwargs):
+    super().__init__(params, **kwargs)
+    self._params = params
+    self._lead = lead
+    self._websocket = None
+    self._bytes_per_second = (
+      params.audio_out_sample_rate * params.audio_out_channels * 2
+    )
+    # When the meeting will have played everything sent so far
+    self._played_until = 0.0
+    # Bytes of audio received but not yet written to the websocket
+    self._unsent = 0
+    self.interruptions = 0
+
+  async def process_frame(self, frame: Frame, direction: FrameDirection):
+    if isinstance(frame, OutputAudioRawFrame):
+      self._unsent += len(frame.audio)
+    elif isinstance(frame, StartInterruptionFrame) and self.interruptions_allowed:
+      await self._interrupt(frame, direction)
+      return
+    await super().process_frame(frame, direction)
+
+  async def _interrupt(self, frame: StartInterruptionFrame, direction: FrameDirection):
+    started = time.monotonic()
+    # The partial chunk, the sink queue and the audio queue, all dropped by
+    # the base transport
+    queued, self._unsent = self._unsent, 0
+    await super().process_frame(frame, direction)
+    self._audio_buffer = bytearray()
+    still_playing = max(0.0, self._played_until - started)
+    if not queued and not still_playing:
+      return  # the bot wasn't talking
+    self.interruptions += 1
+    if self._websocket:
+      try:
+        await self._websocket.send(INTERRUPTION_MESSAGE)
+      except ConnectionClosed:
+        pass
+    flushed = time.monotonic() - started
+    logger.info(
+      f"Interrupted: stop latency {(flushed + still_playing) * 1000:.0f} ms "
+      f"({flushed * 1000:.1f} ms to flush, {still_playing * 1000:.0f} ms already "
+      f"sent), dropped {queued / self._bytes_per_second * 1000:.0f} ms of speech"
+    )
+
+  async def write_raw_audio_frames(self, frames: bytes):
+    self._unsent = max(0, self._unsent - len(frames))
+    if not self._websocket:
+      return
+    frame = AudioRawFrame(
+      audio=frames,
+      sample_rate=self._params.audio_out_sample_rate,
+      num_channels=self._params.audio_out_channels,
+    )
+    proto = self._params.serializer.serialize(frame)
+    if proto:
+      try:
+        await self._websocket.send(proto)
+      except ConnectionClosed:
+        return
+
+    now = time.monotonic()
+    self._played_until = (
+      max(self._played_until, now) + len(frames) / self._bytes_per_second
+    )
+    await asyncio.sleep(max(0.0, self._played_until - self._lead - now))
+
+
+class WebsocketSessionOutputTransport(InterruptibleOutputTransport):
+  def __init__(self, websocket, params: WebsocketServerParams, **kwargs):
+    super().__init__(params, **kwargs)
+    self._websocket = websocket
+
+
+class WebsocketSessionTransport(BaseTransport):
+  def __init__(
+    self,
+    websocket,
+    params: WebsocketServerParams,
+    input_name: str | None = None,
+    output_name: str | None = None,
+    output_lead: float = 0.0,
+  ):
+    super().__init__(input_name=input_name, output_name=output_name)
+    self._params = params
+    self._input = WebsocketSessionInputTransport(
+      self, websocket, params, name=self._input_name
+    )
+    self._output = WebsocketSessionOutputTransport(
+      websocket, params, lead=output_lead, name=self._output_name
+    )
+    self._register_event_handler("on_client_connected")
+    self._register_event_handler("on_client_disconnected")
+
+  def input(self) -> WebsocketSessionInputTransport:
+    return self._input
+
+  def output(self) -> WebsocketSessionOutputTransport:
+    return self._output
+
+
+class InterruptibleWebsocketServerOutputTransport(
+  InterruptibleOutputTransport, WebsocketServerOutputTransport
+):
+  pass
+
+
+class ProbedWebsocketServerInputTransport(WebsocketServerInputTransport):
+  async def _client_handler(self, websocket, path):
+    # A readiness probe must not displace the meeting or start a conversation
+    if path == READY_PATH:
+      await websocket.close()
+      return
+    await super()._client_handler(websocket, path)
+
+
+class InterruptibleWebsocketServerTransport(WebsocketServerTransport):
+  """`WebsocketServerTransport`, with the output of the multi-session server
+  and an input that answers readiness probes"""
+
+  def __init__(self, *args, output_lead: float = 0.0, **kwargs):
+    super().__init__(*args, **kwargs)
+    self._output_lead = output_lead
+
+  def input(self) -> ProbedWebsocketServerInputTransport:
+    if not self._input:
+      self._input = ProbedWebsocketServerInputTransport(
+        self._host, self._port, self._params, self._callbacks, name=self._input_name
+      )
+    return self._input
+
+  def output(self) -> InterruptibleWebsocketServerOutputTransport:
+    if not self._output:
+      self._output = InterruptibleWebsocketServerOutputTransport(
+        self._params, lead=self._output_lead, name=self._output_name
+      )
+    return self._output
@@ -0,0 +1,299 @@
+"""Cache synthesized speech so fixed and common phrases skip Cartesia.
+
+Audio is keyed by voice, sample rate and normalized text. It is kept in an
+in-memory LRU bounded by a byte budget, and optionally in a directory so it
+survives restarts. Fixed utterances (the greeting and the tool filler) can be
+synthesized over Cartesia's HTTP API at startup. Sentences the LLM keeps
+repeating are synthesized in the background once they've been seen a few
+times, and play from the cache after that.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncGenerator
+
+import aiohttp
+from loguru import logger
+from pipecat.frames.frames import (
+  Frame,
+  LLMFullResponseEndFrame,
+  LLMFullResponseStartFrame,
+  StartInterruptionFrame,
+  TTSAudioRawFrame,
+  TTSStartedFrame,
+  TTSStoppedFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.services.cartesia import CartesiaTTSService
+
+from .startup import WebsocketPreconnector, cartesia_websocket_url
+
+
+def cache_key(voice_id: str, sample_rate: int, text: str) -> str:
+  normalized = " ".join(text.lower().split())
+  return hashlib.sha256(f"{voice_id}:{sample_rate}:{normalized}".encode()).hexdigest()
+
+
+class TTSCache:
+  """Raw PCM by cache key, in memory up to `max_bytes` and optionally on disk"""
+
+  def __init__(self, max_bytes: int = 64 * 1024 * 1024, directory: str | None = None):
+    self.max_bytes = max_bytes
+    self.directory = Path(directory) if directory else None
+    if self.directory:
+      self.directory.mkdir(parents=True, exist_ok=True)
+    self._entries: OrderedDict[str, bytes] = OrderedDict()
+    self.bytes = 0
+    self.hits = 0
+    self.misses = 0
+
+  def _path(self, key: str) -> Path:
+    return self.directory / f"{key}.pcm"
+
+  def _remember(self, key: str, audio: bytes):
+    if len(audio) > self.max_bytes:
+      return
+    if key in self._entries:
+      self.bytes -= len(self._entries.pop(key))
+    self._entries[key] = audio
+    self.bytes += len(audio)
+    while self.bytes > self.max_bytes:
+      _, evicted = self._entries.popitem(last=False)
+      self.bytes -= len(evicted)
+
+  def __contains__(self, key: str) -> bool:
+    """Whether the audio is in memory; `get` also looks on disk"""
+    return key in self._entries
+
+  async def get(self, key: str) -> bytes | None:
+    audio = self._entries.get(key)
+    if audio is None and self.directory:
+      audio = await asyncio.to_thread(self._read, key)
+      if audio is not None:
+        self._remember(key, audio)
+    if audio is None:
+      self.misses += 1
+      return None
+    self._entries.move_to_end(key)
+    self.hits += 1
+    return audio
+
+  async def put(self, key: str, audio: bytes):
+    self._remember(key, audio)
+    if self.directory:
+      await asyncio.to_thread(self._write, key, audio)
+
+  def _read(self, key: str) -> bytes | None:
+    try:
+      return self._path(key).read_bytes()
+    except FileNotFoundError:
+      return None
+
+  def _write(self, key: str, audio: bytes):
+    # Written aside and renamed, so other bot processes never read half a file
+    path = self._path(key)
+    partial = path.with_suffix(f".{os.getpid()}.tmp")
+    partial.write_bytes(audio)
+    partial.replace(path)
+
+
+class CartesiaSynthesizer:
+  """Synthesizes whole utterances with Cartesia's HTTP API"""
+
+  def __init__(
+    self,
+    api_key: str,
+    model: str = "sonic-english",
+    language: str = "en",
+    url: str = "https://api.cartesia.ai/tts/bytes",
+    cartesia_version: str = "2024-06-10",
+  ):
+    self.api_key = api_key
+    self.model = model
+    self.language = language
+    self.url = url
+    self.cartesia_version = cartesia_version
+    self._http: aiohttp.ClientSession | None = None
+
+  async def synthesize(self, text: str, voice_id: str, sample_rate: int) -> bytes:
+    if self._http is None or self._http.closed:
+      self._http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+    async with self._http.post(
+      self.url,
+      headers={"X-API-Key": self.api_key, "Cartesia-Version": self.cartesia_version},
+      json={
+        "model_id": self.model,
+        "transcript": text,
+        "voice": {"mode": "id", "id": voice_id},
+        "output_format": {
+          "container": "raw",
+          "encoding": "pcm_s16le",
+          "sample_rate": sample_rate,
+        },
+        "language": self.language,
+      },
+    ) as response:
+      if response.status != 200:
+        raise RuntimeError(
+          f"Cartesia returned {response.status}: {await response.text()}"
+        )
+      return await response.read()
+
+  async def close(self):
+    if self._http is not None:
+      await self._http.close()
+
+
+async def presynthesize(
+  cache: TTSCache,
+  synthesizer: CartesiaSynthesizer,
+  phrases: list[str],
+  voice_id: str,
+  sample_rate: int,
+  concurrency: int = 4,
+):
+  """Make sure every phrase is cached, synthesizing the ones that aren't"""
+  semaphore = asyncio.Semaphore(concurrency)
+
+  async def ensure(text: str) -> bool:
+    key = cache_key(voice_id, sample_rate, text)
+    if await cache.get(key) is not None:  # loads it into memory from disk
+      return False
+    async with semaphore:
+      try:
+        await cache.put(key, await synthesizer.synthesize(text, voice_id, sample_rate))
+        return True
+      except Exception as e:
+        logger.warning(f"Could not pre-synthesize [{text}]: {e}")
+        return False
+
+  synthesized = await asyncio.gather(*(ensure(text) for text in phrases))
+  logger.info(
+    f"{len(phrases)} phrases ready for voice {voice_id}, "
+    f"{sum(synthesized)} synthesized, {len(phrases) - sum(synthesized)} cached"
+  )
+
+
+class CachedCartesiaTTSService(CartesiaTTSService):
+  """A `CartesiaTTSService` that plays cached audio instead of synthesizing it.
+
+  Only sentences that start a response are served from the cache, because
+  audio still streaming in for an earlier sentence would otherwise play after
+  them. Sentences that miss `promote_after` times are synthesized in the
+  background and cached for next time. With a `preconnector`, the websocket
+  is taken from its spares rather than opened when the session starts.
+
+  On an interruption, Cartesia is told to stop generating the interrupted
+  context instead of streaming audio that would only be ignored.
+  """
+
+  # Shared by every session in the process, like the cache itself
+  _misses: dict[str, int] = {}
+  _promoting: set[str] = set()
+
+  def __init__(
+    self,
+    *,
+    cache: TTSCache,
+    synthesizer: CartesiaSynthesizer | None = None,
+    promote_after: int = 3,
+    max_promoted_chars: int = 200,
+    preconnector: WebsocketPreconnector | None = None,
+    **kwargs,
+  ):
+    super().__init__(**kwargs)
+    self._preconnector = preconnector
+    self._cache = cache
+    self._synthesizer = synthesizer
+    self._promote_after = promote_after
+    self._max_promoted_chars = max_promoted_chars
+    self._served_from_cache = False
+
+  async def _connect(self):
+    url = cartesia_websocket_url(self._api_key, self._url, self._cartesia_version)
+    websocket = self._preconnector.take(url) if self._preconnector else None
+    if websocket is None:
+      await super()._connect()
+      return
+    self._websocket = websocket
+    self._receive_task = self.get_event_loop().create_task(self._receive_task_handler())
+
+  async def _handle_interruption(
+    self, frame: StartInterruptionFrame, direction: FrameDirection
+  ):
+    context_id = self._context_id
+    await super()._handle_interruption(frame, direction)
+    if context_id and self._websocket:
+      try:
+        await self._websocket.send(
+          json.dumps({"context_id": context_id, "cancel": True})
+        )
+      except Exception as e:
+        logger.warning(f"{self} could not cancel the interrupted speech: {e}")
+
+  async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+    key = cache_key(self._voice_id, self.sample_rate, text)
+    audio = await self._cache.get(key) if not self._context_id else None
+    if audio is None:
+      self._count_miss(key, text)
+      async for frame in super().run_tts(text):
+        yield frame
+      return
+
+    logger.debug(f"Playing cached TTS: [{text}]")
+    self._served_from_cache = True
+    yield TTSStartedFrame()
+    yield TTSAudioRawFrame(audio=audio, sample_rate=self.sample_rate, num_channels=1)
+    yield TTSStoppedFrame()
+    # Word timings spread over the audio, so the assistant context gets the
+    # text in step with playback the way it does for Cartesia's timestamps
+    words = text.split()
+    duration = len(audio) / 2 / self.sample_rate
+    self.start_word_timestamps()
+    await self.add_word_timestamps(
+      [(word, duration * i / len(words)) for i, word in enumerate(words)]
+    )
+
+  async def process_frame(self, frame: Frame, direction: FrameDirection):
+    if isinstance(frame, LLMFullResponseStartFrame):
+      self._served_from_cache = False
+      if not self._context_id:
+        self.reset_word_timestamps()  # left over from a cached TTSSpeakFrame
+    await super().process_frame(frame, direction)
+    # Cartesia ends the response once its last audio is done; when all of it
+    # came from the cache, nothing will, so end it here
+    if isinstance(frame, LLMFullResponseEndFrame) and self._served_from_cache:
+      self._served_from_cache = False
+      if not self._context_id:
+        await self.add_word_timestamps([("LLMFullResponseEndFrame", 0), ("Reset", 0)])
+
+  def _count_miss(self, key: str, text: str):
+    if (
+      not self._synthesizer
+      or len(text) > self._max_promoted_chars
+      or key in self._promoting
+      or key in self._cache
+    ):
+      return
+    if len(self._misses) >= 10000:
+      self._misses.clear()  # one-off sentences would otherwise pile up forever
+    misses = self._misses.get(key, 0) + 1
+    self._misses[key] = misses
+    if misses >= self._promote_after:
+      self._promoting.add(key)
+      self.get_event_loop().create_task(self._promote(key, text))
+
+  async def _promote(self, key: str, text: str):
+    try:
+      audio = await self._synthesizer.synthesize(text, self._voice_id, self.sample_rate)
+      await self._cache.put(key, audio)
+      logger.debug(f"Cached frequent TTS phrase: [{text}]")
+    except Exception as e:
+      logger.warning(f"Could not cache TTS phrase [{text}]: {e}")
+    finally:
+      self._misses.pop(key, None)
+      self._promoting.discard(key)
@@ -0,0 +1,192 @@
+"""Silero VAD with one ONNX model shared by every session in the process.
+
+pipecat's `SileroVADAnalyzer` loads its own `InferenceSession` per instance.
+The session itself is stateless and safe to call from several threads, and
+the recurrent state Silero needs lives in the `SileroOnnxModel` wrapper, so
+each analyzer here gets its own wrapper around a single shared session.
+
+With many sessions, a `VADBatcher` can also merge their chunks into batched
+inferences. Analyzers run on executor threads, so each one simply blocks
+until the batch holding its chunk has run.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import cache
+from importlib import resources
+
+import numpy as np
+from loguru import logger
+from pipecat.audio.vad.silero import SileroOnnxModel, SileroVADAnalyzer
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+
+
+@cache
+def silero_session():
+  """Load the Silero model the first time it is needed"""
+  logger.debug("Loading shared Silero VAD model...")
+  path = resources.files("pipecat.audio.vad.data").joinpath("silero_vad.onnx")
+  model = SileroOnnxModel(str(path), force_onnx_cpu=True)
+  logger.debug("Loaded shared Silero VAD model")
+  return model.session
+
+
+class VADBatcher:
+  """Runs Silero on chunks from many sessions as batched inferences.
+
+  A batch is cut once `max_batch` chunks are waiting or `window_ms` after its
+  first chunk arrived, whichever comes first. Each chunk carries its own
+  session's recurrent state, so batching doesn't change any result.
+  """
+
+  def __init__(
+    self, session, window_ms: float = 5, max_batch: int = 32, log_interval: float = 60
+  ):
+    self.session = session
+    self.window = window_ms / 1000
+    self.max_batch = max_batch
+    self.log_interval = log_interval
+    self._requests: queue.SimpleQueue = queue.SimpleQueue()
+    self._reset_stats()
+    self._thread = threading.Thread(target=self._run, name="vad-batcher", daemon=True)
+    self._thread.start()
+
+  def _reset_stats(self):
+    self.batches = 0
+    self.chunks = 0
+    self.wait_seconds = 0.0  # time chunks spent waiting for their batch
+    self.max_wait_seconds = 0.0
+    self._stats_since = time.monotonic()
+
+  def submit(self, x: np.ndarray, state: np.ndarray, sr: int) -> Future:
+    """Queue one (1, n) chunk, with context, and its (2, 1, 128) state"""
+    future = Future()
+    self._requests.put((x, state, sr, future, time.perf_counter()))
+    return future
+
+  def stats(self) -> dict[str, float]:
+    return {
+      "batches": self.batches,
+      "chunks": self.chunks,
+      "mean_batch": self.chunks / self.batches if self.batches else 0.0,
+      "fill_rate": self.chunks / (self.batches * self.max_batch)
+      if self.batches
+      else 0.0,
+      "mean_wait_ms": self.wait_seconds / self.chunks * 1000 if self.chunks else 0.0,
+      "max_wait_ms": self.max_wait_seconds * 1000,
+    }
+
+  def _collect(self) -> list:
+    batch = [self._requests.get()]
+    deadline = time.perf_counter() + self.window
+    while len(batch) < self.max_batch:
+      remaining = deadline - time.perf_counter()
+      try:
+        batch.append(
+          self._requests.get(timeout=remaining)
+          if remaining > 0
+          else self._requests.get_nowait()
+        )
+      except queue.Empty:
+        break
+    return batch
+
+  def _infer(self, batch: list):
+    started = time.perf_counter()
+    try:
+      out, state = self.session.run(
+        None,
+        {
+          "input": np.concatenate([x for x, *_ in batch]),
+          "state": np.concatenate([s for _, s, *_ in batch], axis=1),
+          "sr": np.array(batch[0][2], dtype="int64"),
+        },
+      )
+    except Exception as e:
+      for *_, future, _ in batch:
+        future.set_exception(e)
+      return
+    for i, (*_, future, submitted) in enumerate(batch):
+      future.set_result((out[i : i + 1], state[:, i : i + 1]))
+      wait = started - submitted
+      self.wait_seconds += wait
+      self.max_wait_seconds = max(self.max_wait_seconds, wait)
+    self.batches += 1
+    self.chunks += len(batch)
+
+  def _run(self):
+    while True:
+      batch = self._collect()
+      # Chunks only batch with others of the same sample rate and length
+      groups: dict[tuple, list] = {}
+      for request in batch:
+        groups.setdefault((request[2], request[0].shape[1]), []).append(request)
+      for group in groups.values():
+        self._infer(group)
+
+      if time.monotonic() - self._stats_since >= self.log_interval:
+        stats = self.stats()
+        logger.info(
+          f"VAD batches: {stats['batches']}, mean size {stats['mean_batch']:.1f} "
+          f"({stats['fill_rate']:.0%} full), added latency "
+          f"{stats['mean_wait_ms']:.2f} ms mean / {stats['max_wait_ms']:.2f} ms max"
+        )
+        self._reset_stats()
+
+
+@cache
+def vad_batcher(window_ms: float, max_batch: int) -> VADBatcher:
+  """The process-wide batcher, started the first time it is needed"""
+  return VADBatcher(silero_session(), window_ms, max_batch)
+
+
+class _SharedSessionModel(SileroOnnxModel):
+  def __init__(self, session, batcher: VADBatcher | None = None):
+    self.session = session
+    self.batcher = batcher
+    self.sample_rates = [8000, 16000]
+    self.reset_states()
+
+  def __call__(self, x, sr: int):
+    if self.batcher is None:
+      return super().__call__(x, sr)
+
+    # Same as SileroOnnxModel.__call__, with the inference done by the batcher
+    x, sr = self._validate_input(x, sr)
+    num_samples = 512 if sr == 16000 else 256
+    if np.shape(x)[-1] != num_samples:
+      raise ValueError(
+        f"Provided number of samples is {np.shape(x)[-1]} (Supported values: 256 for 8000 sample rate, 512 for 16000)"
+      )
+    context_size = 64 if sr == 16000 else 32
+    if self._last_sr and self._last_sr != sr:
+      self.reset_states()
+    if not np.shape(self._context)[1]:
+      self._context = np.zeros((1, context_size), dtype="float32")
+
+    x = np.concatenate((self._context, x), axis=1)
+    out, self._state = self.batcher.submit(x, self._state, sr).result()
+    self._context = x[..., -context_size:]
+    self._last_sr = sr
+    self._last_batch_size = 1
+    return out
+
+
+class SharedSileroVADAnalyzer(SileroVADAnalyzer):
+  """A `SileroVADAnalyzer` on the shared model, optionally batched by `batcher`"""
+
+  def __init__(
+    self,
+    *,
+    sample_rate: int = 16000,
+    params: VADParams = VADParams(),
+    batcher: VADBatcher | None = None,
+  ):
+    # Skip SileroVADAnalyzer.__init__, which would load another copy of the model
+    VADAnalyzer.__init__(self, sample_rate=sample_rate, num_channels=1, params=params)
+    if sample_rate not in (8000, 16000):
+      raise ValueError("Silero VAD sample rate needs to be 16000 or 8000")
+    self._model = _SharedSessionModel(silero_session(), batcher)
+    self._last_reset_time = 0
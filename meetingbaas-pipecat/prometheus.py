@@ -0,0 +1,104 @@
+"""Prometheus text exposition shared by the bot's and the proxy's metrics.
+
+Metrics are gathered as plain tuples, rendered in the text format and served
+on `GET /metrics`; there is no client library, so nothing is registered
+globally and worker processes can pickle what they collect.
+"""
+
+from bisect import bisect_left
+
+from aiohttp import web
+from loguru import logger
+
+# Seconds, from 1 µs to 1 s
+TIMING_BUCKETS = (
+  1e-6,
+  2.5e-6,
+  5e-6,
+  1e-5,
+  2.5e-5,
+  5e-5,
+  1e-4,
+  2.5e-4,
+  5e-4,
+  1e-3,
+  2.5e-3,
+  5e-3,
+  1e-2,
+  2.5e-2,
+  5e-2,
+  0.1,
+  0.25,
+  0.5,
+  1.0,
+)
+
+
+def _escape(value) -> str:
+  return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+  if not labels:
+    return ""
+  return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+# (sample name, labels, value), and (name, type, help, samples) for a family.
+# Both are plain tuples so worker processes can send them to the parent.
+Sample = tuple[str, dict, float]
+Family = tuple[str, str, str, list[Sample]]
+
+
+def render_families(families: list[Family]) -> str:
+  lines = []
+  for name, kind, help, samples in families:
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} {kind}")
+    for sample, labels, value in samples:
+      lines.append(f"{sample}{_labels(labels)} {value}")
+  return "\n".join(lines) + "\n"
+
+
+class Histogram:
+  """A cumulative Prometheus histogram with fixed buckets"""
+
+  def __init__(self, buckets: tuple[float, ...] = TIMING_BUCKETS):
+    self.buckets = buckets
+    self.counts = [0] * (len(buckets) + 1)
+    self.sum = 0.0
+    self.count = 0
+
+  def observe(self, value: float) -> None:
+    self.counts[bisect_left(self.buckets, value)] += 1
+    self.sum += value
+    self.count += 1
+
+  def samples(self, name: str, labels: dict[str, str]) -> list[Sample]:
+    samples = []
+    cumulative = 0
+    for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+      cumulative += count
+      samples.append((f"{name}_bucket", {**labels, "le": bound}, cumulative))
+    samples.append((f"{name}_sum", labels, self.sum))
+    samples.append((f"{name}_count", labels, self.count))
+    return samples
+
+
+async def serve_metrics(metrics, host: str, port: int) -> web.AppRunner:
+  """Serve `GET /metrics` from anything with a `render()`, until the returned
+  runner is cleaned up"""
+
+  async def handle(request):
+    return web.Response(
+      body=metrics.render().encode(),
+      headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+  app = web.Application()
+  app.router.add_get("/metrics", handle)
+  runner = web.AppRunner(app, access_log=None)
+  await runner.setup()
+  await web.TCPSite(runner, host, port).start()
+  logger.info(f"Metrics available on http://{host}:{port}/metrics")
+  return runner
@@ -0,0 +1,24 @@
+"""What the bot and the proxy agree on besides pipecat's protobuf frames.
+
+The proxy and the bot both accept a websocket handshake on `READY_PATH` as a
+readiness probe and close it at once. The bot also sends one control message:
+an empty text frame named `INTERRUPTION_NAME` when the user interrupts it, so
+the proxy drops the bot audio it is still holding for the meeting.
+"""
+
+import protobufs.frames_pb2 as frames_pb2
+
+READY_PATH = "/ready"
+
+INTERRUPTION_NAME = "StartInterruptionFrame"
+
+
+def encode_interruption() -> bytes:
+  """The message the bot sends when the user interrupts it"""
+  frame = frames_pb2.Frame()
+  frame.text.name = INTERRUPTION_NAME
+  return frame.SerializeToString()
+
+
+def is_interruption(frame: frames_pb2.Frame) -> bool:
+  return frame.WhichOneof("frame") == "text" and frame.text.name == INTERRUPTION_NAME
@@ -0,0 +1,188 @@
+"""Helpers for the 16-bit little-endian PCM that flows through the proxy."""
+
+from collections import deque
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+SAMPLE_WIDTH = 2  # bytes per int16 sample
+
+
+def frame_bytes(sample_rate: int, channels: int, frame_ms: int) -> int:
+  """Size in bytes of `frame_ms` of audio"""
+  return sample_rate * frame_ms // 1000 * channels * SAMPLE_WIDTH
+
+
+def samples(pcm: bytes | bytearray | memoryview) -> np.ndarray:
+  """View PCM as int16 samples without copying, ignoring a trailing odd byte"""
+  return np.frombuffer(pcm, dtype="<i2", count=len(pcm) // SAMPLE_WIDTH)
+
+
+def is_silent(pcm: bytes | bytearray | memoryview, threshold: int) -> bool:
+  """Whether every sample's amplitude is below `threshold`"""
+  data = samples(pcm)
+  if not data.size:
+    return True
+  return max(int(data.max()), -int(data.min())) < threshold
+
+
+class Resampler:
+  """Streaming polyphase resampler for mono float32 audio.
+
+  The rate ratio is reduced to `up/down` and a Kaiser-windowed sinc low-pass,
+  spanning `taps` samples at the lower rate, is split into `up` phases. Each call
+  computes every output sample whose input window is complete with a single
+  gather and dot product, and keeps the tail of the input for the next call,
+  so chunk boundaries are seamless.
+  """
+
+  def __init__(self, in_rate: int, out_rate: int, taps: int = 16):
+    g = gcd(in_rate, out_rate)
+    self.up = out_rate // g
+    self.down = in_rate // g
+    # Span `taps` samples at the lower of the two rates
+    self.taps = taps * -(-max(self.up, self.down) // self.up)
+
+    # Prototype filter in the upsampled domain, cut off just below the lower
+    # Nyquist
+    length = self.taps * self.up
+    cutoff = 0.95 / max(self.up, self.down)
+    t = np.arange(length) - (length - 1) / 2
+    h = cutoff * np.sinc(cutoff * t) * np.kaiser(length, 8.0)
+    h *= self.up / h.sum()
+    # phases[p, k] = h[p + k * up], reversed along k to line up with the
+    # input windows, which run oldest to newest
+    self._phases = h.reshape(self.taps, self.up).T[:, ::-1].astype(np.float32)
+
+    self._history = np.zeros(self.taps - 1, dtype=np.float32)
+    self._consumed = 0  # input samples seen so far
+    self._produced = 0  # output samples emitted so far
+
+  def process(self, x: np.ndarray) -> np.ndarray:
+    buf = np.concatenate((self._history, x))
+    start = self._consumed - len(self._history)  # input index of buf[0]
+    self._consumed += len(x)
+
+    # Output n reads up to input sample (n * down) // up
+    end = (self._consumed * self.up - 1) // self.down + 1
+    n = np.arange(self._produced, end, dtype=np.int64)
+    self._produced = end
+    self._history = buf[len(buf) - (self.taps - 1) :]
+    if not n.size:
+      return np.zeros(0, dtype=np.float32)
+
+    position = n * self.down
+    newest = position // self.up - start
+    windows = sliding_window_view(buf, self.taps)[newest - (self.taps - 1)]
+    return np.einsum("nk,nk->n", windows, self._phases[position % self.up])
+
+
+class AudioConverter:
+  """Converts int16 PCM between sample rates and channel counts.
+
+  Channels are mixed down to mono before resampling and duplicated after it,
+  so the filter runs on as few channels as possible. Conversion between the
+  same formats passes the input through untouched.
+  """
+
+  def __init__(self, in_rate: int, in_channels: int, out_rate: int, out_channels: int):
+    if in_channels != out_channels and 1 not in (in_channels, out_channels):
+      raise ValueError(
+        f"Can't convert {in_channels} channels to {out_channels}, one side must be mono"
+      )
+    self.in_rate = in_rate
+    self.in_channels = in_channels
+    self.out_rate = out_rate
+    self.out_channels = out_channels
+    self.passthrough = in_rate == out_rate and in_channels == out_channels
+
+    self._channels = min(in_channels, out_channels)  # channels while resampling
+    self._resamplers = (
+      [Resampler(in_rate, out_rate) for _ in range(self._channels)]
+      if in_rate != out_rate
+      else []
+    )
+    self._frame_size = in_channels * SAMPLE_WIDTH
+    self._remainder = b""
+
+  def convert(
+    self, pcm: bytes | bytearray | memoryview
+  ) -> bytes | bytearray | memoryview:
+    if self.passthrough:
+      return pcm
+
+    if self._remainder:
+      pcm = self._remainder + bytes(pcm)
+    usable = len(pcm) - len(pcm) % self._frame_size
+    self._remainder = bytes(pcm[usable:])
+
+    data = np.frombuffer(pcm, dtype="<i2", count=usable // SAMPLE_WIDTH)
+    data = data.reshape(-1, self.in_channels).astype(np.float32)
+    if self.in_channels > self._channels:
+      data = data.mean(axis=1, keepdims=True)
+    if self._resamplers:
+      data = np.stack(
+        [r.process(data[:, c]) for c, r in enumerate(self._resamplers)], axis=1
+      )
+    if self.out_channels > self._channels:
+      data = np.repeat(data, self.out_channels, axis=1)
+    return np.clip(np.rint(data), -32768, 32767).astype("<i2").tobytes()
+
+
+def rms(pcm: bytes | bytearray | memoryview) -> float:
+  """Root mean square level of int16 PCM"""
+  data = samples(pcm)
+  if not data.size:
+    return 0.0
+  data = data.astype(np.float32)
+  return float(np.sqrt(np.dot(data, data) / data.size))
+
+
+class SilenceGate:
+  """Drops long stretches of silence from a stream of fixed-size frames.
+
+  A frame is speech when its RMS level reaches `threshold`. After speech the
+  gate stays open for `hangover` frames so the bot's VAD still sees the end
+  of the utterance, and while closed it remembers the last `preroll` frames
+  so they can be sent ahead of the next onset. `keepalive`, when set, lets
+  one frame in every `keepalive` through while closed.
+  """
+
+  def __init__(self, threshold: float, hangover: int, preroll: int, keepalive: int = 0):
+    self.threshold = threshold
+    self.hangover = hangover
+    self.keepalive = keepalive
+    self._preroll: deque[bytes] = deque(maxlen=preroll)
+    self._open_for = 0
+    self._closed_for = 0
+    self.frames = 0
+    self.dropped = 0
+
+  @property
+  def drop_ratio(self) -> float:
+    return self.dropped / self.frames if self.frames else 0.0
+
+  def process(self, frame: bytes) -> list[bytes]:
+    """Return the frames to send now, which may include pre-roll"""
+    self.frames += 1
+    if rms(frame) >= self.threshold:
+      self._open_for = self.hangover
+      self._closed_for = 0
+      # The pre-roll frames were counted as dropped when they were held back
+      self.dropped -= len(self._preroll)
+      frames = [*self._preroll, frame]
+      self._preroll.clear()
+      return frames
+
+    if self._open_for > 0:
+      self._open_for -= 1
+      return [frame]
+
+    self._closed_for += 1
+    if self.keepalive and self._closed_for % self.keepalive == 0:
+      return [frame]
+    if self._preroll.maxlen:
+      self._preroll.append(frame)
+    self.dropped += 1
+    return []
@@ -0,0 +1,88 @@
+"""Fast wire encoder for the AudioRawFrame case of pipecat's `Frame` message.
+
+Audio is by far the most common message crossing the proxy, so instead of
+building a `frames_pb2.Frame` for every packet we write the protobuf tags and
+varints ourselves. Messages from the bot are parsed with `frames_pb2`: the
+upb backend parses them faster than Python code walking the bytes could.
+"""
+
+import protobufs.frames_pb2 as frames_pb2
+
+# Field tags, see protobufs/frames.proto
+_FRAME_AUDIO_TAG = b"\x12"  # Frame.audio = 2, length-delimited
+_AUDIO_AUDIO_TAG = b"\x1a"  # AudioRawFrame.audio = 3, length-delimited
+_AUDIO_SAMPLE_RATE_TAG = b"\x20"  # AudioRawFrame.sample_rate = 4, varint
+_AUDIO_NUM_CHANNELS_TAG = b"\x28"  # AudioRawFrame.num_channels = 5, varint
+
+_MAX_CACHED_HEADERS = 64
+
+
+def encode_varint(value: int) -> bytes:
+  """Encode a non-negative integer as a protobuf base-128 varint"""
+  out = bytearray()
+  while value > 0x7F:
+    out.append((value & 0x7F) | 0x80)
+    value >>= 7
+  out.append(value)
+  return bytes(out)
+
+
+def _varint_size(value: int) -> int:
+  size = 1
+  while value > 0x7F:
+    value >>= 7
+    size += 1
+  return size
+
+
+class AudioFrameEncoder:
+  """Serializes PCM into `Frame(audio=AudioRawFrame(...))` without protobuf objects.
+
+  The output is byte-for-byte identical to `frames_pb2.Frame.SerializeToString()`
+  for a frame with only `audio`, `sample_rate` and `num_channels` set.
+  """
+
+  def __init__(self, sample_rate: int, num_channels: int):
+    self.sample_rate = sample_rate
+    self.num_channels = num_channels
+
+    # Fields 4 and 5 follow the payload and never change for a connection
+    trailer = b""
+    if sample_rate:
+      trailer += _AUDIO_SAMPLE_RATE_TAG + encode_varint(sample_rate)
+    if num_channels:
+      trailer += _AUDIO_NUM_CHANNELS_TAG + encode_varint(num_channels)
+    self._trailer = trailer
+    # Audio packets tend to have a handful of fixed sizes, so the header in
+    # front of the payload is cached per payload length.
+    self._headers: dict[int, bytes] = {}
+
+  def _header(self, size: int) -> bytes:
+    header = self._headers.get(size)
+    if header is None:
+      if size:
+        inner_size = 1 + _varint_size(size) + size + len(self._trailer)
+        header = (
+          _FRAME_AUDIO_TAG
+          + encode_varint(inner_size)
+          + _AUDIO_AUDIO_TAG
+          + encode_varint(size)
+        )
+      else:
+        # proto3 omits empty bytes fields
+        header = _FRAME_AUDIO_TAG + encode_varint(len(self._trailer))
+      if len(self._headers) >= _MAX_CACHED_HEADERS:
+        self._headers.clear()
+      self._headers[size] = header
+    return header
+
+  def encode(self, audio: bytes | bytearray | memoryview) -> bytes:
+    """Return the serialized frame for a raw PCM payload"""
+    return b"".join((self._header(len(audio)), audio, self._trailer))
+
+
+def parse_frame(data: bytes | bytearray | memoryview) -> frames_pb2.Frame:
+  """Parse any serialized `Frame` with the generated protobuf code"""
+  frame = frames_pb2.Frame()
+  frame.ParseFromString(bytes(data))
+  return frame
@@ -0,0 +1,287 @@
+"""Proxy metrics, exposed over HTTP in the Prometheus text format.
+
+The hot path only bumps plain integers on a per-connection `ConnectionMetrics`
+and records timings into fixed-bucket histograms; everything else (queue
+depths, drop counts, reconnects, process totals) is read when `/metrics` is
+scraped.
+"""
+
+import itertools
+import time
+
+from ..prometheus import Family, Histogram, render_families
+
+DIRECTIONS = ("inbound", "outbound")
+
+
+def merge_families(by_worker: dict[int, list[Family]]) -> list[Family]:
+  """Combine the families of several workers, telling them apart by a `worker` label"""
+  merged: dict[str, Family] = {}
+  for worker, families in sorted(by_worker.items()):
+    for name, kind, help, samples in families:
+      family = merged.setdefault(name, (name, kind, help, []))
+      family[3].extend(
+        (sample, {"worker": worker, **labels}, value)
+        for sample, labels, value in samples
+      )
+  return list(merged.values())
+
+
+class ConnectionMetrics:
+  """Counters for one proxied meeting"""
+
+  def __init__(self, id: int, route: str, inbound, outbound, upstream, gate=None):
+    self.id = id
+    self.route = route
+    self.queues = {"inbound": inbound, "outbound": outbound}
+    self.upstream = upstream
+    self.gate = gate
+    self.started = time.monotonic()
+    self.frames = dict.fromkeys(DIRECTIONS, 0)
+    self.bytes = dict.fromkeys(DIRECTIONS, 0)
+
+  def sent(self, direction: str, size: int) -> None:
+    self.frames[direction] += 1
+    self.bytes[direction] += size
+
+  @property
+  def reconnects(self) -> int:
+    return self.upstream.reconnects
+
+  def dropped(self, direction: str) -> int:
+    return self.queues[direction].dropped
+
+  def flushed(self, direction: str) -> int:
+    return self.queues[direction].flushed
+
+  @property
+  def gated(self) -> int:
+    return self.gate.dropped if self.gate else 0
+
+
+class RouteTotals:
+  """Counters summed over the connections of one route"""
+
+  def __init__(self):
+    self.connections = 0
+    self.frames = dict.fromkeys(DIRECTIONS, 0)
+    self.bytes = dict.fromkeys(DIRECTIONS, 0)
+    self.dropped = dict.fromkeys(DIRECTIONS, 0)
+    self.flushed = dict.fromkeys(DIRECTIONS, 0)
+    self.reconnects = 0
+    self.gated = 0
+
+  def add(self, conn: ConnectionMetrics) -> None:
+    self.connections += 1
+    for direction in DIRECTIONS:
+      self.frames[direction] += conn.frames[direction]
+      self.bytes[direction] += conn.bytes[direction]
+      self.dropped[direction] += conn.dropped(direction)
+      self.flushed[direction] += conn.flushed(direction)
+    self.reconnects += conn.reconnects
+    self.gated += conn.gated
+
+  def copy(self) -> "RouteTotals":
+    totals = RouteTotals()
+    totals.connections = self.connections
+    for name in ("frames", "bytes", "dropped", "flushed"):
+      setattr(totals, name, dict(getattr(self, name)))
+    totals.reconnects = self.reconnects
+    totals.gated = self.gated
+    return totals
+
+
+class ProxyMetrics:
+  """Process-wide metrics: live connections plus totals from finished ones.
+
+  Series are labelled by route and direction only, never by connection, so
+  their number stays bounded by the configured routes however many meetings
+  come and go.
+  """
+
+  def __init__(self):
+    self._ids = itertools.count(1)
+    self.connections: dict[int, ConnectionMetrics] = {}
+    self.connections_total = 0
+    self.encode_seconds = Histogram()
+    self.decode_seconds = Histogram()
+    self.send_seconds = {direction: Histogram() for direction in DIRECTIONS}
+    # Finished connections, folded into their route's totals when they close
+    self._finished: dict[str, RouteTotals] = {}
+
+  def open_connection(self, route: str, inbound, outbound, upstream, gate=None):
+    conn = ConnectionMetrics(next(self._ids), route, inbound, outbound, upstream, gate)
+    self.connections[conn.id] = conn
+    self.connections_total += 1
+    return conn
+
+  def close_connection(self, conn: ConnectionMetrics) -> None:
+    if self.connections.pop(conn.id, None) is None:
+      return
+    self._finished.setdefault(conn.route, RouteTotals()).add(conn)
+
+  def render(self) -> str:
+    return render_families(self.collect())
+
+  def collect(self) -> list[Family]:
+    conns = list(self.connections.values())
+    routes = {route: totals.copy() for route, totals in self._finished.items()}
+    live: dict[str, list[ConnectionMetrics]] = {}
+    for conn in conns:
+      routes.setdefault(conn.route, RouteTotals()).add(conn)
+      live.setdefault(conn.route, []).append(conn)
+    routes = dict(sorted(routes.items()))
+    families = []
+
+    def metric(name, kind, help, samples):
+      families.append(
+        (name, kind, help, [(name, labels, value) for labels, value in samples])
+      )
+
+    def per_direction(value):
+      return [
+        ({"direction": d}, sum(value(totals)[d] for totals in routes.values()))
+        for d in DIRECTIONS
+      ]
+
+    def per_route(value):
+      return [
+        ({"route": route}, value(route, totals)) for route, totals in routes.items()
+      ]
+
+    def per_route_direction(value):
+      return [
+        ({"route": route, "direction": d}, value(route, totals, d))
+        for route, totals in routes.items()
+        for d in DIRECTIONS
+      ]
+
+    metric(
+      "proxy_active_connections",
+      "gauge",
+      "Meetings currently connected",
+      [({}, len(conns))],
+    )
+    metric(
+      "proxy_connections_total",
+      "counter",
+      "Meetings accepted since start",
+      [({}, self.connections_total)],
+    )
+    metric(
+      "proxy_frames_total",
+      "counter",
+      "Audio frames sent, inbound is towards the bot",
+      per_direction(lambda t: t.frames),
+    )
+    metric(
+      "proxy_bytes_total",
+      "counter",
+      "PCM bytes sent, inbound is towards the bot",
+      per_direction(lambda t: t.bytes),
+    )
+    metric(
+      "proxy_dropped_frames_total",
+      "counter",
+      "Audio frames dropped by full queues",
+      per_direction(lambda t: t.dropped),
+    )
+    metric(
+      "proxy_flushed_frames_total",
+      "counter",
+      "Queued bot audio frames dropped because the user interrupted the bot",
+      per_direction(lambda t: t.flushed),
+    )
+    metric(
+      "proxy_silence_gated_frames_total",
+      "counter",
+      "Silent frames the silence gate kept from the bot",
+      [({}, sum(t.gated for t in routes.values()))],
+    )
+    metric(
+      "proxy_upstream_reconnects_total",
+      "counter",
+      "Successful reconnects to a bot",
+      [({}, sum(t.reconnects for t in routes.values()))],
+    )
+
+    for name, help, histograms in (
+      (
+        "proxy_encode_seconds",
+        "Time to encode a frame for the bot",
+        {None: self.encode_seconds},
+      ),
+      (
+        "proxy_decode_seconds",
+        "Time to decode a frame from the bot",
+        {None: self.decode_seconds},
+      ),
+      ("proxy_send_seconds", "Time spent in websocket send", self.send_seconds),
+    ):
+      samples = []
+      for direction, histogram in histograms.items():
+        labels = {"direction": direction} if direction else {}
+        samples.extend(histogram.samples(name, labels))
+      families.append((name, "histogram", help, samples))
+
+    now = time.monotonic()
+    metric(
+      "proxy_route_active_connections",
+      "gauge",
+      "Meetings currently connected to a route",
+      per_route(lambda r, t: len(live.get(r, ()))),
+    )
+    metric(
+      "proxy_route_connections_total",
+      "counter",
+      "Meetings a route has served, including connected ones",
+      per_route(lambda r, t: t.connections),
+    )
+    metric(
+      "proxy_route_frames_total",
+      "counter",
+      "Audio frames sent on a route",
+      per_route_direction(lambda r, t, d: t.frames[d]),
+    )
+    metric(
+      "proxy_route_bytes_total",
+      "counter",
+      "PCM bytes sent on a route",
+      per_route_direction(lambda r, t, d: t.bytes[d]),
+    )
+    metric(
+      "proxy_route_queue_depth",
+      "gauge",
+      "Frames waiting in the queues of a route's meetings",
+      per_route_direction(
+        lambda r, t, d: sum(c.queues[d].depth for c in live.get(r, ()))
+      ),
+    )
+    metric(
+      "proxy_route_dropped_frames_total",
+      "counter",
+      "Frames dropped on a route",
+      per_route_direction(lambda r, t, d: t.dropped[d]),
+    )
+    metric(
+      "proxy_route_oldest_connection_seconds",
+      "gauge",
+      "How long the oldest meeting on a route has been connected",
+      per_route(
+        lambda r, t: max((now - c.started for c in live.get(r, ())), default=0)
+      ),
+    )
+    metric(
+      "proxy_route_upstream_reconnects_total",
+      "counter",
+      "Reconnects to the bot on a route",
+      per_route(lambda r, t: t.reconnects),
+    )
+    metric(
+      "proxy_route_silence_gated_frames_total",
+      "counter",
+      "Silent frames the silence gate kept from the bot on a route",
+      per_route(lambda r, t: t.gated),
+    )
+
+    return families
@@ -1,105 +1,398 @@
 import asyncio
+import signal
 import sys
+import time
+from contextlib import suppress
+from functools import partial
+from multiprocessing.connection import Connection
 import websockets
-import protobufs.frames_pb2 as frames_pb2
-from google.protobuf.message import EncodeError
-from websockets.exceptions import ConnectionClosedError
+from websockets.exceptions import ConnectionClosed
 from loguru import logger
+from ..prometheus import serve_metrics
+from ..protocol import READY_PATH, is_interruption
+from .audio import AudioConverter, SilenceGate, frame_bytes
+from .codec import AudioFrameEncoder, parse_frame
+from .metrics import ProxyMetrics
+from .queues import (
+  AudioChunker,
+  AudioQueue,
+  AudioQueueOverflow,
+  OverflowPolicy,
+  pump_audio,
+)
+from .recorder import Recorder, recording_name
+from .routing import (
+  Router,
+  load_resolver,
+  load_routes_file,
+  parse_route,
+  route_key,
+)
 from .runner import configure
+from .upstream import Upstream, UpstreamPool, UpstreamUnavailable
+from .workers import WorkerGroup, report_stats
 
 # Setup Loguru logger
 logger.remove()
 logger.add(sys.stderr, level="INFO")
 
 
-async def handle_pipecat_messages(pipecat_ws, client_ws):
-  """Handle messages coming from Pipecat back to the client"""
+def create_queue(name, args):
+  return AudioQueue(
+    name,
+    args.queue_frames,
+    OverflowPolicy(args.overflow_policy),
+    args.silence_threshold,
+  )
+
+
+async def queue_pipecat_message(
+  message, outbound, converter, chunker, metrics, wait=False
+):
+  """Queue the audio of a message from Pipecat for the client, in frames of
+  the same duration as inbound ones so that both queues hold the same time.
+  With `wait`, frames wait for room in the queue instead of overflowing it."""
+  start = time.perf_counter()
+  frame = parse_frame(message)
+  metrics.decode_seconds.observe(time.perf_counter() - start)
+  if frame.WhichOneof("frame") == "audio":
+    for chunk in chunker.push(converter.convert(frame.audio.audio)):
+      if wait:
+        await outbound.put_wait(chunk)
+      else:
+        outbound.put(chunk)
+    return
+  if is_interruption(frame):
+    # The user talked over the bot; what it said so far is stale
+    flushed = outbound.clear()
+    chunker.clear()
+    logger.debug(f"Bot interrupted, dropped {flushed} queued frames")
+  else:
+    logger.debug(f"Ignoring {frame.WhichOneof('frame')} frame from Pipecat")
+
+
+async def handle_pipecat_messages(
+  upstream, client_ws, outbound, converter, chunker, metrics, buffered=()
+):
+  """Queue audio coming from Pipecat for the client, starting with what the
+  bot sent before the meeting attached"""
   try:
-    async for message in pipecat_ws:
+    # Usually the greeting, sent while the pooled connection was idle. It is
+    # longer than the queue, so it is fed in as the queue drains.
+    for message in buffered:
+      await queue_pipecat_message(
+        message, outbound, converter, chunker, metrics, wait=True
+      )
+    async for message in upstream.messages():
       if isinstance(message, bytes):
         try:
-          frame = frames_pb2.Frame()
-          frame.ParseFromString(message)
-          if frame.HasField("audio"):
-            audio_data = frame.audio.audio
-            await client_ws.send(bytes(audio_data))
-            logger.debug("Forwarded audio response to client")
+          await queue_pipecat_message(message, outbound, converter, chunker, metrics)
+        except AudioQueueOverflow:
+          raise
         except Exception as e:
           logger.error(f"Error processing Pipecat response: {str(e)}")
           logger.exception(e)
+  except AudioQueueOverflow as e:
+    logger.warning(f"{e}, disconnecting client")
+    await client_ws.close(code=1013, reason="Audio queue overflow")
+  except UpstreamUnavailable as e:
+    logger.error(f"{e}, disconnecting client")
+    await client_ws.close(code=1011, reason="Bot unavailable")
   except Exception as e:
     logger.error(f"Error in Pipecat message handler: {str(e)}")
     logger.exception(e)
 
 
-async def forward_audio(websocket, websocket_url, sample_rate, channels):
+async def send_queued_audio(queue, send, client_ws):
+  """Drain a queue into `send`, closing the client connection if sending fails"""
   try:
-    async with websockets.connect(websocket_url) as pipecat_ws:
-      logger.debug("Connected to Pipecat WebSocket")
+    await pump_audio(queue, send)
+  except (ConnectionClosed, UpstreamUnavailable) as e:
+    logger.warning(f"Stopped sending {queue.name} audio: {e}")
+  except Exception as e:
+    logger.error(f"Error sending {queue.name} audio: {str(e)}")
+    logger.exception(e)
+  await client_ws.close()
 
-      pipecat_handler = asyncio.create_task(
-        handle_pipecat_messages(pipecat_ws, websocket)
-      )
 
-      try:
-        async for message in websocket:
-          if isinstance(message, bytes):
-            try:
-              frame = frames_pb2.Frame()
-              frame.audio.audio = message
-              frame.audio.sample_rate = sample_rate
-              frame.audio.num_channels = channels
-
-              serialized_frame = frame.SerializeToString()
-              await pipecat_ws.send(serialized_frame)
-              logger.debug("Successfully forwarded audio frame to Pipecat")
-            except Exception as e:
-              logger.error(f"Error processing client frame: {str(e)}")
-              logger.exception(e)
-          else:
-            logger.info(f"Received non-bytes message: {message}, ignoring")
-      except Exception as e:
-        logger.error(f"Error in client message handler: {str(e)}")
-        logger.exception(e)
-      finally:
-        pipecat_handler.cancel()
-        try:
-          await pipecat_handler
-        except asyncio.CancelledError:
-          pass
-  except ConnectionClosedError as e:
-    logger.warning(f"Connection to Pipecat WebSocket closed: {e}")
+async def forward_audio(
+  websocket,
+  websocket_url,
+  route,
+  sample_rate,
+  channels,
+  pool,
+  metrics,
+  args,
+  recorder=None,
+):
+  # The bot gets audio in its own format, converted on the way in and out
+  bot_rate, bot_channels = args.bot_sample_rate, args.bot_channels
+  to_bot = AudioConverter(sample_rate, channels, bot_rate, bot_channels)
+  from_bot = AudioConverter(bot_rate, bot_channels, sample_rate, channels)
+  encoder = AudioFrameEncoder(bot_rate, bot_channels)
+  chunker = AudioChunker(frame_bytes(bot_rate, bot_channels, args.frame_ms))
+  outbound_chunker = AudioChunker(frame_bytes(sample_rate, channels, args.frame_ms))
+  inbound = create_queue("inbound", args)
+  outbound = create_queue("outbound", args)
+  upstream = Upstream(
+    websocket_url,
+    pool,
+    replay_size=args.replay_ms // args.frame_ms,
+    max_attempts=args.reconnect_attempts,
+  )
+  gate = (
+    SilenceGate(
+      args.gate_threshold,
+      hangover=args.gate_hangover_ms // args.frame_ms,
+      preroll=args.gate_preroll_ms // args.frame_ms,
+      keepalive=args.gate_keepalive_ms // args.frame_ms,
+    )
+    if args.silence_gate
+    else None
+  )
+  conn_metrics = metrics.open_connection(route, inbound, outbound, upstream, gate)
+  inbound_send_seconds = metrics.send_seconds["inbound"]
+  outbound_send_seconds = metrics.send_seconds["outbound"]
+  # Both directions are recorded in the meeting's format
+  recordings = None
+  if recorder:
+    name = recording_name(conn_metrics.id, route)
+    recordings = (
+      recorder.open(f"{name}-inbound", sample_rate, channels),
+      recorder.open(f"{name}-outbound", sample_rate, channels),
+    )
+    record_inbound, record_outbound = (r.write for r in recordings)
+  try:
+    buffered = await upstream.open()
+    logger.debug("Connected to Pipecat WebSocket")
+
+    async def send_to_pipecat(frame):
+      start = time.perf_counter()
+      message = encoder.encode(frame)
+      encoded = time.perf_counter()
+      await upstream.send(message)
+      metrics.encode_seconds.observe(encoded - start)
+      inbound_send_seconds.observe(time.perf_counter() - encoded)
+      conn_metrics.sent("inbound", len(frame))
+
+    async def send_to_client(frame):
+      if recordings:
+        record_outbound(frame)
+      start = time.perf_counter()
+      await websocket.send(frame)
+      outbound_send_seconds.observe(time.perf_counter() - start)
+      conn_metrics.sent("outbound", len(frame))
+
+    tasks = [
+      asyncio.create_task(
+        handle_pipecat_messages(
+          upstream, websocket, outbound, from_bot, outbound_chunker, metrics, buffered
+        )
+      ),
+      asyncio.create_task(send_queued_audio(inbound, send_to_pipecat, websocket)),
+      asyncio.create_task(send_queued_audio(outbound, send_to_client, websocket)),
+    ]
+
+    try:
+      async for message in websocket:
+        if isinstance(message, bytes):
+          try:
+            if recordings:
+              record_inbound(message)
+            for frame in chunker.push(to_bot.convert(message)):
+              for gated in gate.process(frame) if gate else (frame,):
+                inbound.put(gated)
+          except AudioQueueOverflow as e:
+            logger.warning(f"{e}, disconnecting client")
+            break
+          except Exception as e:
+            logger.error(f"Error processing client frame: {str(e)}")
+            logger.exception(e)
+        else:
+          logger.info(f"Received non-bytes message: {message}, ignoring")
+    except Exception as e:
+      logger.error(f"Error in client message handler: {str(e)}")
+      logger.exception(e)
+    finally:
+      for task in tasks:
+        task.cancel()
+      await asyncio.gather(*tasks, return_exceptions=True)
+      logger.info(
+        f"Connection finished, inbound: {inbound.stats()}, outbound: {outbound.stats()}, "
+        f"reconnects: {upstream.reconnects}"
+        + (f", silence gated: {gate.drop_ratio:.0%}" if gate else "")
+      )
   except Exception as e:
     logger.error(f"Unexpected error: {str(e)}")
     logger.exception(e)
   finally:
+    metrics.close_connection(conn_metrics)
+    if recordings:
+      for recording in recordings:
+        recorder.close(recording)
+    try:
+      await upstream.close()
+    except Exception as e:
+      logger.warning(f"Error closing Pipecat connection: {e}")
     try:
       await websocket.close()
     except:
       pass
 
 
-async def main():
+async def route_connection(
+  websocket, router, sample_rate, channels, pool, metrics, args, recorder=None
+):
+  """Forward a client connection to the bot its request path routes to"""
+  if websocket.path == READY_PATH:
+    await websocket.close()
+    return
+  websocket_url = await router.resolve(websocket.path)
+  if websocket_url is None:
+    await websocket.close(code=1008, reason="Unknown route")
+    return
+  logger.info(f"Routing {websocket.path} to {websocket_url}")
+  # Only configured route names become metric labels
+  route = route_key(websocket.path, router.query_param)
+  route = route if route in router.routes else "default"
+  await forward_audio(
+    websocket,
+    websocket_url,
+    route,
+    sample_rate,
+    channels,
+    pool,
+    metrics,
+    args,
+    recorder,
+  )
+
+
+def create_router(websocket_url, args):
+  routes = {}
+  if args.routes_file:
+    routes.update(load_routes_file(args.routes_file))
+  routes.update(parse_route(route) for route in args.route)
+  resolver = load_resolver(args.resolver) if args.resolver else None
+  return Router(routes, websocket_url, resolver, args.route_param)
+
+
+async def drain(server, timeout: float):
+  """Stop accepting meetings and give the open ones `timeout` seconds to end"""
+  server.server.close()
+  logger.info(f"Draining {len(server.websockets)} connections...")
+  loop = asyncio.get_running_loop()
+  deadline = loop.time() + timeout
+  while server.websockets and loop.time() < deadline:
+    await asyncio.sleep(0.5)
+  if server.websockets:
+    logger.warning(f"Closing {len(server.websockets)} connections still open")
+  server.close()
+  await server.wait_closed()
+
+
+async def main(worker: int | None = None, reports: Connection | None = None):
+  """Run the proxy, as a whole process or as worker `worker` of a `WorkerGroup`"""
   host, port, websocket_url, sample_rate, channels, args = await configure()
+  router = create_router(websocket_url, args)
+  pool_size = args.upstream_pool_size
+  if worker is not None and pool_size:
+    # Bots accept one client at a time, so idle connections from several
+    # workers would keep displacing each other
+    if worker == 0:
+      logger.warning("--upstream-pool-size is ignored when running with --workers")
+    pool_size = 0
+  pool = UpstreamPool(pool_size)
+  metrics = ProxyMetrics()
+  metrics_runner = None
+  if args.metrics_port and worker is None:
+    metrics_runner = await serve_metrics(metrics, args.metrics_host, args.metrics_port)
+
+  recorder = None
+  if args.record_dir:
+    recorder = Recorder(args.record_dir, args.record_format, args.record_buffer_ms)
+    logger.info(f"Recording meetings to {args.record_dir}")
 
   server = await websockets.serve(
-    lambda ws: forward_audio(ws, websocket_url, sample_rate, channels), host, port
+    lambda ws: route_connection(
+      ws, router, sample_rate, channels, pool, metrics, args, recorder
+    ),
+    host,
+    port,
+    reuse_port=worker is not None,
   )
-  logger.info(f"WebSocket server started on ws://{host}:{port}")
+  if worker is None:
+    logger.info(f"WebSocket server started on ws://{host}:{port}")
+  else:
+    logger.info(f"Worker {worker} listening on ws://{host}:{port}")
+  if worker in (None, 0):
+    for name, url in router.routes.items():
+      logger.info(f"Route /{name} -> {url}")
+  for url in router.routes.values():
+    pool.warm(url)
+  if router.default_url:
+    pool.warm(router.default_url)
+
+  reporter = None
+  if reports is not None:
+    reporter = asyncio.create_task(report_stats(worker, reports, metrics))
+
+  stopping = asyncio.Event()
+  loop = asyncio.get_running_loop()
+  for sig in (signal.SIGINT, signal.SIGTERM):
+    with suppress(NotImplementedError):  # not available on Windows
+      loop.add_signal_handler(sig, stopping.set)
 
   try:
-    await asyncio.Future()  # Keep server running
-  except KeyboardInterrupt:
-    logger.info("Shutting down server...")
-    server.close()
-    await server.wait_closed()
+    await stopping.wait()
+    if worker is None:
+      logger.info("Shutting down server...")
+    await drain(server, args.drain_timeout)
+  finally:
+    if reporter:
+      reporter.cancel()
+      await asyncio.gather(reporter, return_exceptions=True)
+    await pool.close()
+    if recorder:
+      await asyncio.to_thread(recorder.stop)
+    if metrics_runner:
+      await metrics_runner.cleanup()
+
+
+def use_uvloop():
+  try:
+    import uvloop
+  except ImportError:
+    logger.warning("uvloop is not installed, using the default event loop")
+    return
+  asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
+def run_worker(index: int, reports: Connection, uvloop: bool = False):
+  if uvloop:
+    use_uvloop()
+  asyncio.run(main(index, reports))
 
 
 def start():
+  *_, args = asyncio.run(configure())
+  if args.uvloop:
+    use_uvloop()
   try:
-    asyncio.run(main())
+    if args.workers > 1:
+      workers = WorkerGroup(args.workers, partial(run_worker, uvloop=args.uvloop))
+      workers.start()
+      asyncio.run(
+        workers.supervise(args.metrics_host, args.metrics_port, args.drain_timeout)
+      )
+      if workers.failed:
+        sys.exit(1)
+    else:
+      asyncio.run(main())
   except KeyboardInterrupt:
-    logger.info("Server shutdown complete.")
+    pass
+  logger.info("Server shutdown complete.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+"""Bounded audio queues that decouple reading from a socket and sending to the other.
+
+Each direction of a proxied connection pushes audio into an `AudioQueue` and a
+separate `pump_audio` task drains it, so a slow peer can no longer stall the
+other side's read loop. When a queue is full its overflow policy decides what
+to throw away, which keeps the end-to-end delay bounded by the queue size.
+"""
+
+import asyncio
+from collections import deque
+from enum import Enum
+from typing import Awaitable, Callable
+
+from loguru import logger
+
+from .audio import is_silent
+
+Audio = bytes | bytearray | memoryview
+
+
+class OverflowPolicy(str, Enum):
+  DROP_OLDEST = "drop-oldest"
+  DROP_SILENCE = "drop-silence"
+  DISCONNECT = "disconnect"
+
+
+class AudioQueueOverflow(Exception):
+  """Raised by a queue with the `disconnect` policy when it is full"""
+
+
+class AudioChunker:
+  """Re-chunks a PCM stream into frames of exactly `frame_size` bytes"""
+
+  def __init__(self, frame_size: int):
+    self.frame_size = frame_size
+    self._buffer = bytearray()
+
+  def push(self, data: Audio) -> list[bytes]:
+    """Buffer `data` and return every complete frame now available"""
+    buffer = self._buffer
+    size = self.frame_size
+    if not buffer and len(data) == size:
+      # Packets usually already have the right size
+      return [bytes(data)]
+    buffer += data
+    count = len(buffer) // size
+    if not count:
+      return []
+    frames = [bytes(buffer[i * size : (i + 1) * size]) for i in range(count)]
+    del buffer[: count * size]
+    return frames
+
+  def clear(self) -> None:
+    """Drop a partial frame still waiting for the rest of its audio"""
+    self._buffer.clear()
+
+
+class AudioQueue:
+  """A bounded FIFO of audio frames with a configurable overflow policy"""
+
+  def __init__(
+    self,
+    name: str,
+    maxsize: int,
+    policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+    silence_threshold: int = 500,
+  ):
+    self.name = name
+    self.maxsize = maxsize
+    self.policy = policy
+    self.silence_threshold = silence_threshold
+    # (frame, is_silent) pairs; silence is only tracked for DROP_SILENCE
+    self._frames: deque[tuple[Audio, bool]] = deque()
+    self._ready = asyncio.Event()
+    self._space = asyncio.Event()
+    self.enqueued = 0
+    self.dropped = 0
+    self.dropped_silence = 0
+    self.flushed = 0
+    self.max_depth = 0
+
+  @property
+  def depth(self) -> int:
+    return len(self._frames)
+
+  def put(self, frame: Audio) -> None:
+    """Enqueue a frame without waiting, applying the overflow policy if full"""
+    silent = self.policy is OverflowPolicy.DROP_SILENCE and is_silent(
+      frame, self.silence_threshold
+    )
+    if len(self._frames) >= self.maxsize:
+      self._overflow()
+    self._frames.append((frame, silent))
+    self.enqueued += 1
+    self.max_depth = max(self.max_depth, len(self._frames))
+    self._ready.set()
+
+  async def put_wait(self, frame: Audio) -> None:
+    """Enqueue a frame once there is room for it, for audio that is already
+    late and must not push out what is queued"""
+    while len(self._frames) >= self.maxsize:
+      self._space.clear()
+      await self._space.wait()
+    self.put(frame)
+
+  def _overflow(self) -> None:
+    if self.policy is OverflowPolicy.DISCONNECT:
+      raise AudioQueueOverflow(f"{self.name} queue is full ({self.maxsize} frames)")
+
+    if self.policy is OverflowPolicy.DROP_SILENCE:
+      for i, (_, silent) in enumerate(self._frames):
+        if silent:
+          del self._frames[i]
+          self.dropped_silence += 1
+          break
+      else:
+        self._frames.popleft()
+    else:
+      self._frames.popleft()
+
+    self.dropped += 1
+    if self.dropped == 1 or self.dropped % 100 == 0:
+      logger.warning(f"{self.name} queue full, {self.dropped} frames dropped so far")
+
+  def clear(self) -> int:
+    """Drop every queued frame, returning how many there were"""
+    count = len(self._frames)
+    self._frames.clear()
+    self.flushed += count
+    self._space.set()
+    return count
+
+  async def get(self) -> Audio:
+    while not self._frames:
+      self._ready.clear()
+      await self._ready.wait()
+    frame, _ = self._frames.popleft()
+    self._space.set()
+    return frame
+
+  def stats(self) -> dict[str, int]:
+    return {
+      "depth": self.depth,
+      "max_depth": self.max_depth,
+      "enqueued": self.enqueued,
+      "dropped": self.dropped,
+      "dropped_silence": self.dropped_silence,
+      "flushed": self.flushed,
+    }
+
+
+async def pump_audio(queue: AudioQueue, send: Callable[[Audio], Awaitable[None]]):
+  """Send frames from `queue` until cancelled"""
+  while True:
+    frame = await queue.get()
+    await send(frame)
@@ -0,0 +1,218 @@
+"""Record meeting audio to disk without touching the event loop.
+
+The audio path only copies PCM into a preallocated, memory-mapped ring buffer
+per stream. A single background thread drains every ring into its file in
+large sequential writes. When the disk can't keep up and a ring fills, new
+audio is dropped from the recording; live forwarding never waits on it.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+
+from loguru import logger
+
+from .audio import SAMPLE_WIDTH
+
+FORMATS = ("wav", "raw")
+
+
+class RingBuffer:
+  """A fixed-size byte ring for one producer and one consumer thread.
+
+  Each side only advances its own counter, so under the GIL no lock is needed:
+  the producer sees space freed once the consumer has advanced `_read`, and the
+  consumer sees data once the producer has advanced `_written`.
+  """
+
+  def __init__(self, size: int):
+    self.size = size
+    self._buffer = mmap.mmap(-1, size)
+    self._written = 0  # total bytes ever written
+    self._read = 0  # total bytes ever consumed
+    self.dropped = 0  # bytes that didn't fit
+
+  @property
+  def available(self) -> int:
+    return self._written - self._read
+
+  def write(self, data) -> bool:
+    """Copy `data` in whole, or drop it and return False when it doesn't fit"""
+    size = len(data)
+    if size > self.size - (self._written - self._read):
+      self.dropped += size
+      return False
+    start = self._written % self.size
+    first = min(size, self.size - start)
+    self._buffer[start : start + first] = data[:first]
+    if first < size:
+      self._buffer[: size - first] = data[first:]
+    self._written += size
+    return True
+
+  def drain(self, write) -> int:
+    """Pass everything buffered to `write` in at most two slices"""
+    available = self._written - self._read
+    if not available:
+      return 0
+    start = self._read % self.size
+    first = min(available, self.size - start)
+    with memoryview(self._buffer) as view:
+      write(view[start : start + first])
+      if first < available:
+        write(view[: available - first])
+    self._read += available
+    return available
+
+  def close(self):
+    self._buffer.close()
+
+
+def _wav_header(sample_rate: int, channels: int, data_size: int) -> bytes:
+  byte_rate = sample_rate * channels * SAMPLE_WIDTH
+  return struct.pack(
+    "<4sI4s4sIHHIIHH4sI",
+    b"RIFF",
+    min(36 + data_size, 0xFFFFFFFF),
+    b"WAVE",
+    b"fmt ",
+    16,
+    1,  # PCM
+    channels,
+    sample_rate,
+    byte_rate,
+    channels * SAMPLE_WIDTH,
+    SAMPLE_WIDTH * 8,
+    b"data",
+    min(data_size, 0xFFFFFFFF),
+  )
+
+
+class RecordingStream:
+  """One direction of one meeting, buffered in a ring until the writer drains it"""
+
+  def __init__(self, path: str, sample_rate: int, channels: int, buffer_size: int):
+    self.path = path
+    self.sample_rate = sample_rate
+    self.channels = channels
+    self.ring = RingBuffer(buffer_size)
+    self.closed = False
+    self._file = None
+    self._size = 0
+    self._warned = False
+
+  def write(self, pcm) -> None:
+    """Called from the event loop; never blocks"""
+    if self.closed:
+      return
+    if not self.ring.write(pcm) and not self._warned:
+      self._warned = True
+      logger.warning(f"Recording to {self.path} is falling behind, dropping audio")
+
+  # The methods below run on the writer thread
+
+  def _flush(self) -> int:
+    if self._file is None:
+      os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+      self._file = open(self.path, "wb", buffering=0)
+      if self.path.endswith(".wav"):
+        self._file.write(_wav_header(self.sample_rate, self.channels, 0))
+    written = self.ring.drain(self._file.write)
+    self._size += written
+    return written
+
+  def _finish(self) -> None:
+    self._flush()
+    if self.path.endswith(".wav"):
+      self._file.seek(0)
+      self._file.write(_wav_header(self.sample_rate, self.channels, self._size))
+    self._file.close()
+    self.ring.close()
+    if self.ring.dropped:
+      logger.warning(
+        f"Recording {self.path} finished, {self.ring.dropped} bytes were dropped"
+      )
+
+
+class Recorder:
+  """Owns the writer thread and the streams of every recorded meeting"""
+
+  def __init__(
+    self,
+    directory: str,
+    format: str = "wav",
+    buffer_ms: int = 10000,
+    flush_interval: float = 0.5,
+  ):
+    if format not in FORMATS:
+      raise ValueError(f"Unknown recording format {format!r}")
+    self.directory = directory
+    self.format = format
+    self.buffer_ms = buffer_ms
+    self.flush_interval = flush_interval
+    self._streams: list[RecordingStream] = []
+    self._lock = threading.Lock()
+    self._wake = threading.Event()
+    self._stopping = False
+    self._thread = threading.Thread(
+      target=self._run, name="proxy-recorder", daemon=True
+    )
+    self._thread.start()
+
+  def open(self, name: str, sample_rate: int, channels: int) -> RecordingStream:
+    """Start recording a stream to `<directory>/<name>.<format>`"""
+    size = sample_rate * channels * SAMPLE_WIDTH * self.buffer_ms // 1000
+    # Round up to whole pages, which is what the mapping allocates anyway
+    size = -(-size // mmap.PAGESIZE) * mmap.PAGESIZE
+    path = os.path.join(self.directory, f"{name}.{self.format}")
+    stream = RecordingStream(path, sample_rate, channels, size)
+    with self._lock:
+      self._streams.append(stream)
+    return stream
+
+  def close(self, stream: RecordingStream) -> None:
+    """Stop recording `stream`; the writer finishes its file in the background"""
+    stream.closed = True
+    self._wake.set()
+
+  def _run(self):
+    while True:
+      self._wake.wait(self.flush_interval)
+      self._wake.clear()
+      with self._lock:
+        streams = list(self._streams)
+      for stream in streams:
+        try:
+          if stream.closed:
+            stream._finish()
+            with self._lock:
+              self._streams.remove(stream)
+          elif stream.ring.available:
+            stream._flush()
+        except OSError as e:
+          # The ring stays mapped in case the meeting is still writing to it
+          logger.error(f"Recording to {stream.path} failed: {e}")
+          stream.closed = True
+          if stream._file:
+            stream._file.close()
+          with self._lock:
+            self._streams.remove(stream)
+      if self._stopping and not streams:
+        return
+
+  def stop(self, timeout: float = 10.0) -> None:
+    """Finish every open recording and stop the writer thread"""
+    with self._lock:
+      for stream in self._streams:
+        stream.closed = True
+    self._stopping = True
+    self._wake.set()
+    self._thread.join(timeout)
+
+
+def recording_name(connection: int, route: str) -> str:
+  """A unique file name stem for a meeting's recordings"""
+  # Connection ids are per process, so the pid keeps workers' names apart
+  return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{connection}-{route}"
@@ -0,0 +1,95 @@
+"""Pick the bot backend for an incoming MeetingBaas connection.
+
+A single proxy can serve many meetings: each connection names its backend
+either with a path (`wss://proxy/bot_1`) or a query token
+(`wss://proxy/?bot=bot_1`), which is looked up in a static routing table or
+handed to a user supplied resolver.
+"""
+
+import importlib
+import inspect
+import json
+from typing import Awaitable, Callable
+from urllib.parse import parse_qs, urlsplit
+
+from loguru import logger
+
+Resolver = Callable[[str], str | None | Awaitable[str | None]]
+
+
+def route_key(path: str, query_param: str = "bot") -> str | None:
+  """Extract the route name from a request path, preferring the query token"""
+  url = urlsplit(path)
+  values = parse_qs(url.query).get(query_param)
+  if values and values[0]:
+    return values[0]
+  segment = url.path.strip("/")
+  return segment or None
+
+
+def parse_route(value: str) -> tuple[str, str]:
+  """Parse a `NAME=ws://host:port` command line route"""
+  name, sep, url = value.partition("=")
+  if not sep or not name or not url:
+    raise ValueError(f"Invalid route {value!r}, expected NAME=URL")
+  return name.strip("/"), url
+
+
+def load_routes_file(path: str) -> dict[str, str]:
+  """Load a JSON object mapping route names to bot WebSocket URLs"""
+  with open(path) as f:
+    routes = json.load(f)
+  if not isinstance(routes, dict) or not all(
+    isinstance(k, str) and isinstance(v, str) for k, v in routes.items()
+  ):
+    raise ValueError(f"{path} must contain a JSON object of name -> URL")
+  return {name.strip("/"): url for name, url in routes.items()}
+
+
+def load_resolver(spec: str) -> Resolver:
+  """Import a `package.module:function` resolver"""
+  module_name, sep, attr = spec.partition(":")
+  if not sep:
+    raise ValueError(f"Invalid resolver {spec!r}, expected module:function")
+  resolver = getattr(importlib.import_module(module_name), attr)
+  if not callable(resolver):
+    raise ValueError(f"Resolver {spec!r} is not callable")
+  return resolver
+
+
+class Router:
+  """Resolves request paths to bot WebSocket URLs.
+
+  A custom resolver is consulted first and may return None to defer to the
+  static table. Connections without a route name go to `default_url`, as do
+  all connections when no table or resolver is configured; connections naming
+  an unknown route are rejected.
+  """
+
+  def __init__(
+    self,
+    routes: dict[str, str] | None = None,
+    default_url: str | None = None,
+    resolver: Resolver | None = None,
+    query_param: str = "bot",
+  ):
+    self.routes = dict(routes or {})
+    self.default_url = default_url
+    self.resolver = resolver
+    self.query_param = query_param
+
+  async def resolve(self, path: str) -> str | None:
+    if self.resolver:
+      url = self.resolver(path)
+      if inspect.isawaitable(url):
+        url = await url
+      if url:
+        return url
+
+    key = route_key(path, self.query_param)
+    if key is None or not (self.routes or self.resolver):
+      return self.default_url
+    url = self.routes.get(key)
+    if url is None:
+      logger.warning(f"No route for {key!r} (path: {path})")
+    return url
@@ -25,6 +25,159 @@ async def configure(
   parser.add_argument(
     "--channels", type=int, default=1, help="Number of audio channels"
   )
+  parser.add_argument(
+    "--bot-sample-rate",
+    type=int,
+    default=16000,
+    help="Sample rate the bot expects, audio is resampled when it differs from --sample-rate",
+  )
+  parser.add_argument(
+    "--bot-channels",
+    type=int,
+    default=1,
+    help="Channels the bot expects, audio is mixed down or up when it differs from --channels",
+  )
+  parser.add_argument(
+    "--frame-ms",
+    type=int,
+    default=20,
+    help="Duration of the audio frames sent to Pipecat, in milliseconds",
+  )
+  parser.add_argument(
+    "--queue-frames",
+    type=int,
+    default=25,
+    help="Maximum number of frames buffered in each direction",
+  )
+  parser.add_argument(
+    "--overflow-policy",
+    choices=["drop-oldest", "drop-silence", "disconnect"],
+    default="drop-oldest",
+    help="What to do when a connection's audio queue is full",
+  )
+  parser.add_argument(
+    "--silence-threshold",
+    type=int,
+    default=500,
+    help="Peak int16 amplitude below which a frame counts as silence",
+  )
+  parser.add_argument(
+    "--silence-gate",
+    action="store_true",
+    help="Keep long stretches of silence from reaching the bot",
+  )
+  parser.add_argument(
+    "--gate-threshold",
+    type=float,
+    default=300,
+    help="RMS int16 level at which the silence gate treats a frame as speech",
+  )
+  parser.add_argument(
+    "--gate-hangover-ms",
+    type=int,
+    default=1000,
+    help="Silence still sent after speech, keep above the bot's VAD stop time",
+  )
+  parser.add_argument(
+    "--gate-preroll-ms",
+    type=int,
+    default=300,
+    help="Silence held back and sent just before speech resumes",
+  )
+  parser.add_argument(
+    "--gate-keepalive-ms",
+    type=int,
+    default=0,
+    help="Pass one frame this often while the gate is closed (0 drops all)",
+  )
+  parser.add_argument(
+    "--upstream-pool-size",
+    type=int,
+    default=0,
+    help="Idle connections to keep open to each bot so new meetings attach instantly",
+  )
+  parser.add_argument(
+    "--reconnect-attempts",
+    type=int,
+    default=5,
+    help="How many times to try reconnecting to a bot before dropping the meeting",
+  )
+  parser.add_argument(
+    "--replay-ms",
+    type=int,
+    default=500,
+    help="Recent audio resent to a bot after reconnecting, in milliseconds",
+  )
+  parser.add_argument(
+    "--record-dir",
+    type=str,
+    default=None,
+    help="Record both directions of every meeting into this directory",
+  )
+  parser.add_argument(
+    "--record-format",
+    choices=["wav", "raw"],
+    default="wav",
+    help="File format for recordings",
+  )
+  parser.add_argument(
+    "--record-buffer-ms",
+    type=int,
+    default=10000,
+    help="Audio buffered per recorded stream before the recording drops data",
+  )
+  parser.add_argument(
+    "--workers",
+    type=int,
+    default=1,
+    help="Worker processes sharing the port through SO_REUSEPORT",
+  )
+  parser.add_argument(
+    "--uvloop",
+    action="store_true",
+    help="Use the uvloop event loop when it is installed",
+  )
+  parser.add_argument(
+    "--drain-timeout",
+    type=float,
+    default=30,
+    help="Seconds meetings get to finish on shutdown before they are closed",
+  )
+  parser.add_argument(
+    "--metrics-port",
+    type=int,
+    default=0,
+    help="Serve Prometheus metrics on this port at /metrics (disabled when 0)",
+  )
+  parser.add_argument(
+    "--metrics-host",
+    type=str,
+    default="127.0.0.1",
+    help="Host to bind the metrics endpoint to",
+  )
+  parser.add_argument(
+    "--route",
+    action="append",
+    default=[],
+    metavar="NAME=URL",
+    help="Route connections for NAME (path /NAME or ?bot=NAME) to a Pipecat WebSocket URL, can be repeated",
+  )
+  parser.add_argument(
+    "--routes-file",
+    type=str,
+    help="JSON file mapping route names to Pipecat WebSocket URLs",
+  )
+  parser.add_argument(
+    "--route-param",
+    type=str,
+    default="bot",
+    help="Query parameter holding the route name",
+  )
+  parser.add_argument(
+    "--resolver",
+    type=str,
+    help="Custom route resolver as module:function, called with the request path",
+  )
 
   args, unknown = parser.parse_known_args()
   return (
@@ -0,0 +1,239 @@
+"""Connections from the proxy to the Pipecat bots.
+
+`UpstreamPool` keeps a few idle connections open to each bot so that a new
+meeting can attach without waiting for a handshake, and `Upstream` is the bot
+side of one meeting: when its connection drops it reconnects with exponential
+backoff and replays the most recent audio, while the meeting's socket stays
+open.
+"""
+
+import asyncio
+from collections import deque
+from contextlib import suppress
+
+import websockets
+from loguru import logger
+from websockets.exceptions import ConnectionClosed
+
+
+class UpstreamUnavailable(Exception):
+  """Raised when a bot can't be reached after every reconnect attempt"""
+
+
+class _IdleConnection:
+  """A pooled connection, kept alive by reading from it until it is claimed.
+
+  Bots greet new clients as soon as they connect, so whatever the bot sends
+  while the connection is idle is kept (up to `buffer_size` messages) and
+  handed over with the connection.
+  """
+
+  def __init__(self, websocket, buffer_size: int):
+    self.websocket = websocket
+    self.buffered: deque[bytes] = deque(maxlen=buffer_size)
+    self.reader = asyncio.create_task(self._read())
+
+  async def _read(self):
+    with suppress(ConnectionClosed):
+      async for message in self.websocket:
+        if isinstance(message, bytes):
+          self.buffered.append(message)
+
+  async def claim(self):
+    self.reader.cancel()
+    with suppress(asyncio.CancelledError):
+      await self.reader
+    return self.websocket, list(self.buffered)
+
+
+class UpstreamPool:
+  """Keeps `size` idle connections open to every bot URL it has been asked for.
+
+  Connections are replaced when a meeting releases one rather than when it is
+  acquired, so a bot that only accepts one client at a time (like pipecat's
+  `WebsocketServerTransport`) never has its active meeting displaced by a
+  fresh pooled connection. Such a bot also drops an idle connection as soon
+  as the next one opens; once that happens the pool keeps a single idle
+  connection to it, and idle connections the bot keeps closing are reopened
+  with backoff rather than at once.
+  """
+
+  def __init__(self, size: int, idle_buffer_size: int = 500):
+    self.size = size
+    self.idle_buffer_size = idle_buffer_size
+    self._idle: dict[str, list[_IdleConnection]] = {}
+    self._refills: dict[str, asyncio.Task] = {}
+    # Per URL: idle connections to keep, and ones the bot closed in a row
+    self._sizes: dict[str, int] = {}
+    self._dropped: dict[str, int] = {}
+    self._closed = False
+
+  def warm(self, url: str) -> None:
+    """Open idle connections to `url` in the background"""
+    if self.size <= 0 or self._closed:
+      return
+    task = self._refills.get(url)
+    if task is None or task.done():
+      self._refills[url] = asyncio.create_task(self._refill(url))
+
+  async def _refill(self, url: str):
+    idle = self._idle.setdefault(url, [])
+    delay = 0.5
+    dropped = self._dropped.get(url, 0)
+    if dropped:
+      await asyncio.sleep(min(0.5 * 2 ** (dropped - 1), 30))
+    while not self._closed:
+      idle[:] = [conn for conn in idle if conn.websocket.open]
+      size = self._sizes.get(url, self.size)
+      if len(idle) >= size:
+        return
+      try:
+        websocket = await websockets.connect(url)
+      except Exception as e:
+        logger.warning(f"Could not pre-open connection to {url}: {e}")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 30)
+        continue
+      delay = 0.5
+      conn = _IdleConnection(websocket, self.idle_buffer_size)
+      conn.reader.add_done_callback(
+        lambda _, conn=conn: self._on_idle_closed(url, conn)
+      )
+      idle.append(conn)
+      logger.debug(f"Pre-opened connection to {url} ({len(idle)}/{size} idle)")
+
+  def _on_idle_closed(self, url: str, conn: _IdleConnection):
+    idle = self._idle.get(url, [])
+    if conn not in idle:
+      return  # claimed
+    idle.remove(conn)
+    self._dropped[url] = self._dropped.get(url, 0) + 1
+    if idle and self._sizes.get(url, self.size) > 1:
+      # Closed when a newer connection opened: the bot keeps one client
+      self._sizes[url] = 1
+      logger.warning(f"{url} accepts one client at a time, keeping one idle connection")
+    self.warm(url)
+
+  async def acquire(self, url: str):
+    """Return an open connection to `url` and any messages the bot already sent"""
+    idle = self._idle.get(url, [])
+    while idle:
+      conn = idle.pop(0)
+      websocket, buffered = await conn.claim()
+      if websocket.open:
+        self._dropped.pop(url, None)
+        return websocket, buffered
+    # Not warmed here: a new idle connection would displace this one on a
+    # single-client bot. It is refilled on release.
+    return await websockets.connect(url), []
+
+  def release(self, url: str) -> None:
+    """Called once a meeting is done with its connection to `url`"""
+    self.warm(url)
+
+  async def close(self):
+    self._closed = True
+    for task in self._refills.values():
+      task.cancel()
+    for idle in self._idle.values():
+      for conn in list(idle):
+        websocket, _ = await conn.claim()
+        await websocket.close()
+      idle.clear()
+
+
+class Upstream:
+  """The bot side of one meeting, reconnecting when the bot connection drops.
+
+  Every message sent is also kept in a ring of the last `replay_size`
+  messages, which is resent after a reconnect so the bot doesn't miss what
+  was said while the old connection was failing.
+  """
+
+  def __init__(
+    self,
+    url: str,
+    pool: UpstreamPool,
+    replay_size: int = 25,
+    max_attempts: int = 5,
+    backoff_base: float = 0.25,
+    backoff_max: float = 5.0,
+  ):
+    self.url = url
+    self.pool = pool
+    self.max_attempts = max_attempts
+    self.backoff_base = backoff_base
+    self.backoff_max = backoff_max
+    self.reconnects = 0
+    self._replay: deque[bytes] = deque(maxlen=replay_size)
+    self._websocket = None
+    self._lock = asyncio.Lock()
+    self._unavailable: UpstreamUnavailable | None = None
+
+  async def open(self) -> list[bytes]:
+    """Attach to the bot, returning messages it sent before we attached"""
+    self._websocket, buffered = await self.pool.acquire(self.url)
+    return buffered
+
+  async def close(self):
+    if self._websocket is not None:
+      await self._websocket.close()
+      self._websocket = None
+    self.pool.release(self.url)
+
+  async def send(self, message: bytes):
+    while True:
+      websocket = self._websocket
+      try:
+        await websocket.send(message)
+        self._replay.append(message)
+        return
+      except ConnectionClosed as e:
+        await self._reconnect(websocket, e)
+
+  async def messages(self):
+    """Yield messages from the bot across reconnects"""
+    while True:
+      websocket = self._websocket
+      try:
+        async for message in websocket:
+          yield message
+        error = websocket.close_rcvd
+      except ConnectionClosed as e:
+        error = e
+      await self._reconnect(websocket, error)
+
+  async def _reconnect(self, failed, error):
+    async with self._lock:
+      if self._unavailable:
+        raise self._unavailable
+      if self._websocket is not failed:
+        return  # another task already reconnected
+
+      logger.warning(f"Lost connection to {self.url} ({error}), reconnecting")
+      for attempt in range(self.max_attempts):
+        await asyncio.sleep(min(self.backoff_base * 2**attempt, self.backoff_max))
+        try:
+          websocket = await websockets.connect(self.url)
+        except Exception as e:
+          logger.warning(f"Reconnect attempt {attempt + 1} to {self.url} failed: {e}")
+          continue
+
+        try:
+          for message in self._replay:
+            await websocket.send(message)
+        except ConnectionClosed as e:
+          logger.warning(f"Connection to {self.url} closed while replaying: {e}")
+          continue
+
+        self._websocket = websocket
+        self.reconnects += 1
+        logger.info(
+          f"Reconnected to {self.url}, replayed {len(self._replay)} recent frames"
+        )
+        return
+
+      self._unavailable = UpstreamUnavailable(
+        f"Could not reconnect to {self.url} after {self.max_attempts} attempts"
+      )
+      raise self._unavailable
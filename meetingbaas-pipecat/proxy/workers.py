@@ -0,0 +1,214 @@
+"""Run the proxy as several processes sharing one listening port.
+
+Workers are started as fresh interpreters (multiprocessing's "spawn"), so a
+worker restarted while the parent's event loop is running inherits none of
+that loop's state. Each worker runs the normal proxy with SO_REUSEPORT, so
+the kernel spreads new meetings across them and a deployment can use every
+core. Workers send their
+metrics to the parent over a pipe, and the parent serves them combined on the
+metrics port. A worker that dies is started again, with a growing delay if it
+keeps dying; one that cannot stay up stops the whole group with an error. On
+SIGINT or SIGTERM the parent asks every worker to drain and waits for them to
+exit.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+from contextlib import suppress
+from multiprocessing.connection import Connection
+from typing import Callable
+
+from loguru import logger
+
+from ..prometheus import Family, render_families, serve_metrics
+from .metrics import merge_families
+
+REPORT_INTERVAL = 2.0  # seconds between metrics reports from a worker
+RESTART_BACKOFF_MAX = 30.0  # seconds
+STABLE_SECONDS = 60.0  # a worker up this long is no longer crash looping
+MAX_QUICK_RESTARTS = 5
+
+
+async def report_stats(
+  worker: int, reports: Connection, metrics, interval=REPORT_INTERVAL
+):
+  """Send `metrics` to the parent every `interval` seconds until cancelled"""
+  loop = asyncio.get_running_loop()
+  sending = None
+  try:
+    while True:
+      # Pickling and writing happen off the event loop, which would otherwise
+      # stall whenever the parent falls behind and the pipe fills up
+      sending = loop.run_in_executor(None, reports.send, (worker, metrics.collect()))
+      await asyncio.shield(sending)
+      await asyncio.sleep(interval)
+  finally:
+    # One last report so the parent's totals include the drained meetings,
+    # after any report still being written so the two don't interleave
+    with suppress(OSError):
+      if sending is not None:
+        await sending
+      reports.send((worker, metrics.collect()))
+      reports.close()
+
+
+class WorkerGroup:
+  """Starts `count` processes running `target(index, reports)` and supervises them.
+
+  `target` is pickled into each worker, so it must be a module-level function
+  (or a `functools.partial` of one).
+  """
+
+  def __init__(self, count: int, target: Callable[[int, Connection], None]):
+    self.count = count
+    self.target = target
+    self.processes: dict[int, multiprocessing.Process] = {}
+    self._reports: dict[int, Connection] = {}
+    self._families: dict[int, list[Family]] = {}
+    self._started: dict[int, float] = {}
+    self._quick_restarts: dict[int, int] = {}
+    self._loop: asyncio.AbstractEventLoop | None = None
+    self._exited: asyncio.Event | None = None
+    self._stop_requested: asyncio.Event | None = None
+    self._stopping = False
+    self.failed = False
+
+  def start(self) -> None:
+    """Start the workers"""
+    for index in range(self.count):
+      self._spawn(index)
+
+  def _spawn(self, index: int) -> None:
+    context = multiprocessing.get_context("spawn")
+    reports, child_reports = context.Pipe(duplex=False)
+    process = context.Process(
+      target=self.target,
+      args=(index, child_reports),
+      name=f"proxy-worker-{index}",
+    )
+    process.start()
+    child_reports.close()
+    self.processes[index] = process
+    self._reports[index] = reports
+    self._started[index] = time.monotonic()
+    if self._loop:
+      self._watch(index)
+    logger.info(f"Started worker {index} (pid {process.pid})")
+
+  def _watch(self, index: int) -> None:
+    self._loop.add_reader(self._reports[index].fileno(), self._on_report, index)
+    self._loop.add_reader(self.processes[index].sentinel, self._on_exit, index)
+
+  @property
+  def alive(self) -> list[int]:
+    return [i for i, p in self.processes.items() if p.exitcode is None]
+
+  def render(self) -> str:
+    families = merge_families(self._families)
+    families.insert(
+      0,
+      (
+        "proxy_workers",
+        "gauge",
+        "Worker processes running",
+        [("proxy_workers", {}, len(self.alive))],
+      ),
+    )
+    return render_families(families)
+
+  def _on_report(self, index: int) -> None:
+    reports = self._reports[index]
+    try:
+      worker, families = reports.recv()
+    except (EOFError, OSError):
+      asyncio.get_running_loop().remove_reader(reports.fileno())
+      return
+    self._families[worker] = families
+
+  def _on_exit(self, index: int) -> None:
+    process = self.processes[index]
+    self._loop.remove_reader(process.sentinel)
+    process.join()
+    log = logger.info if self._stopping else logger.error
+    log(f"Worker {index} (pid {process.pid}) exited with code {process.exitcode}")
+    # Keep its last report, sent just before it exited
+    reports = self._reports.pop(index)
+    self._loop.remove_reader(reports.fileno())
+    with suppress(EOFError, OSError):
+      while reports.poll():
+        worker, families = reports.recv()
+        self._families[worker] = families
+    reports.close()
+
+    if not self._stopping:
+      self._schedule_restart(index)
+    elif not self.alive:
+      self._exited.set()
+
+  def _schedule_restart(self, index: int) -> None:
+    if time.monotonic() - self._started[index] >= STABLE_SECONDS:
+      self._quick_restarts[index] = 0
+    quick = self._quick_restarts.get(index, 0)
+    if quick >= MAX_QUICK_RESTARTS:
+      logger.error(f"Worker {index} keeps exiting, stopping the proxy")
+      self.failed = True
+      self._stop_requested.set()
+      return
+    self._quick_restarts[index] = quick + 1
+    delay = min(2**quick - 1, RESTART_BACKOFF_MAX)
+    logger.info(f"Restarting worker {index} in {delay:.0f}s")
+    self._loop.call_later(delay, self._restart, index)
+
+  def _restart(self, index: int) -> None:
+    if not self._stopping:
+      self._spawn(index)
+
+  def _stop(self) -> None:
+    self._stopping = True
+    logger.info("Shutting down, draining workers...")
+    for index in self.alive:
+      with suppress(ProcessLookupError):
+        os.kill(self.processes[index].pid, signal.SIGTERM)
+    if not self.alive:
+      # The rest were waiting to be restarted
+      self._exited.set()
+
+  async def supervise(
+    self, metrics_host: str, metrics_port: int, drain_timeout: float
+  ) -> None:
+    """Run until a shutdown signal, then forward it to the workers and wait
+    for them to exit"""
+    loop = self._loop = asyncio.get_running_loop()
+    self._exited = asyncio.Event()
+    self._stop_requested = asyncio.Event()
+    for index in self.processes:
+      self._watch(index)
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+      loop.add_signal_handler(sig, self._stop_requested.set)
+
+    metrics_runner = None
+    if metrics_port:
+      metrics_runner = await serve_metrics(self, metrics_host, metrics_port)
+    try:
+      stopped = asyncio.create_task(self._stop_requested.wait())
+      exited = asyncio.create_task(self._exited.wait())
+      await asyncio.wait((stopped, exited), return_when=asyncio.FIRST_COMPLETED)
+      stopped.cancel()
+      if not self._exited.is_set():
+        self._stop()
+        # Workers give their meetings `drain_timeout` to finish, then close them
+        try:
+          await asyncio.wait_for(exited, drain_timeout + 10)
+        except asyncio.TimeoutError:
+          for index in self.alive:
+            logger.warning(f"Worker {index} did not exit in time, killing it")
+            self.processes[index].kill()
+    finally:
+      if metrics_runner:
+        await metrics_runner.cleanup()
+      for process in self.processes.values():
+        process.join(timeout=5)
@@ -1,22 +1,55 @@
 #!/usr/bin/env python3
-import subprocess
+"""Run bot and proxy pairs, with ngrok tunnels, for many meetings at once.
+
+Every pair starts at the same time. Workers run straight from this
+interpreter (`python -m ...`) rather than through `poetry run`, which spends a
+second or more resolving the environment for each of them. A pair counts as
+ready once a websocket handshake on its bot's and its proxy's readiness path
+succeeds, and only then is its meeting bot sent in.
+
+Bots and proxies that exit are restarted with exponential backoff, and a
+pair whose process keeps crashing is stopped. With `--warm-pairs`, ready
+pairs wait for meetings requested through the control API, which hands each
+one an already-warm pair and starts another to take its place. Each warm
+pair keeps its ngrok tunnel open while it waits, so the pool and the
+meetings under way together need that many tunnels from the ngrok account.
+"""
+
+import importlib
+import shlex
 import argparse
 import time
 import ngrok
 from loguru import logger
 import os
 import sys
-import threading
-import queue
 import asyncio
+import heapq
+from collections import deque
 from datetime import datetime
 from contextlib import suppress
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Optional
 
+import websockets
+from aiohttp import web
 from dotenv import load_dotenv
 
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+READY_PATH = importlib.import_module("meetingbaas-pipecat.protocol").READY_PATH
+
 load_dotenv(override=True)
 
+BOT_MODULE = "meetingbaas-pipecat.bot.bot"
+PROXY_MODULE = "meetingbaas-pipecat.proxy.proxy"
+MEETINGBAAS_MODULE = "scripts.meetingbaas"
+PROBE_INTERVAL = 0.1
+# Lines of a process's output shown when it exits
+EXIT_TAIL_LINES = 10
+RESTART_BACKOFF_MAX = 30.0
+# Before the warm pool tries again after a pair failed to start
+POOL_RETRY_DELAY = 5.0
+
 logger.remove()
 logger.add(sys.stderr, level="INFO")
 
@@ -27,6 +60,48 @@ def validate_url(url):
     raise ValueError("URL must start with https://")
   return url
 
+
+def python_command(module: str, *args) -> List[str]:
+  """Run `module` with this interpreter, as its poetry script would"""
+  return [sys.executable, "-m", module, *(str(arg) for arg in args)]
+
+
+async def wait_ready(
+  port: int, process: asyncio.subprocess.Process, timeout: float
+) -> None:
+  """Wait until a websocket handshake on the readiness path of `port`
+  succeeds, failing early if `process` exits first"""
+  url = f"ws://localhost:{port}{READY_PATH}"
+  loop = asyncio.get_running_loop()
+  deadline = loop.time() + timeout
+  while True:
+    if process.returncode is not None:
+      raise RuntimeError(f"exited with code {process.returncode}")
+    try:
+      remaining = max(deadline - loop.time(), PROBE_INTERVAL)
+      async with websockets.connect(url, open_timeout=remaining):
+        return
+    except (OSError, asyncio.TimeoutError, websockets.InvalidHandshake):
+      if loop.time() >= deadline:
+        raise TimeoutError(f"not ready on port {port} after {timeout:.0f}s")
+      await asyncio.sleep(PROBE_INTERVAL)
+
+
+def use_pidfd_child_watcher(loop: asyncio.AbstractEventLoop) -> None:
+  """Python 3.11 waits for each child process from a thread of its own unless
+  told to use pidfds, which 3.12 does by itself where the kernel has them"""
+  if sys.version_info >= (3, 12) or not hasattr(os, "pidfd_open"):
+    return
+  try:
+    os.close(os.pidfd_open(os.getpid()))
+  except OSError:
+    return
+  watcher = asyncio.PidfdChildWatcher()
+  # Only attached by set_event_loop() if set before it
+  watcher.attach_loop(loop)
+  asyncio.set_child_watcher(watcher)
+
+
 def get_user_input(prompt, validator=None):
   while True:
     user_input = input(prompt).strip()
@@ -38,45 +113,105 @@ def get_user_input(prompt, validator=None):
     else:
       return user_input
 
-class ProcessLogger:
-  def __init__(self, process_name: str, process: subprocess.Popen):
-    self.process_name = process_name
-    self.process = process
-    self.stdout_queue: queue.Queue = queue.Queue()
-    self.stderr_queue: queue.Queue = queue.Queue()
-    self._stop_event = threading.Event()
+class LogMultiplexer:
+  """Reads every child's output in the event loop and writes it, prefixed
+  with the child's name, through one batched writer.
 
-  def log_output(self, pipe, queue: queue.Queue, is_error: bool = False) -> None:
-    """Log output from a pipe to a queue and logger"""
-    try:
-      for line in iter(pipe.readline, ""):
-        if self._stop_event.is_set():
-          break
-        line = line.strip()
-        if line:
-          queue.put(line)
-          log_msg = f"[{self.process_name}] {line}"
-          print(log_msg)
-    finally:
-      pipe.close()
+  Each child keeps its last `tail_lines` lines in a ring buffer. At most
+  `lines_per_second` lines are written; the rest are counted as dropped,
+  though still kept in their child's ring, so a chatty child can neither
+  stall the others nor grow the supervisor's memory.
+  """
 
-  def start_logging(self) -> Tuple[threading.Thread, threading.Thread]:
-    """Start logging threads for stdout and stderr"""
-    stdout_thread = threading.Thread(
-      target=self.log_output, args=(self.process.stdout, self.stdout_queue), daemon=True
-    )
-    stderr_thread = threading.Thread(
-      target=self.log_output,
-      args=(self.process.stderr, self.stderr_queue, True),
-      daemon=True,
-    )
-    stdout_thread.start()
-    stderr_thread.start()
-    return stdout_thread, stderr_thread
+  def __init__(
+    self,
+    tail_lines: int = 200,
+    lines_per_second: int = 2000,
+    flush_interval: float = 0.1,
+    output=sys.stdout,
+  ):
+    self.tail_lines = tail_lines
+    self.flush_interval = flush_interval
+    self.output = output
+    self._batch_lines = max(1, int(lines_per_second * flush_interval))
+    self._pending: List[str] = []
+    self._dropped: Dict[str, int] = {}
+    self._tails: Dict[str, deque] = {}
+    self._readers: Dict[str, List[asyncio.Task]] = {}
+    self._writer: Optional[asyncio.Task] = None
+
+  def attach(self, name: str, process: asyncio.subprocess.Process) -> None:
+    """Start reading `process`'s stdout and stderr"""
+    if self._writer is None:
+      self._writer = asyncio.create_task(self._write())
+    # A restarted process keeps the output of its previous runs
+    self._tails.setdefault(name, deque(maxlen=self.tail_lines))
+    self._readers[name] = [
+      asyncio.create_task(self._read(name, stream))
+      for stream in (process.stdout, process.stderr)
+    ]
+
+  def tail(self, name: str) -> List[str]:
+    """The most recent lines of `name`'s output"""
+    return list(self._tails.get(name, ()))
+
+  async def _read(self, name: str, stream: asyncio.StreamReader) -> None:
+    tail = self._tails[name]
+    while True:
+      try:
+        line = await stream.readline()
+      except ValueError:
+        # Longer than the stream's limit; asyncio has already discarded it
+        line = b"[line too long, skipped]\n"
+      if not line:
+        return
+      text = line.decode(errors="replace").strip()
+      if not text:
+        continue
+      tail.append(text)
+      if len(self._pending) < self._batch_lines:
+        self._pending.append(f"[{name}] {text}\n")
+      else:
+        self._dropped[name] = self._dropped.get(name, 0) + 1
 
-  def stop(self) -> None:
-    """Stop the logging threads gracefully"""
-    self._stop_event.set()
+  async def _write(self) -> None:
+    while True:
+      await asyncio.sleep(self.flush_interval)
+      self.flush()
+
+  def flush(self) -> None:
+    """Write the lines read since the last flush in one go"""
+    if self._dropped:
+      dropped = ", ".join(f"{n} from {name}" for name, n in self._dropped.items())
+      self._pending.append(f"[batch] Output over the rate limit, dropped {dropped}\n")
+      self._dropped.clear()
+    if not self._pending:
+      return
+    self.output.write("".join(self._pending))
+    self.output.flush()
+    self._pending.clear()
+
+  async def detach(self, name: str, timeout: float = 1.0) -> None:
+    """Stop reading `name` once what it wrote before exiting has been read"""
+    readers = self._readers.pop(name, [])
+    if readers:
+      _, pending = await asyncio.wait(readers, timeout=timeout)
+      for task in pending:
+        task.cancel()
+
+  async def remove(self, name: str) -> None:
+    """Stop reading `name` and forget its output"""
+    await self.detach(name)
+    self._tails.pop(name, None)
+
+  async def close(self) -> None:
+    await asyncio.gather(*(self.detach(name) for name in list(self._readers)))
+    if self._writer:
+      self._writer.cancel()
+      with suppress(asyncio.CancelledError):
+        await self._writer
+      self._writer = None
+    self.flush()
 
 
 class BotProxyManager:
@@ -84,7 +219,27 @@ class BotProxyManager:
     self.processes: Dict = {}
     self.listeners: List = []
     self.start_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+    self.ready_timeout = 60.0
+    self.starting: Optional[asyncio.Semaphore] = None
+    self.logs = LogMultiplexer()
     self.shutdown_event = asyncio.Event()
+    # Restarts back off from restart_backoff up to RESTART_BACKOFF_MAX, and a
+    # process that exits more than crash_loop_restarts times within
+    # crash_loop_window seconds is given up on
+    self.restart_backoff = 1.0
+    self.crash_loop_restarts = 5
+    self.crash_loop_window = 60.0
+    # Pairs by number, and the ready ones not in a meeting, oldest first
+    self.pairs: Dict[int, Dict] = {}
+    self.idle: deque = deque()
+    # Numbers of retired pairs, lowest first, handed out again before
+    # next_pair so the ports in use stay within the first few pairs' worth
+    self.free_pairs: List[int] = []
+    self.next_pair = 1
+    self.start_port = 8765
+    self.warm_pairs = 0
+    self.warming = 0
+    self._tasks: set = set()
 
   async def create_ngrok_tunnel(self, port: int, name: str) -> Optional[ngrok.Listener]:
     """Create an ngrok tunnel for the given port"""
@@ -97,68 +252,100 @@ class BotProxyManager:
       logger.error(f"Error creating ngrok tunnel for {name}: {e}")
       return None
 
-  def run_command(self, command: str, process_name: str) -> Optional[subprocess.Popen]:
+  async def close_listener(self, listener) -> None:
+    try:
+      tunnel_url = listener.url()
+      logger.info(f"Closing ngrok tunnel: {tunnel_url}")
+      with suppress(Exception):
+        await listener.close()
+      logger.success(f"Successfully closed ngrok tunnel: {tunnel_url}")
+    except Exception as e:
+      logger.error(f"Error closing ngrok tunnel: {e}")
+
+  async def run_command(
+    self,
+    command: List[str],
+    process_name: str,
+    port: Optional[int] = None,
+    pair: Optional[int] = None,
+  ) -> Optional[asyncio.subprocess.Process]:
     """Run a command and set up logging for its output"""
     try:
-      logger.info(f"Starting process: {process_name} with command: {command}")
-      process = subprocess.Popen(
-        command,
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1,
-        universal_newlines=True,
+      logger.info(
+        f"Starting process: {process_name} with command: {shlex.join(command)}"
+      )
+      process = await asyncio.create_subprocess_exec(
+        *command,
+        cwd=ROOT,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+      )
+      self.logs.attach(process_name, process)
+      # Kept across restarts, with the exits that count towards a crash loop
+      process_info = self.processes.setdefault(
+        process_name, {"exits": deque(), "restart": False}
+      )
+      process_info.update(
+        process=process,
+        command=command,
+        port=port,
+        pair=pair,
+        stopping=False,
+        reported=False,
       )
-
-      process_logger = ProcessLogger(process_name, process)
-      stdout_thread, stderr_thread = process_logger.start_logging()
-
-      self.processes[process_name] = {
-        "process": process,
-        "logger": process_logger,
-        "threads": (stdout_thread, stderr_thread),
-      }
-
       return process
 
     except Exception as e:
       logger.error(f"Error starting process {process_name}: {e}")
       return None
 
+  def spawn(self, coroutine) -> asyncio.Task:
+    """Run `coroutine` in the background until it finishes or cleanup"""
+    task = asyncio.create_task(coroutine)
+    self._tasks.add(task)
+    task.add_done_callback(self._tasks.discard)
+    return task
+
   async def cleanup(self) -> None:
     """Cleanup all processes and tunnels"""
     logger.info("Initiating cleanup of all processes and tunnels...")
+    for task in list(self._tasks):
+      task.cancel()
+    await asyncio.gather(*self._tasks, return_exceptions=True)
 
     # First close ngrok tunnels
     for listener in self.listeners:
-      try:
-        tunnel_url = listener.url()
-        logger.info(f"Closing ngrok tunnel: {tunnel_url}")
-        with suppress(Exception):
-          await listener.close()
-        logger.success(f"Successfully closed ngrok tunnel: {tunnel_url}")
-      except Exception as e:
-        logger.error(f"Error closing ngrok tunnel: {e}")
+      await self.close_listener(listener)
 
-    # Then terminate all processes
-    for name, process_info in self.processes.items():
-      process = process_info["process"]
-      process_logger = process_info["logger"]
+    # Then terminate all processes, together
+    for process_info in self.processes.values():
+      process_info["stopping"] = True
+    await asyncio.gather(
+      *(
+        self.terminate(name, process_info["process"])
+        for name, process_info in self.processes.items()
+      )
+    )
+    await self.logs.close()
+
+  async def terminate(self, name: str, process: asyncio.subprocess.Process) -> None:
+    try:
+      if process.returncode is not None:
+        return
+      logger.info(f"Terminating process: {name}")
+      process.terminate()
       try:
-        logger.info(f"Terminating process: {name}")
-        process_logger.stop()  # Stop logging threads gracefully
-        process.terminate()
-        try:
-          process.wait(timeout=5)
-          logger.success(f"Process {name} terminated successfully")
-        except subprocess.TimeoutExpired:
-          logger.warning(f"Force killing process {name} that didn't terminate...")
-          process.kill()
-          process.wait()
-          logger.success(f"Process {name} force killed")
-      except Exception as e:
-        logger.error(f"Error terminating process {name}: {e}")
+        await asyncio.wait_for(process.wait(), timeout=5)
+        logger.success(f"Process {name} terminated successfully")
+      except asyncio.TimeoutError:
+        logger.warning(f"Force killing process {name} that didn't terminate...")
+        process.kill()
+        await process.wait()
+        logger.success(f"Process {name} force killed")
+    except ProcessLookupError:
+      pass
+    except Exception as e:
+      logger.error(f"Error terminating process {name}: {e}")
 
   async def monitor_processes(self) -> None:
     """Monitor running processes and handle failures"""
@@ -166,9 +353,11 @@ class BotProxyManager:
       try:
         for name, process_info in list(self.processes.items()):
           process = process_info["process"]
-          if process.poll() is not None:
-            logger.warning(f"Process {name} exited with code: {process.returncode}")
-            # Could add restart logic here if needed
+          if process.returncode is None or process_info["reported"]:
+            continue
+          process_info["reported"] = True
+          if not process_info["stopping"]:
+            self.spawn(self.handle_exit(name, process_info))
         await asyncio.sleep(1)
       except asyncio.CancelledError:
         break
@@ -176,12 +365,81 @@ class BotProxyManager:
         logger.error(f"Error monitoring processes: {e}")
         await asyncio.sleep(1)
 
+  async def handle_exit(self, name: str, process_info: Dict) -> None:
+    # Once the rest of its output has been read
+    await self.logs.detach(name)
+    if process_info["stopping"]:
+      return  # its pair was retired meanwhile
+    last_lines = "\n".join(self.logs.tail(name)[-EXIT_TAIL_LINES:])
+    logger.warning(
+      f"Process {name} exited with code: {process_info['process'].returncode}, "
+      f"last output:\n{last_lines}"
+    )
+    if process_info["restart"]:
+      await self.restart(name)
+    elif process_info["pair"] is not None:
+      code = process_info["process"].returncode
+      pair = self.pairs.get(process_info["pair"])
+      if pair is not None and pair["state"] == "starting":
+        # Its bot or proxy died before becoming ready
+        reason = f"{name} exited with code {code} while starting"
+      else:
+        # The meeting bot has left, taking the bot's conversation with it
+        reason = f"its meeting ended ({name} exited with code {code})"
+      await self.retire_pair(process_info["pair"], reason)
+
+  async def restart(self, name: str) -> None:
+    """Start `name` again after a backoff, unless it is crash looping"""
+    process_info = self.processes.get(name)
+    if process_info is None or process_info["stopping"]:
+      return
+    now = asyncio.get_running_loop().time()
+    exits = process_info["exits"]
+    exits.append(now)
+    while now - exits[0] > self.crash_loop_window:
+      exits.popleft()
+    if len(exits) > self.crash_loop_restarts:
+      logger.error(
+        f"Process {name} exited {len(exits)} times within "
+        f"{self.crash_loop_window:.0f}s, not restarting it"
+      )
+      process_info["stopping"] = True
+      if process_info["pair"] is not None:
+        await self.retire_pair(process_info["pair"], f"{name} is crash looping")
+      return
+
+    delay = min(self.restart_backoff * 2 ** (len(exits) - 1), RESTART_BACKOFF_MAX)
+    logger.warning(
+      f"Restarting {name} in {delay:.1f}s "
+      f"({len(exits)} exits within {self.crash_loop_window:.0f}s)"
+    )
+    await asyncio.sleep(delay)
+    if self.shutdown_event.is_set() or process_info["stopping"]:
+      return
+    process = await self.run_command(
+      process_info["command"], name, process_info["port"], process_info["pair"]
+    )
+    if not process or process_info["port"] is None:
+      return
+    try:
+      await wait_ready(process_info["port"], process, self.ready_timeout)
+      logger.success(f"Process {name} restarted")
+    except Exception as e:
+      logger.error(f"Restarted {name} did not become ready: {e}")
+      # Counts as another exit, so the next restart backs off further
+      with suppress(ProcessLookupError):
+        process.terminate()
+
   async def async_main(self) -> None:
     parser = argparse.ArgumentParser(
       description="Run bot and proxy command pairs with ngrok tunnels"
     )
     parser.add_argument(
-      "-c", "--count", type=int, required=True, help="Number of bot-proxy pairs to run"
+      "-c",
+      "--count",
+      type=int,
+      default=0,
+      help="Number of bot-proxy pairs to start in the meeting (default: 0)",
     )
     parser.add_argument(
       "-s",
@@ -194,10 +452,100 @@ class BotProxyManager:
       "--meeting-url", 
       help="The meeting URL (must start with https://)"
     )
+    parser.add_argument(
+      "--shared-proxy",
+      action="store_true",
+      help="Route all bots through a single proxy and ngrok tunnel",
+    )
+    parser.add_argument(
+      "--multi-session",
+      action="store_true",
+      help="With --shared-proxy, serve every meeting from one bot process",
+    )
+    parser.add_argument(
+      "--ready-timeout",
+      type=float,
+      default=60.0,
+      help="Seconds a bot or proxy may take to accept connections (default: 60)",
+    )
+    parser.add_argument(
+      "--max-starting",
+      type=int,
+      default=0,
+      help="Pairs starting at once, to spread out startup CPU (default: 0, all)",
+    )
+    parser.add_argument(
+      "--log-tail-lines",
+      type=int,
+      default=200,
+      help="Recent output lines kept per process (default: 200)",
+    )
+    parser.add_argument(
+      "--log-lines-per-second",
+      type=int,
+      default=2000,
+      help="Most lines of process output printed per second, the rest are dropped (default: 2000)",
+    )
+    parser.add_argument(
+      "--warm-pairs",
+      type=int,
+      default=0,
+      help="Ready pairs kept waiting for meetings requested through the control API. "
+      "Each holds an ngrok tunnel open while idle, which counts against the "
+      "account's tunnel limit (default: 0)",
+    )
+    parser.add_argument(
+      "--control-port",
+      type=int,
+      default=0,
+      help="Serve the control API on this port (default: 0, disabled)",
+    )
+    parser.add_argument(
+      "--control-host",
+      default="127.0.0.1",
+      help="Host for --control-port (default: 127.0.0.1)",
+    )
+    parser.add_argument(
+      "--control-socket",
+      help="Serve the control API on this Unix socket",
+    )
+    parser.add_argument(
+      "--restart-backoff",
+      type=float,
+      default=1.0,
+      help="Seconds before restarting a bot or proxy that exited, doubled for each recent exit (default: 1)",
+    )
+    parser.add_argument(
+      "--crash-loop-restarts",
+      type=int,
+      default=5,
+      help="Restarts within --crash-loop-window after which a process is given up on (default: 5)",
+    )
+    parser.add_argument(
+      "--crash-loop-window",
+      type=float,
+      default=60.0,
+      help="Seconds over which exits count towards a crash loop (default: 60)",
+    )
     args = parser.parse_args()
+    self.logs = LogMultiplexer(args.log_tail_lines, args.log_lines_per_second)
+    self.ready_timeout = args.ready_timeout
+    if args.max_starting > 0:
+      self.starting = asyncio.Semaphore(args.max_starting)
+    self.restart_backoff = args.restart_backoff
+    self.crash_loop_restarts = args.crash_loop_restarts
+    self.crash_loop_window = args.crash_loop_window
+    self.start_port = args.start_port
+    controlled = args.control_port or args.control_socket
+    if args.shared_proxy and (controlled or args.warm_pairs):
+      logger.error("The control API and warm pairs need one proxy per bot")
+      return
+    if not (args.count or controlled):
+      logger.error("Nothing to run: pass --count, --control-port or --control-socket")
+      return
 
     meeting_url = args.meeting_url
-    if not args.meeting_url:
+    if not args.meeting_url and args.count:
       logger.info("Prompting for meeting URL")
       meeting_url = get_user_input(
         "Enter the meeting URL (must start with https://): ", validate_url
@@ -207,57 +555,24 @@ class BotProxyManager:
       logger.error("NGROK_AUTHTOKEN environment variable is not set")
       return
 
-    current_port = args.start_port
-
+    control = None
     try:
-      logger.info(f"Starting {args.count} bot-proxy pairs with ngrok tunnels...")
-
-      for i in range(args.count):
-        pair_num = i + 1
-
-        # Start bot
-        bot_port = current_port
-        bot_name = f"bot_{pair_num}"
-        bot_process = self.run_command(f"poetry run bot -p {bot_port}", bot_name)
-        if not bot_process:
-          continue
-
-        await asyncio.sleep(1)
+      # Started first, so processes that exit during startup are restarted
+      monitor_task = asyncio.create_task(self.monitor_processes())
 
-        # Start proxy
-        proxy_port = current_port + 1
-        proxy_name = f"proxy_{pair_num}"
-        proxy_process = self.run_command(
-          f"poetry run proxy -p {proxy_port} --websocket-url ws://localhost:{bot_port}",
-          proxy_name,
+      if args.shared_proxy:
+        await self.start_shared_proxy(
+          args.count, args.start_port, meeting_url, args.multi_session
         )
-        if not proxy_process:
-          logger.error(f"Failed to start {proxy_name}, terminating {bot_name}")
-          self.processes[bot_name]["process"].terminate()
-          continue
-
-        # Create ngrok tunnel for the proxy
-        listener = await self.create_ngrok_tunnel(proxy_port, f"tunnel_{pair_num}")
-        if listener:
-          self.listeners.append(listener)
-          meeting_name = f"meeting_{pair_num}"
-          meeting_process = self.run_command(
-            f"poetry run meetingbaas --meeting-url {meeting_url} --ngrok-url {listener.url()}",
-            meeting_name,
+      else:
+        if controlled:
+          control = await self.serve_control(
+            args.control_host, args.control_port, args.control_socket
           )
-          if not meeting_process:
-            logger.error(f"Failed to start {meeting_name}")
-
-        current_port += 2
-        await asyncio.sleep(1)
-
-      logger.success(
-        f"Successfully started {args.count} bot-proxy pairs with ngrok tunnels"
-      )
-      logger.info("Press Ctrl+C to stop all processes and close tunnels")
-
-      # Start process monitor
-      monitor_task = asyncio.create_task(self.monitor_processes())
+        self.warm_pairs = args.warm_pairs
+        self.fill_pool()
+        if args.count:
+          await self.start_pairs(args.count, meeting_url)
 
       try:
         await self.shutdown_event.wait()
@@ -272,9 +587,425 @@ class BotProxyManager:
     except Exception as e:
       logger.error(f"Unexpected error: {e}")
     finally:
+      if control:
+        await control.cleanup()
       await self.cleanup()
       logger.success("Cleanup completed successfully")
 
+  def stop_process(self, name: str) -> None:
+    process_info = self.processes.get(name)
+    if not process_info:
+      return
+    process_info["stopping"] = True
+    if process_info["process"].returncode is None:
+      with suppress(ProcessLookupError):
+        process_info["process"].terminate()
+
+  async def start_ready(
+    self, command: List[str], name: str, port: int, pair: Optional[int] = None
+  ) -> Optional[asyncio.subprocess.Process]:
+    """Run `command` and wait until it accepts connections on `port`. Once
+    it has, the process is restarted whenever it exits."""
+    process = await self.run_command(command, name, port, pair)
+    if not process:
+      return None
+    try:
+      await wait_ready(port, process, self.ready_timeout)
+    except Exception as e:
+      logger.error(f"{name} did not become ready: {e}")
+      self.stop_process(name)
+      return None
+    self.processes[name]["restart"] = True
+    return process
+
+  async def start_meeting(
+    self,
+    meeting_name: str,
+    meeting_url: str,
+    ngrok_url: str,
+    pair: Optional[int] = None,
+  ) -> Optional[asyncio.subprocess.Process]:
+    meeting_process = await self.run_command(
+      python_command(
+        MEETINGBAAS_MODULE, "--meeting-url", meeting_url, "--ngrok-url", ngrok_url
+      ),
+      meeting_name,
+      pair=pair,
+    )
+    if not meeting_process:
+      logger.error(f"Failed to start {meeting_name}")
+    return meeting_process
+
+  async def start_pair(self, meeting_url: Optional[str] = None) -> Optional[int]:
+    """Start one bot, proxy and ngrok tunnel together. Once all three are up,
+    send the meeting bot in to `meeting_url`, or keep the pair warm for the
+    next meeting. Returns the pair's number."""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    if self.free_pairs:
+      pair_num = heapq.heappop(self.free_pairs)
+    else:
+      pair_num = self.next_pair
+      self.next_pair += 1
+    bot_port = self.start_port + 2 * (pair_num - 1)
+    proxy_port = bot_port + 1
+    pair = self.pairs[pair_num] = {
+      "state": "starting",
+      "bot_port": bot_port,
+      "proxy_port": proxy_port,
+      "listener": None,
+      "meeting_url": None,
+      "ready_seconds": None,
+    }
+
+    # The proxy only connects to the bot once a meeting does, and the tunnel
+    # only to the proxy, so none of them waits for another
+    bot, proxy, listener = await asyncio.gather(
+      self.start_ready(
+        python_command(BOT_MODULE, "-p", bot_port),
+        f"bot_{pair_num}",
+        bot_port,
+        pair_num,
+      ),
+      self.start_ready(
+        python_command(
+          PROXY_MODULE,
+          "-p",
+          proxy_port,
+          "--websocket-url",
+          f"ws://localhost:{bot_port}",
+        ),
+        f"proxy_{pair_num}",
+        proxy_port,
+        pair_num,
+      ),
+      self.create_ngrok_tunnel(proxy_port, f"tunnel_{pair_num}"),
+    )
+    if pair["state"] != "starting":
+      # Retired meanwhile, before its tunnel was known and maybe before its
+      # processes were, so stop what came up since before giving the number
+      # back
+      await self.stop_pair_processes(pair_num)
+      if listener:
+        await self.close_listener(listener)
+      heapq.heappush(self.free_pairs, pair_num)
+      return None
+    if listener:
+      self.listeners.append(listener)
+      pair["listener"] = listener
+    if not (bot and proxy and listener):
+      logger.error(f"Pair {pair_num} failed to start, stopping it")
+      await self.retire_pair(pair_num, "it failed to start")
+      heapq.heappush(self.free_pairs, pair_num)
+      return None
+
+    pair["ready_seconds"] = loop.time() - started
+    logger.info(f"Pair {pair_num} ready in {pair['ready_seconds']:.2f}s")
+    if meeting_url:
+      await self.assign_pair(pair_num, meeting_url)
+    else:
+      pair["state"] = "idle"
+      self.idle.append(pair_num)
+    return pair_num
+
+  async def assign_pair(self, pair_num: int, meeting_url: str) -> bool:
+    pair = self.pairs[pair_num]
+    pair["state"] = "meeting"
+    pair["meeting_url"] = meeting_url
+    if not await self.start_meeting(
+      f"meeting_{pair_num}", meeting_url, pair["listener"].url(), pair_num
+    ):
+      await self.retire_pair(pair_num, "its meeting bot failed to start")
+      return False
+    return True
+
+  async def retire_pair(self, pair_num: int, reason: str) -> None:
+    """Stop a pair's processes and tunnel, and top the warm pool back up"""
+    pair = self.pairs.pop(pair_num, None)
+    if pair is None:
+      return
+    was_ready = pair["state"] != "starting"
+    pair["state"] = "retired"
+    with suppress(ValueError):
+      self.idle.remove(pair_num)
+    logger.info(f"Retiring pair {pair_num}: {reason}")
+
+    await self.stop_pair_processes(pair_num)
+    if pair["listener"]:
+      with suppress(ValueError):
+        self.listeners.remove(pair["listener"])
+      await self.close_listener(pair["listener"])
+    # A pair that never started gives its number back in start_pair, and is
+    # retried by the pool's own backoff
+    if was_ready:
+      heapq.heappush(self.free_pairs, pair_num)
+      self.fill_pool()
+
+  async def stop_pair_processes(self, pair_num: int) -> None:
+    names = [
+      name
+      for name in (f"meeting_{pair_num}", f"bot_{pair_num}", f"proxy_{pair_num}")
+      if name in self.processes
+    ]
+    for name in names:
+      self.processes[name]["stopping"] = True
+    await asyncio.gather(
+      *(self.terminate(name, self.processes[name]["process"]) for name in names)
+    )
+    for name in names:
+      del self.processes[name]
+      await self.logs.remove(name)
+
+  def fill_pool(self) -> None:
+    """Start pairs until `warm_pairs` are idle or on their way"""
+    if self.shutdown_event.is_set():
+      return
+    for _ in range(self.warm_pairs - len(self.idle) - self.warming):
+      self.warming += 1
+      self.spawn(self.warm_pair())
+
+  async def warm_pair(self) -> None:
+    try:
+      if await self.start_limited(self.start_pair()) is None:
+        await asyncio.sleep(POOL_RETRY_DELAY)
+    finally:
+      self.warming -= 1
+    self.fill_pool()
+
+  async def request_meeting(self, meeting_url: str) -> Dict:
+    """Send a bot to `meeting_url` from a warm pair, or a new one if none is
+    idle"""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    while self.idle:
+      pair_num = self.idle.popleft()
+      if await self.assign_pair(pair_num, meeting_url):
+        warm = True
+        break
+    else:
+      warm = False
+      pair_num = await self.start_limited(self.start_pair(meeting_url))
+      if pair_num is None or pair_num not in self.pairs:
+        raise RuntimeError("No pair could be started for the meeting")
+    self.fill_pool()
+    seconds = loop.time() - started
+    logger.info(
+      f"Meeting {meeting_url} served by {'warm' if warm else 'new'} pair "
+      f"{pair_num} in {seconds:.2f}s"
+    )
+    return {**self.describe_pair(pair_num), "warm": warm, "seconds": seconds}
+
+  def describe_pair(self, pair_num: int) -> Dict:
+    pair = self.pairs[pair_num]
+    restarts = {
+      kind: len(self.processes[f"{kind}_{pair_num}"]["exits"])
+      for kind in ("bot", "proxy")
+      if f"{kind}_{pair_num}" in self.processes
+    }
+    return {
+      "pair": pair_num,
+      "state": pair["state"],
+      "bot_port": pair["bot_port"],
+      "proxy_port": pair["proxy_port"],
+      "url": pair["listener"].url() if pair["listener"] else None,
+      "meeting_url": pair["meeting_url"],
+      "ready_seconds": pair["ready_seconds"],
+      "recent_exits": restarts,
+    }
+
+  async def serve_control(
+    self, host: str, port: int, socket_path: Optional[str] = None
+  ) -> web.AppRunner:
+    """Serve the control API:
+
+    GET    /pairs           every pair and the warm pool
+    POST   /pairs           {"count": n} start n more warm pairs
+    DELETE /pairs/{pair}    stop a pair, in a meeting or not
+    PUT    /pool            {"size": n} keep n warm pairs
+    POST   /meetings        {"meeting_url": url} send a bot to a meeting
+    """
+
+    async def body(request: web.Request) -> Dict:
+      try:
+        data = await request.json()
+      except ValueError:
+        raise web.HTTPBadRequest(text="Expected a JSON object")
+      if not isinstance(data, dict):
+        raise web.HTTPBadRequest(text="Expected a JSON object")
+      return data
+
+    def count(data: Dict, key: str, default: Optional[int] = None) -> int:
+      value = data.get(key, default)
+      if not isinstance(value, int) or value < 0:
+        raise web.HTTPBadRequest(text=f"{key} must be a non-negative integer")
+      return value
+
+    async def list_pairs(request: web.Request) -> web.Response:
+      return web.json_response(
+        {
+          "pairs": [self.describe_pair(pair_num) for pair_num in self.pairs],
+          "idle": len(self.idle),
+          "warming": self.warming,
+          "warm_pairs": self.warm_pairs,
+        }
+      )
+
+    async def add_pairs(request: web.Request) -> web.Response:
+      started = await asyncio.gather(
+        *(
+          self.start_limited(self.start_pair())
+          for _ in range(count(await body(request), "count", 1))
+        )
+      )
+      return web.json_response(
+        {"started": [pair_num for pair_num in started if pair_num is not None]}
+      )
+
+    async def remove_pair(request: web.Request) -> web.Response:
+      try:
+        pair_num = int(request.match_info["pair"])
+      except ValueError:
+        raise web.HTTPBadRequest(text="Pair must be a number")
+      if pair_num not in self.pairs:
+        raise web.HTTPNotFound(text=f"No pair {pair_num}")
+      await self.retire_pair(pair_num, "removed through the control API")
+      return web.json_response({"removed": pair_num})
+
+    async def resize_pool(request: web.Request) -> web.Response:
+      self.warm_pairs = count(await body(request), "size")
+      logger.info(f"Keeping {self.warm_pairs} warm pairs")
+      self.fill_pool()
+      # Pairs beyond the new size are stopped, the newest first
+      while len(self.idle) > self.warm_pairs:
+        await self.retire_pair(self.idle.pop(), "the warm pool shrank")
+      return web.json_response({"warm_pairs": self.warm_pairs})
+
+    async def add_meeting(request: web.Request) -> web.Response:
+      try:
+        meeting_url = validate_url(str((await body(request)).get("meeting_url", "")))
+      except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+      try:
+        return web.json_response(await self.request_meeting(meeting_url))
+      except RuntimeError as e:
+        raise web.HTTPServiceUnavailable(text=str(e))
+
+    app = web.Application()
+    app.router.add_get("/pairs", list_pairs)
+    app.router.add_post("/pairs", add_pairs)
+    app.router.add_delete("/pairs/{pair}", remove_pair)
+    app.router.add_put("/pool", resize_pool)
+    app.router.add_post("/meetings", add_meeting)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    if port:
+      await web.TCPSite(runner, host, port).start()
+      logger.info(f"Control API on http://{host}:{port}")
+    if socket_path:
+      await web.UnixSite(runner, socket_path).start()
+      logger.info(f"Control API on {socket_path}")
+    return runner
+
+  async def start_limited(self, start):
+    if self.starting is None:
+      return await start
+    async with self.starting:
+      return await start
+
+  async def start_pairs(self, count: int, meeting_url: str) -> None:
+    """Start one bot, proxy and ngrok tunnel per meeting, every pair at once"""
+    logger.info(f"Starting {count} bot-proxy pairs with ngrok tunnels...")
+    started = time.monotonic()
+    pair_nums = await asyncio.gather(
+      *(self.start_limited(self.start_pair(meeting_url)) for _ in range(count))
+    )
+    self.report_ready(
+      [
+        self.pairs[pair_num]["ready_seconds"]
+        for pair_num in pair_nums
+        if pair_num in self.pairs
+      ],
+      count,
+      started,
+    )
+    logger.info("Press Ctrl+C to stop all processes and close tunnels")
+
+  def report_ready(self, ready: List[float], count: int, started: float) -> None:
+    """Log the fleet's time-to-ready, and the spread across pairs"""
+    elapsed = time.monotonic() - started
+    if not ready:
+      logger.error(f"None of {count} pairs became ready ({elapsed:.2f}s)")
+      return
+    ready = sorted(ready)
+    log = logger.success if len(ready) == count else logger.warning
+    log(
+      f"{len(ready)} of {count} pairs ready in {elapsed:.2f}s "
+      f"(pair p50 {ready[len(ready) // 2]:.2f}s, slowest {ready[-1]:.2f}s)"
+    )
+
+  async def start_shared_proxy(
+    self, count: int, start_port: int, meeting_url: str, multi_session: bool = False
+  ) -> None:
+    """Start the bots for every meeting behind a single routing proxy and ngrok
+    tunnel, either one bot process per meeting or one serving them all"""
+    started = time.monotonic()
+    proxy_port = start_port + count
+    if multi_session:
+      logger.info(f"Starting one bot for {count} meetings behind a shared proxy...")
+      bots = [
+        self.start_ready(
+          python_command(BOT_MODULE, "-p", start_port, "--multi-session"),
+          "bot",
+          start_port,
+        )
+      ]
+      # With no routes, the proxy sends every meeting to --websocket-url
+      routes = [(f"bot_{i + 1}", start_port) for i in range(count)]
+      route_args = ["--websocket-url", f"ws://localhost:{start_port}"]
+    else:
+      logger.info(f"Starting {count} bots behind a shared proxy...")
+      routes = [(f"bot_{i + 1}", start_port + i) for i in range(count)]
+      bots = [
+        self.start_limited(
+          self.start_ready(python_command(BOT_MODULE, "-p", port), name, port)
+        )
+        for name, port in routes
+      ]
+      route_args = [
+        arg
+        for name, port in routes
+        for arg in ("--route", f"{name}=ws://localhost:{port}")
+      ]
+
+    proxy, listener, *bots = await asyncio.gather(
+      self.start_ready(
+        python_command(PROXY_MODULE, "-p", proxy_port, *route_args), "proxy", proxy_port
+      ),
+      self.create_ngrok_tunnel(proxy_port, "tunnel"),
+      *bots,
+    )
+    if listener:
+      self.listeners.append(listener)
+    if not (proxy and listener):
+      logger.error("Failed to start the shared proxy")
+      return
+    if multi_session:
+      routes = routes if bots[0] else []
+    else:
+      routes = [route for route, bot in zip(routes, bots) if bot]
+
+    elapsed = time.monotonic() - started
+    for bot_name, _ in routes:
+      await self.start_meeting(
+        bot_name.replace("bot", "meeting", 1),
+        meeting_url,
+        f"{listener.url()}/{bot_name}",
+      )
+
+    log = logger.success if len(routes) == count else logger.warning
+    log(f"{len(routes)} of {count} bots ready behind a shared proxy in {elapsed:.2f}s")
+    logger.info("Press Ctrl+C to stop all processes and close tunnels")
+
   def main(self) -> None:
     """Main entry point with proper signal handling"""
     try:
@@ -284,6 +1015,7 @@ class BotProxyManager:
 
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+        use_pidfd_child_watcher(loop)
 
         def signal_handler():
           self.shutdown_event.set()
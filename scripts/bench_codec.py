@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of the proxy's fast audio encoder against frames_pb2.
+
+Its equivalence with the generated protobuf code is checked by
+tests/test_codec.py. Decoding, which the proxy does with frames_pb2, is
+timed alongside for scale.
+
+  poetry run python scripts/bench_codec.py
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import protobufs.frames_pb2 as frames_pb2  # noqa: E402
+
+codec = importlib.import_module("meetingbaas-pipecat.proxy.codec")
+
+
+def _pb2_encode(audio: bytes, sample_rate: int, channels: int) -> bytes:
+  frame = frames_pb2.Frame()
+  frame.audio.audio = audio
+  frame.audio.sample_rate = sample_rate
+  frame.audio.num_channels = channels
+  return frame.SerializeToString()
+
+
+def _pb2_decode(data: bytes) -> bytes | None:
+  frame = frames_pb2.Frame()
+  frame.ParseFromString(data)
+  if frame.HasField("audio"):
+    return bytes(frame.audio.audio)
+  return None
+
+
+def bench(size: int, number: int, sample_rate: int, channels: int) -> None:
+  audio = os.urandom(size)
+  encoder = codec.AudioFrameEncoder(sample_rate, channels)
+  serialized = encoder.encode(audio)
+
+  cases = [
+    ("encode pb2", lambda: _pb2_encode(audio, sample_rate, channels)),
+    ("encode fast", lambda: encoder.encode(audio)),
+    ("decode pb2", lambda: _pb2_decode(serialized)),
+  ]
+  for name, fn in cases:
+    elapsed = min(timeit.repeat(fn, number=number, repeat=5))
+    print(f"{size:>7} B  {name:<12} {elapsed / number * 1e9:>10.0f} ns/op")
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark the proxy audio codec")
+  parser.add_argument("-n", "--number", type=int, default=20000, help="Calls per run")
+  parser.add_argument(
+    "--sizes",
+    type=int,
+    nargs="+",
+    default=[320, 640, 1920, 3840],
+    help="Payload sizes in bytes",
+  )
+  parser.add_argument("--sample-rate", type=int, default=16000)
+  parser.add_argument("--channels", type=int, default=1)
+  args = parser.parse_args()
+
+  for size in args.sizes:
+    bench(size, args.number, args.sample_rate, args.channels)
+
+
+if __name__ == "__main__":
+  main()
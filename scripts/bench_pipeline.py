@@ -0,0 +1,929 @@
+#!/usr/bin/env python3
+"""Replay scripted meetings through the bot's pipeline, entirely offline.
+
+Each session's pipeline is built by `create_task` from `bot/pipeline.py`,
+exactly as the bot builds it. The only differences are three local
+stand-ins:
+
+- STT: transcribes each user turn as its line of the script. It sends
+  interim results while the user speaks, and the final one shortly after.
+- LLM: the bot's own OpenAI service, with a client that streams scripted
+  replies and tool calls at a set time to first token and token rate.
+- TTS: the bot's own Cartesia service, with a local websocket that answers
+  Cartesia's protocol with synthetic audio and word timestamps.
+
+The tools are the bot's own too; get_weather asks a local server that
+answers after --weather-latency.
+
+The user's audio is speech-like sound the Silero VAD detects, or a recording
+given with --wav. It is sent as protobuf frames through the same session
+transport the proxy talks to. VAD, context aggregation, tool calls,
+interruptions and turn tracing are all the bot's own code.
+
+There are two passes:
+
+- The conversation pass plays the script in real time. Some turns interrupt
+  the bot while it speaks, one of them while its reply is still streaming
+  from the LLM. It reports the latency of each stage of a turn,
+  how long the meeting kept hearing the bot after being interrupted (playing
+  audio at real time from when it arrives), how long tool turns waited for
+  their calls, and CPU time and memory.
+- The throughput pass sends the same audio as fast as the pipeline takes it
+  and reports how many times faster than real time that is. The best of
+  --rounds passes is kept.
+
+-o saves the results. --baseline compares against saved results and exits
+with status 1 if CPU per frame, memory, throughput, pipeline latency or
+interruption handling got worse by more than --tolerance:
+
+  poetry run python scripts/bench_pipeline.py -o baseline.json
+  poetry run python scripts/bench_pipeline.py --baseline baseline.json --sessions 4
+"""
+
+import argparse
+import asyncio
+import base64
+import importlib
+import json
+import math
+import os
+import resource
+import sys
+import time
+import wave
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# The services read their keys when they are created; none are ever used
+for key in ("OPENAI_API_KEY", "CARTESIA_API_KEY", "DEEPGRAM_API_KEY"):
+  os.environ.setdefault(key, "replay")
+
+import numpy as np  # noqa: E402
+from aiohttp import web  # noqa: E402
+import protobufs.frames_pb2 as frames_pb2  # noqa: E402
+from loguru import logger  # noqa: E402
+from openai.types import CompletionUsage  # noqa: E402
+from openai.types.chat import ChatCompletionChunk  # noqa: E402
+from openai.types.chat.chat_completion_chunk import (  # noqa: E402
+  Choice,
+  ChoiceDelta,
+  ChoiceDeltaToolCall,
+  ChoiceDeltaToolCallFunction,
+)
+from pipecat.frames.frames import (  # noqa: E402
+  InterimTranscriptionFrame,
+  TranscriptionFrame,
+)
+from pipecat.pipeline.runner import PipelineRunner  # noqa: E402
+from pipecat.services.ai_services import STTService  # noqa: E402
+from pipecat.utils.time import time_now_iso8601  # noqa: E402
+
+protocol = importlib.import_module("meetingbaas-pipecat.protocol")
+pipeline = importlib.import_module("meetingbaas-pipecat.bot.pipeline")
+startup = importlib.import_module("meetingbaas-pipecat.bot.startup")
+timezones = importlib.import_module("meetingbaas-pipecat.bot.timezones")
+tools = importlib.import_module("meetingbaas-pipecat.bot.tools")
+tracing = importlib.import_module("meetingbaas-pipecat.bot.tracing")
+transport = importlib.import_module("meetingbaas-pipecat.bot.transport")
+tts_cache = importlib.import_module("meetingbaas-pipecat.bot.tts_cache")
+vad = importlib.import_module("meetingbaas-pipecat.bot.vad")
+
+SAMPLE_RATE = 16000
+CHUNK_SECS = 0.02
+CHUNK_SAMPLES = int(SAMPLE_RATE * CHUNK_SECS)
+SECS_PER_WORD = 0.35  # for both the user and the bot
+
+SYSTEM_PROMPT = "You are a helpful assistant in a meeting. Answer briefly."
+INTRODUCTION = "Hi everyone, I'm the meeting assistant. Ask me anything."
+FALLBACK = "Sorry, I didn't catch that. Could you say it again?"
+
+ROLLOUT = " ".join(
+  [
+    "First we turn the new onboarding flow on for the internal team, so we",
+    "catch the obvious problems before any customer sees them. After two days",
+    "we look at the error rates and the support tickets together, and if",
+    "nothing stands out we open it to five percent of new sign ups. That stage",
+    "runs for a full week, because we want to see weekday and weekend traffic",
+    "before we decide anything. Tom watches the dashboards every morning and",
+    "posts a short summary in the channel, and Sarah collects the feedback",
+    "from the people who finished the flow and from the ones who gave up",
+    "halfway. If the completion rate is at least as good as the old flow, we",
+    "go to twenty five percent, then fifty, then everyone, with two days",
+    "between each step. If anything goes wrong at any point, we switch the",
+    "flag off, which takes effect within a minute, and we meet the same day to",
+    "decide whether to fix forward or wait for the next release. Once it is at",
+    "one hundred percent for a week, we remove the old flow from the code and",
+    "close the project, and Sarah sends the announcement to the whole company",
+    "with the numbers from the rollout.",
+  ]
+)
+
+# What the user says, what the bot answers, the tools the LLM calls first,
+# and whether the user interrupts the answer to the previous turn
+SCRIPT = [
+  ("Can you hear me?", "Yes, I can hear you clearly.", (), False),
+  (
+    "What time is it in Tokyo?",
+    "It is early morning in Tokyo right now, so the team there is probably not "
+    "online yet. They usually start around nine, which is in a few hours.",
+    (("get_time", {"location": "Tokyo"}),),
+    False,
+  ),
+  (
+    "Okay, never mind that.",
+    "No problem. Let me know if there is anything else I can help with.",
+    (),
+    True,
+  ),
+  (
+    "What's the weather like in Paris and Berlin, and what time is it there?",
+    "It is sunny and eighteen degrees in both cities, and it is the middle of "
+    "the afternoon there.",
+    (
+      ("get_weather", {"location": "Paris", "format": "celsius"}),
+      ("get_weather", {"location": "Berlin", "format": "celsius"}),
+      ("get_time", {"location": "Paris"}),
+    ),
+    False,
+  ),
+  (
+    "Give me a summary of the plan we discussed.",
+    "We agreed to ship the new onboarding flow next week, then measure how many "
+    "users finish it. Sarah will write the announcement and Tom will watch the "
+    "error rates during the rollout. We meet again on Friday to review.",
+    (),
+    False,
+  ),
+  ("Stop, that's enough.", "Sure, I'll stop there.", (), True),
+  # Long enough to still be streaming from the LLM when it is interrupted
+  ("Walk me through the whole rollout, step by step.", ROLLOUT, (), False),
+  ("Hold on, let me stop you there.", "Sure, go ahead.", (), True),
+  ("Thanks, that's all for today.", "You're welcome. Have a good day.", (), False),
+]
+
+VOWELS = [
+  (730, 1090, 2440),
+  (270, 2290, 3010),
+  (300, 870, 2240),
+  (530, 1840, 2480),
+  (570, 840, 2410),
+  (440, 1020, 2240),
+]
+
+
+def synthetic_speech(seconds: float, seed: int) -> np.ndarray:
+  """Voiced syllables with vowel formants and some frication, as float samples"""
+  rng = np.random.default_rng(seed)
+  f0 = 110
+  parts = []
+  total = int(seconds * SAMPLE_RATE)
+  length = 0
+  while length < total:
+    n = int(rng.uniform(0.12, 0.3) * SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    pitch = f0 * (
+      1 + 0.1 * np.sin(2 * np.pi * rng.uniform(1, 3) * t + rng.uniform(0, 6))
+    )
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    formants = VOWELS[rng.integers(len(VOWELS))]
+    syllable = np.zeros(n)
+    for k in range(1, 4000 // f0):
+      amplitude = sum(
+        np.exp(-(((k * pitch - f) / (200 + f * 0.05)) ** 2)) / (i + 1)
+        for i, f in enumerate(formants)
+      )
+      syllable += amplitude * np.sin(k * phase) / k
+    parts.append(syllable * np.clip(np.sin(np.pi * t / t[-1]), 0, 1) ** 0.6)
+    length += n
+    if rng.random() < 0.3:
+      n = int(rng.uniform(0.03, 0.07) * SAMPLE_RATE)
+      parts.append(0.15 * rng.normal(size=n) * np.hanning(n))
+      length += n
+  samples = np.concatenate(parts)[:total]
+  return samples / np.max(np.abs(samples)) * 0.5
+
+
+def read_wav(path: str) -> np.ndarray:
+  with wave.open(path) as f:
+    if (f.getframerate(), f.getnchannels(), f.getsampwidth()) != (SAMPLE_RATE, 1, 2):
+      raise SystemExit(f"{path} must be 16 kHz mono 16-bit PCM")
+    return np.frombuffer(f.readframes(f.getnframes()), dtype="<i2") / 32768
+
+
+def speech_seconds(text: str) -> float:
+  return max(1.0, len(text.split()) * SECS_PER_WORD)
+
+
+def reply_seconds(text: str) -> float:
+  return len(text.split()) * SECS_PER_WORD
+
+
+class Timeline:
+  """The user's side of a meeting, as 20 ms protobuf frames and turn events"""
+
+  def __init__(
+    self, repeat: int, wav: str | None, llm_ttft: float, tool_seconds: float
+  ):
+    recording = read_wav(wav) if wav else None
+    offset = 0
+    self.frames: list[bytes] = []
+    self.events: dict[int, tuple] = {}  # frame index -> (event, turn)
+    self.turns = []
+
+    def add(samples: np.ndarray):
+      pcm = (np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes()
+      for i in range(0, len(pcm) - CHUNK_SAMPLES * 2 + 1, CHUNK_SAMPLES * 2):
+        # Built like the proxy builds them
+        frame = frames_pb2.Frame()
+        frame.audio.audio = pcm[i : i + CHUNK_SAMPLES * 2]
+        frame.audio.sample_rate = SAMPLE_RATE
+        frame.audio.num_channels = 1
+        self.frames.append(frame.SerializeToString())
+
+    def silence(seconds: float):
+      add(np.zeros(int(seconds * SAMPLE_RATE)))
+
+    # The bot introduces itself first
+    silence(1.0 + llm_ttft + reply_seconds(INTRODUCTION) + 1.0)
+    script = SCRIPT * repeat
+    for n, (text, reply, calls, interrupts) in enumerate(script):
+      seconds = speech_seconds(text)
+      if recording is not None:
+        samples = np.take(
+          recording, range(offset, offset + int(seconds * SAMPLE_RATE)), mode="wrap"
+        )
+        offset += len(samples)
+      else:
+        samples = synthetic_speech(seconds, seed=n)
+      self.events[len(self.frames)] = ("start", n)
+      add(samples)
+      self.events[len(self.frames)] = ("end", n)
+      self.turns.append(SimpleNamespace(text=text, calls=calls, interrupts=interrupts))
+
+      # VAD's stop delay, the stand-ins' latency and the answer; interrupting
+      # turns start a few seconds into it, mid-sentence
+      answer = 0.8 + 0.3 + llm_ttft + (llm_ttft + tool_seconds if calls else 0) + 0.2
+      interrupted = n + 1 < len(script) and script[n + 1][3]
+      silence(answer + 3.0 if interrupted else answer + reply_seconds(reply) + 1.5)
+
+  @property
+  def seconds(self) -> float:
+    return len(self.frames) * CHUNK_SECS
+
+
+class ScriptedSTTService(STTService):
+  """Transcribes whatever the replayed audio says, as the timeline tells it"""
+
+  def __init__(self, interim_secs: float = 0.4, final_delay: float = 0.3, **kwargs):
+    super().__init__(**kwargs)
+    self.interim_secs = interim_secs
+    self.final_delay = final_delay
+    self._text: str | None = None
+    self._started = 0.0
+    self._seconds = 1.0
+    self._task: asyncio.Task | None = None
+
+  async def set_model(self, model: str):
+    self.set_model_name(model)
+
+  async def set_language(self, language):
+    pass
+
+  async def run_stt(self, audio: bytes):
+    yield None
+
+  def speech_started(self, text: str, seconds: float):
+    self._text = text
+    self._started = time.perf_counter()
+    self._seconds = seconds
+    self._replace(self._interims())
+
+  def speech_ended(self):
+    self._replace(self._final())
+
+  def _replace(self, coroutine):
+    if self._task:
+      self._task.cancel()
+    self._task = self.get_event_loop().create_task(coroutine)
+
+  async def _interims(self):
+    words = self._text.split()
+    while True:
+      await asyncio.sleep(self.interim_secs)
+      heard = (time.perf_counter() - self._started) / self._seconds
+      partial = " ".join(words[: max(1, math.ceil(len(words) * min(1, heard)))])
+      await self.push_frame(InterimTranscriptionFrame(partial, "", time_now_iso8601()))
+
+  async def _final(self):
+    await asyncio.sleep(self.final_delay)
+    text, self._text = self._text, None
+    if text:
+      await self.push_frame(TranscriptionFrame(text, "", time_now_iso8601()))
+
+
+class ScriptedOpenAIClient:
+  """Stands in for `AsyncOpenAI`, streaming the script's replies"""
+
+  def __init__(self, ttft: float, tokens_per_second: float):
+    self.ttft = ttft
+    self.token_secs = 1 / tokens_per_second
+    self.replies = {self._key(text): (reply, calls) for text, reply, calls, _ in SCRIPT}
+    self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+    self.completions = 0
+    # From the end of each tool call response to the completion with results
+    self.tool_waits: list[float] = []
+    self._tools_called: float | None = None
+    # Streams closed before their last chunk, as on an interruption
+    self.closed_early = 0
+
+  @staticmethod
+  def _key(text: str) -> str:
+    return " ".join(text.lower().split())
+
+  async def _create(self, **params):
+    self.completions += 1
+    messages = params["messages"]
+    if not params.get("stream"):
+      # The context compactor's summary
+      message = SimpleNamespace(content="The user asked a few questions.")
+      return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    last = messages[-1]
+    user = next((m for m in reversed(messages) if m["role"] == "user"), None)
+    if last["role"] == "user":
+      reply, calls = self.replies.get(self._key(last["content"]), (FALLBACK, ()))
+      if calls:
+        return ScriptedStream(self, self._tool_calls(calls))
+    elif last["role"] == "tool":
+      if self._tools_called is not None:
+        self.tool_waits.append(time.perf_counter() - self._tools_called)
+        self._tools_called = None
+      reply, _ = self.replies.get(self._key(user["content"]), (FALLBACK, ()))
+    else:
+      reply = INTRODUCTION
+    return ScriptedStream(self, self._stream(reply))
+
+  def _chunk(self, delta: ChoiceDelta | None, finish: str | None = None, usage=None):
+    return ChatCompletionChunk(
+      id="replay",
+      object="chat.completion.chunk",
+      created=0,
+      model="replay",
+      choices=[Choice(index=0, delta=delta, finish_reason=finish)] if delta else [],
+      usage=usage,
+    )
+
+  async def _stream(self, reply: str):
+    await asyncio.sleep(self.ttft)
+    tokens = reply.split(" ")
+    for i, token in enumerate(tokens):
+      yield self._chunk(ChoiceDelta(content=token if i == 0 else f" {token}"))
+      await asyncio.sleep(self.token_secs)
+    yield self._chunk(ChoiceDelta(), "stop")
+    yield self._chunk(
+      None,
+      usage=CompletionUsage(
+        prompt_tokens=0, completion_tokens=len(tokens), total_tokens=len(tokens)
+      ),
+    )
+
+  async def _tool_calls(self, calls):
+    await asyncio.sleep(self.ttft)
+    for i, (name, arguments) in enumerate(calls):
+      call = ChoiceDeltaToolCall(
+        index=i,
+        id=f"call_replay_{i}",
+        type="function",
+        function=ChoiceDeltaToolCallFunction(
+          name=name, arguments=json.dumps(arguments)
+        ),
+      )
+      yield self._chunk(ChoiceDelta(tool_calls=[call]))
+    yield self._chunk(ChoiceDelta(), "tool_calls")
+    self._tools_called = time.perf_counter()
+
+
+class ScriptedStream:
+  """Iterates over chunks and can be closed early, like openai's AsyncStream"""
+
+  def __init__(self, client: ScriptedOpenAIClient, chunks):
+    self._client = client
+    self._chunks = chunks
+    self._finished = False
+
+  async def __aiter__(self):
+    async for chunk in self._chunks:
+      yield chunk
+    self._finished = True
+
+  async def close(self):
+    if not self._finished:
+      self._client.closed_early += 1
+    await self._chunks.aclose()
+
+
+class LocalCartesiaSocket:
+  """Answers Cartesia's websocket protocol with a tone and word timestamps"""
+
+  remote_address = ("replay", 0)
+
+  def __init__(
+    self, ttfb: float, speed: float, sample_rate: int, said: list[str], cancelled
+  ):
+    self.ttfb = ttfb
+    self.speed = speed
+    self.sample_rate = sample_rate
+    self.said = said
+    self.cancelled = cancelled
+    self.open = True
+    self._messages: asyncio.Queue = asyncio.Queue()
+    self._contexts: dict[str, asyncio.Queue] = {}
+    self._speaking: dict[str, asyncio.Task] = {}
+    t = np.arange(int(sample_rate * SECS_PER_WORD)) / sample_rate
+    self._word_audio = (np.sin(2 * np.pi * 180 * t) * 3000).astype("<i2").tobytes()
+
+  async def send(self, message: str):
+    message = json.loads(message)
+    if message.get("cancel"):
+      self._contexts.pop(message["context_id"], None)
+      task = self._speaking.pop(message["context_id"], None)
+      if task and not task.done():
+        task.cancel()
+        self.cancelled.append(message["context_id"])
+      return
+    if message["transcript"].strip():
+      self.said.append(message["transcript"].strip())
+    context_id = message["context_id"]
+    if context_id not in self._contexts:
+      self._contexts[context_id] = asyncio.Queue()
+      self._speaking[context_id] = asyncio.create_task(self._speak(context_id))
+    self._contexts[context_id].put_nowait(message)
+
+  async def _speak(self, context_id: str):
+    pieces = self._contexts[context_id]
+    await asyncio.sleep(self.ttfb)
+    offset = 0.0
+    while True:
+      message = await pieces.get()
+      words = message["transcript"].split()
+      if words:
+        starts = [offset + i * SECS_PER_WORD for i in range(len(words))]
+        self._reply(
+          "timestamps",
+          context_id,
+          word_timestamps={
+            "words": words,
+            "start": starts,
+            "end": starts[1:] + [offset + len(words) * SECS_PER_WORD],
+          },
+        )
+        for _ in words:
+          self._reply(
+            "chunk", context_id, data=base64.b64encode(self._word_audio).decode()
+          )
+          await asyncio.sleep(SECS_PER_WORD / self.speed)
+        offset += len(words) * SECS_PER_WORD
+      if not message["continue"]:
+        self._reply("done", context_id)
+        del self._contexts[context_id]
+        del self._speaking[context_id]
+        return
+
+  def _reply(self, type: str, context_id: str, **fields):
+    self._messages.put_nowait(
+      json.dumps({"type": type, "context_id": context_id, **fields})
+    )
+
+  def __aiter__(self):
+    return self
+
+  async def __anext__(self):
+    message = await self._messages.get()
+    if message is None:
+      raise StopAsyncIteration
+    return message
+
+  async def close(self):
+    self.open = False
+    for task in self._speaking.values():
+      task.cancel()
+    self._messages.put_nowait(None)
+
+
+class LocalCartesia:
+  """Hands the TTS service a local socket where it would take a preconnected one"""
+
+  def __init__(self, ttfb: float, speed: float):
+    self.ttfb = ttfb
+    self.speed = speed
+    self.said: list[str] = []
+    self.cancelled: list[str] = []
+
+  def take(self, url: str) -> LocalCartesiaSocket:
+    return LocalCartesiaSocket(
+      self.ttfb, self.speed, SAMPLE_RATE, self.said, self.cancelled
+    )
+
+
+async def serve_weather(latency: float) -> web.AppRunner:
+  """A local stand-in for wttr.in that answers after `latency` seconds"""
+
+  async def weather(request: web.Request) -> web.Response:
+    await asyncio.sleep(latency)
+    return web.Response(text="+18°C Sunny")
+
+  app = web.Application()
+  app.router.add_get("/{location}", weather)
+  runner = web.AppRunner(app)
+  await runner.setup()
+  site = web.TCPSite(runner, "127.0.0.1", 0)
+  await site.start()
+  port = site._server.sockets[0].getsockname()[1]
+  os.environ["WEATHER_API_URL"] = f"http://127.0.0.1:{port}"
+  return runner
+
+
+class CountingVADAnalyzer(vad.SharedSileroVADAnalyzer):
+  """Counts the frames the input transport has analyzed.
+
+  Frames further down are not a reliable count, because pipecat drops the
+  ones still queued when the user interrupts the bot.
+  """
+
+  def __init__(self, **kwargs):
+    super().__init__(**kwargs)
+    self.frames = 0
+
+  def analyze_audio(self, buffer: bytes):
+    self.frames += 1
+    return super().analyze_audio(buffer)
+
+
+class ReplayClient:
+  """The meeting's end of a session's websocket"""
+
+  remote_address = ("replay", 0)
+
+  def __init__(self):
+    self._incoming: asyncio.Queue = asyncio.Queue()
+    # (time, seconds) of every audio frame the bot sent
+    self.sent: list[tuple[float, float]] = []
+    self.interruptions: list[float] = []
+
+  def feed(self, message: bytes | None):
+    self._incoming.put_nowait(message)
+
+  def __aiter__(self):
+    return self
+
+  async def __anext__(self):
+    message = await self._incoming.get()
+    if message is None:
+      raise StopAsyncIteration
+    return message
+
+  async def send(self, message: bytes):
+    now = time.perf_counter()
+    frame = frames_pb2.Frame.FromString(message)
+    if frame.WhichOneof("frame") == "audio":
+      self.sent.append((now, len(frame.audio.audio) / 2 / frame.audio.sample_rate))
+    elif protocol.is_interruption(frame):
+      self.interruptions.append(now)
+
+  async def close(self):
+    self.feed(None)
+
+
+def rss_mb() -> float:
+  with open("/proc/self/statm") as f:
+    return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def quantiles(values: list[float]) -> dict[str, float]:
+  values = sorted(values)
+  if not values:
+    return {}
+  return {
+    f"p{q}": values[min(len(values) - 1, int(len(values) * q / 100))] for q in (50, 95)
+  }
+
+
+def interruption_delays(
+  timeline: Timeline, starts: dict[int, float], sent: list[tuple[float, float]]
+):
+  """How long the meeting kept hearing the bot after each interrupting turn began.
+
+  The meeting plays each frame at real time from when it arrives, or when the
+  frame before it finishes, like a meeting's jitter buffer.
+  """
+  playing = []
+  end = 0.0
+  for t, seconds in sent:
+    start = max(t, end)
+    end = start + seconds
+    playing.append((start, end))
+
+  delays = []
+  for n, turn in enumerate(timeline.turns):
+    began = starts.get(n)
+    if not turn.interrupts or began is None:
+      continue
+    # Only turns that actually talked over the bot count
+    i = next((i for i, (s, e) in enumerate(playing) if s <= began < e), None)
+    if i is None:
+      continue
+    last = playing[i][1]
+    for start, end in playing[i + 1 :]:
+      if start - last > 0.15:
+        break
+      last = end
+    delays.append(last - began)
+  return delays
+
+
+async def run_session(args, timeline: Timeline, cache, stats, paced: bool) -> dict:
+  client = ReplayClient()
+  stt = ScriptedSTTService()
+  analyzer = CountingVADAnalyzer()
+  session = transport.WebsocketSessionTransport(
+    client,
+    pipeline.create_transport_params(analyzer),
+    output_lead=args.output_lead_ms / 1000,
+  )
+  llm_client = ScriptedOpenAIClient(args.llm_ttft, args.llm_tokens_per_second)
+  cartesia = LocalCartesia(args.tts_ttfb, args.tts_speed)
+  task = pipeline.create_task(
+    session,
+    SYSTEM_PROMPT,
+    "replay",
+    cache,
+    speculative=args.speculative_llm,
+    context_budget=args.context_budget,
+    trace_stats=stats,
+    preconnector=cartesia,
+    stt=stt,
+    llm_client=llm_client,
+    tool_deadline=args.tool_deadline,
+    tool_filler=args.tool_filler or None,
+    tool_filler_after=args.tool_filler_after,
+  )
+  runner = PipelineRunner(handle_sigint=False)
+  running = asyncio.create_task(runner.run(task))
+
+  starts = {}
+  began = time.perf_counter()
+  for i, frame in enumerate(timeline.frames):
+    if paced:
+      delay = began + i * CHUNK_SECS - time.perf_counter()
+      if delay > 0:
+        await asyncio.sleep(delay)
+    else:
+      await asyncio.sleep(0)
+    event = timeline.events.get(i) if paced else None
+    if event:
+      kind, n = event
+      if kind == "start":
+        starts[n] = time.perf_counter()
+        stt.speech_started(
+          timeline.turns[n].text, speech_seconds(timeline.turns[n].text)
+        )
+      else:
+        stt.speech_ended()
+    client.feed(frame)
+
+  # Wait for the pipeline to take in every frame
+  while analyzer.frames < len(timeline.frames) and not running.done():
+    await asyncio.sleep(0.01)
+  elapsed = time.perf_counter() - began
+  await task.cancel()
+  await running
+  return {
+    "elapsed": elapsed,
+    "frames": analyzer.frames,
+    "completions": llm_client.completions,
+    "interruptions": interruption_delays(timeline, starts, client.sent),
+    "flush_signals": len(client.interruptions),
+    "llm_streams_closed": llm_client.closed_early,
+    "tts_cancelled": len(cartesia.cancelled),
+    "tool_waits": llm_client.tool_waits,
+    "fillers": cartesia.said.count(args.tool_filler) if args.tool_filler else 0,
+  }
+
+
+async def run_pass(args, timeline: Timeline, paced: bool) -> dict:
+  cache = tts_cache.TTSCache()
+  stats = tracing.TraceStats(log_every=10**9)
+  rss_before = rss_mb()
+  peak = rss_before
+  cpu_before = time.process_time()
+  sessions = asyncio.gather(
+    *(run_session(args, timeline, cache, stats, paced) for _ in range(args.sessions))
+  )
+  while not sessions.done():
+    peak = max(peak, rss_mb())
+    await asyncio.wait({sessions}, timeout=0.2)
+  results = sessions.result()
+  cpu = time.process_time() - cpu_before
+
+  frames = sum(r["frames"] for r in results)
+  elapsed = max(r["elapsed"] for r in results)
+  result = {
+    "sessions": args.sessions,
+    "audio_seconds": timeline.seconds * args.sessions,
+    "wall_seconds": elapsed,
+    "realtime_factor": timeline.seconds * args.sessions / elapsed,
+    "cpu_us_per_frame": cpu / frames * 1e6 if frames else 0.0,
+    "cpu_percent": cpu / elapsed * 100,
+    "peak_rss_mb": peak,
+    "mb_per_session": (peak - rss_before) / args.sessions,
+  }
+  if paced:
+    delays = [d for r in results for d in r["interruptions"]]
+    interrupting = sum(t.interrupts for t in timeline.turns) * args.sessions
+    result.update(
+      {
+        "turns": stats.turns,
+        "expected_turns": len(timeline.turns) * args.sessions,
+        "completions": sum(r["completions"] for r in results),
+        "stages": {
+          stage: quantiles(list(stats.recent[stage])) for stage, *_ in tracing.STAGES
+        },
+        "tools": {
+          "turns": sum(bool(t.calls) for t in timeline.turns) * args.sessions,
+          "answered": sum(len(r["tool_waits"]) for r in results),
+          "fillers": sum(r["fillers"] for r in results),
+          **quantiles([w for r in results for w in r["tool_waits"]]),
+        },
+        "interruptions": {
+          "interrupting_turns": interrupting,
+          "talked_over_bot": len(delays),
+          "stopped_within_1s": sum(d <= 1.0 for d in delays),
+          "flush_signals": sum(r["flush_signals"] for r in results),
+          "llm_streams_closed": sum(r["llm_streams_closed"] for r in results),
+          "tts_cancelled": sum(r["tts_cancelled"] for r in results),
+          **quantiles(delays),
+        },
+      }
+    )
+  return result
+
+
+# Compared with --baseline: (path in the results, whether higher is better)
+REGRESSION_METRICS = [
+  ("conversation.cpu_us_per_frame", False),
+  ("conversation.mb_per_session", False),
+  ("conversation.stages.aggregation.p50", False),
+  ("conversation.stages.output.p50", False),
+  ("conversation.interruptions.p50", False),
+  ("conversation.tools.p50", False),
+  ("throughput.cpu_us_per_frame", False),
+  ("throughput.realtime_factor", True),
+]
+
+
+def lookup(results: dict, path: str):
+  for key in path.split("."):
+    if not isinstance(results, dict) or key not in results:
+      return None
+    results = results[key]
+  return results
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+  found = []
+  for path, higher_is_better in REGRESSION_METRICS:
+    now, before = lookup(results, path), lookup(baseline, path)
+    if now is None or before is None or before == 0:
+      continue
+    change = now / before - 1
+    # Tiny latencies swing by large fractions; ignore changes under 5 ms
+    if path.endswith(".p50") and abs(now - before) < 0.005:
+      continue
+    if (change < -tolerance) if higher_is_better else (change > tolerance):
+      found.append(f"{path}: {before:.4g} -> {now:.4g} ({change:+.0%})")
+  conversation = results["conversation"]
+  if conversation["turns"] < conversation["expected_turns"]:
+    found.append(
+      f"only {conversation['turns']} of {conversation['expected_turns']} turns were answered"
+    )
+  return found
+
+
+def report(results: dict):
+  conversation = results["conversation"]
+  throughput = results["throughput"]
+  print(
+    f"conversation: {conversation['audio_seconds']:.0f}s of audio in "
+    f"{conversation['sessions']} sessions, {conversation['turns']}/"
+    f"{conversation['expected_turns']} turns answered, "
+    f"{conversation['completions']} completions"
+  )
+  for stage, q in conversation["stages"].items():
+    if q:
+      print(
+        f"  {stage:<12} p50 {q['p50'] * 1000:7.1f} ms  p95 {q['p95'] * 1000:7.1f} ms"
+      )
+  tools = conversation["tools"]
+  print(
+    f"  tool turns: {tools['answered']} of {tools['turns']} got their results, "
+    f"{tools['fillers']} fillers said"
+    + (
+      f", waited p50 {tools['p50'] * 1000:.0f} ms p95 {tools['p95'] * 1000:.0f} ms"
+      if "p50" in tools
+      else ""
+    )
+  )
+  interruptions = conversation["interruptions"]
+  print(
+    f"  interruptions: {interruptions['talked_over_bot']} of "
+    f"{interruptions['interrupting_turns']} turns talked over the bot, "
+    f"{interruptions['stopped_within_1s']} stopped within 1 s"
+    + (
+      f", the meeting kept hearing it p50 {interruptions['p50'] * 1000:.0f} ms "
+      f"p95 {interruptions['p95'] * 1000:.0f} ms"
+      if "p50" in interruptions
+      else ""
+    )
+  )
+  print(
+    f"    {interruptions['flush_signals']} flush signals, "
+    f"{interruptions['llm_streams_closed']} LLM streams closed early, "
+    f"{interruptions['tts_cancelled']} TTS contexts cancelled"
+  )
+  for name, result in (("conversation", conversation), ("throughput", throughput)):
+    print(
+      f"{name}: {result['cpu_us_per_frame']:.0f} us CPU per 20 ms frame, "
+      f"{result['cpu_percent']:.0f}% CPU, {result['realtime_factor']:.1f}x real time, "
+      f"{result['mb_per_session']:.1f} MB per session (peak RSS {result['peak_rss_mb']:.0f} MB)"
+    )
+
+
+async def main(args):
+  logger.remove()
+  logger.add(sys.stderr, level="DEBUG" if args.verbose else "WARNING")
+
+  startup.warm_vad()
+  timezones.timezone_index()
+  weather = await serve_weather(args.weather_latency)
+  timeline = Timeline(args.repeat, args.wav, args.llm_ttft, args.weather_latency)
+
+  results = {
+    "conversation": await run_pass(args, timeline, paced=True),
+    # The best of a few, since one short run is at the mercy of the machine
+    "throughput": min(
+      [await run_pass(args, timeline, paced=False) for _ in range(args.rounds)],
+      key=lambda result: result["cpu_us_per_frame"],
+    ),
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+  }
+  await tools.runtime.close()
+  await weather.cleanup()
+  report(results)
+
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(results, f, indent=2)
+  if args.baseline:
+    with open(args.baseline) as f:
+      found = regressions(results, json.load(f), args.tolerance)
+    for line in found:
+      print(f"REGRESSION {line}")
+    if found:
+      sys.exit(1)
+    print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Replay scripted meetings offline")
+  parser.add_argument("--sessions", type=int, default=1)
+  parser.add_argument("--repeat", type=int, default=1, help="Times to play the script")
+  parser.add_argument(
+    "--wav", help="16 kHz mono recording of speech for the user turns"
+  )
+  parser.add_argument("--llm-ttft", type=float, default=0.3)
+  parser.add_argument("--llm-tokens-per-second", type=float, default=50)
+  parser.add_argument("--tts-ttfb", type=float, default=0.15)
+  parser.add_argument(
+    "--tts-speed", type=float, default=4, help="Times faster than real time"
+  )
+  parser.add_argument(
+    "--weather-latency",
+    type=float,
+    default=0.9,
+    help="Seconds the local weather server takes to answer",
+  )
+  parser.add_argument("--output-lead-ms", type=int, default=0)
+  parser.add_argument("--tool-deadline", type=float, default=4.0)
+  parser.add_argument("--tool-filler", default="Give me a moment to check that.")
+  parser.add_argument("--tool-filler-after", type=float, default=0.7)
+  parser.add_argument("--speculative-llm", action="store_true")
+  parser.add_argument("--context-budget", type=int, default=8000)
+  parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+  parser.add_argument("--baseline", help="Results to compare against")
+  parser.add_argument("--rounds", type=int, default=3, help="Throughput passes")
+  parser.add_argument("--tolerance", type=float, default=0.25)
+  parser.add_argument("-v", "--verbose", action="store_true")
+  asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Benchmark the location-to-timezone index behind the bot's get_time.
+
+Times the index build, then uncached lookups for each kind of query (exact
+zone names, aliases, "City, Country" strings, prefixes and typos), and
+prints what a sample of them resolved to.
+
+  poetry run python scripts/bench_timezones.py --rounds 2000
+"""
+
+import argparse
+import importlib
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+timezones = importlib.import_module("meetingbaas-pipecat.bot.timezones")
+
+QUERIES = {
+  "exact": ["Asia/Kolkata", "America/New_York", "Europe/London", "UTC"],
+  "alias": ["Mumbai", "new york", "PST", "São Paulo", "Germany", "NYC"],
+  "split": ["Tokyo, Japan", "Paris, France", "Austin Texas", "San Francisco, CA"],
+  "prefix": ["Los Ang", "Salt Lake", "Johannesb", "Buenos"],
+  "fuzzy": ["Londn", "Kolkatta", "Singapur", "Amsterdm"],
+  "miss": ["Narnia", "xyzzy", "the moon", "qwerty"],
+}
+
+
+def main(args):
+  started = time.perf_counter()
+  index = timezones.build_index()
+  build_ms = (time.perf_counter() - started) * 1000
+  print(f"built {len(index.zones)} keys in {build_ms:.1f} ms\n")
+
+  print(f"{'kind':<8} {'mean us':>9} {'p99 us':>9} {'max us':>9}")
+  worst = 0.0
+  for kind, queries in QUERIES.items():
+    samples = []
+    for _ in range(args.rounds):
+      for query in queries:
+        started = time.perf_counter()
+        index.resolve(query)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99)]
+    worst = max(worst, p99)
+    print(f"{kind:<8} {statistics.mean(samples):9.1f} {p99:9.1f} {samples[-1]:9.1f}")
+
+  print()
+  for queries in QUERIES.values():
+    for query in queries:
+      print(f"  {query!r:<22} -> {index.resolve(query)}")
+
+  print(f"\nworst p99: {worst / 1000:.3f} ms")
+  if worst >= 1000:
+    sys.exit("lookups are not sub-millisecond")
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark the timezone index")
+  parser.add_argument("--rounds", type=int, default=1000)
+  main(parser.parse_args())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Time the bot's tool runtime against a local stand-in for wttr.in.
+
+Prints the latency of a cold call, a coalesced burst of identical calls, a
+cache hit and a call to a slow upstream. The caching and coalescing behind
+them are checked by tests/test_tools.py.
+
+  poetry run python scripts/bench_tools.py --calls 100 --delay-ms 300
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from aiohttp import web
+from loguru import logger
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+tools = importlib.import_module("meetingbaas-pipecat.bot.tools")
+
+
+async def start_stand_in(port: int, delay: float, requests: list) -> web.AppRunner:
+  async def weather(request: web.Request) -> web.Response:
+    requests.append(request.path)
+    if request.match_info["location"] == "slow":
+      await asyncio.sleep(tools.runtime.tools["get_weather"].timeout * 2)
+    await asyncio.sleep(delay)
+    return web.Response(text="+21°C Sunny")
+
+  app = web.Application()
+  app.router.add_get("/{location}", weather)
+  runner = web.AppRunner(app, shutdown_timeout=0.1)
+  await runner.setup()
+  await web.TCPSite(runner, "127.0.0.1", port).start()
+  return runner
+
+
+async def timed(coro) -> tuple[float, str]:
+  started = time.perf_counter()
+  result = await coro
+  return (time.perf_counter() - started) * 1000, result
+
+
+async def main(args):
+  logger.remove()
+  logger.add(sys.stderr, level="INFO")
+  requests: list[str] = []
+  stand_in = await start_stand_in(args.port, args.delay_ms / 1000, requests)
+  os.environ["WEATHER_API_URL"] = f"http://127.0.0.1:{args.port}"
+  runtime = tools.runtime
+
+  try:
+    cold, result = await timed(
+      runtime.call("get_weather", {"location": "Paris", "format": "celsius"})
+    )
+    print(f"cold call:       {cold:8.2f} ms  {result!r}")
+
+    burst = await asyncio.gather(
+      *(
+        timed(runtime.call("get_weather", {"location": "Berlin", "format": "celsius"}))
+        for _ in range(args.calls)
+      )
+    )
+    latencies = [ms for ms, _ in burst]
+    print(
+      f"{args.calls} concurrent:  {statistics.median(latencies):8.2f} ms median, "
+      f"{max(latencies):.2f} ms max"
+    )
+
+    hits = [
+      (
+        await timed(
+          runtime.call("get_weather", {"location": " berlin ", "format": "Celsius"})
+        )
+      )[0]
+      for _ in range(args.calls)
+    ]
+    print(f"cache hit:       {statistics.median(hits):8.3f} ms median")
+
+    slow, result = await timed(
+      runtime.call("get_weather", {"location": "slow", "format": "celsius"})
+    )
+    print(f"timeout:         {slow:8.2f} ms  {result!r}")
+
+    print(f"upstream requests: {len(requests)}, runtime stats: {runtime.stats()}")
+  finally:
+    await runtime.close()
+    await stand_in.cleanup()
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark the bot tool runtime")
+  parser.add_argument("--calls", type=int, default=100)
+  parser.add_argument("--delay-ms", type=float, default=300)
+  parser.add_argument("--port", type=int, default=8799)
+  asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Measure what turn tracing costs the bot's pipeline.
+
+Runs the same stream of audio and text frames through a pipeline of plain
+pass-through stages, first as is and then with each stage watched by a
+`TurnTracer` like in `bot.py`, and compares the best time per frame of
+each. It then plays a few simulated turns through a tracer and prints the
+records they produce.
+
+  poetry run python scripts/bench_tracing.py --frames 20000
+"""
+
+import argparse
+import asyncio
+import importlib
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from loguru import logger  # noqa: E402
+from pipecat.clocks.system_clock import SystemClock  # noqa: E402
+from pipecat.frames.frames import (  # noqa: E402
+  BotStartedSpeakingFrame,
+  EndFrame,
+  InputAudioRawFrame,
+  StartFrame,
+  TextFrame,
+  TranscriptionFrame,
+  TTSAudioRawFrame,
+  UserStoppedSpeakingFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline  # noqa: E402
+from pipecat.processors.frame_processor import FrameProcessor  # noqa: E402
+
+tracing = importlib.import_module("meetingbaas-pipecat.bot.tracing")
+
+MARKS = (
+  ("vad_stop", UserStoppedSpeakingFrame),
+  ("transcript", TranscriptionFrame),
+  ("llm_request", TextFrame),
+  ("llm_first_text", TextFrame),
+  ("tts_first_audio", TTSAudioRawFrame),
+  ("bot_started", BotStartedSpeakingFrame),
+)
+
+
+class Stage(FrameProcessor):
+  async def process_frame(self, frame, direction):
+    await super().process_frame(frame, direction)
+    await self.push_frame(frame, direction)
+
+
+class Done(FrameProcessor):
+  """Sets `ended` once the EndFrame reaches the end of the pipeline"""
+
+  def __init__(self, ended: asyncio.Event):
+    super().__init__()
+    self._ended = ended
+
+  async def process_frame(self, frame, direction):
+    await super().process_frame(frame, direction)
+    if isinstance(frame, EndFrame):
+      self._ended.set()
+
+
+def frames(count: int) -> list:
+  audio = b"\x00" * 640  # 20 ms at 16 kHz
+  out = []
+  for i in range(count):
+    if i % 50 == 0:
+      out.append(UserStoppedSpeakingFrame())
+      out.append(TranscriptionFrame("hello there", "", ""))
+      out.append(TextFrame("Hi."))
+      out.append(BotStartedSpeakingFrame())
+    out.append(InputAudioRawFrame(audio=audio, sample_rate=16000, num_channels=1))
+  return out
+
+
+async def run(count: int, traced: bool) -> float:
+  processors = []
+  tracer = tracing.TurnTracer(tracing.TraceStats(log_every=10**9), 0.8)
+  for mark, frame_type in MARKS:
+    stage = Stage()
+    processors.append(tracer.watch(stage, mark, frame_type) if traced else stage)
+  ended = asyncio.Event()
+  processors.append(Done(ended))
+  pipeline = Pipeline(processors)
+  started = time.perf_counter()
+  await pipeline.queue_frame(StartFrame(clock=SystemClock()))
+  for frame in frames(count) + [EndFrame()]:
+    await pipeline.queue_frame(frame)
+  await ended.wait()
+  elapsed = time.perf_counter() - started
+  await pipeline.cleanup()
+  # Pipeline.cleanup() only cleans up the stages; the pipeline's own frame
+  # tasks would otherwise be left pending
+  await FrameProcessor.cleanup(pipeline)
+  return elapsed
+
+
+async def main(args):
+  logger.remove()
+  logger.add(sys.stderr, level="WARNING")
+
+  # Timings on a busy machine swing by more than the cost being measured,
+  # so compare the best round of each
+  plain, traced = [], []
+  for _ in range(args.rounds):
+    plain.append(await run(args.frames, traced=False) / args.frames * 1e6)
+    traced.append(await run(args.frames, traced=True) / args.frames * 1e6)
+    print(f"{plain[-1]:.1f} us/frame plain, {traced[-1]:.1f} us/frame watched")
+  best, best_traced = min(plain), min(traced)
+  print(
+    f"best of {args.rounds}, {args.frames} frames through 6 stages: "
+    f"{best:.1f} us/frame, watched {best_traced:.1f} us/frame "
+    f"({best_traced - best:+.2f} us, {best_traced / best - 1:+.1%})"
+  )
+
+  stats = tracing.TraceStats(log_every=10**9)
+  tracer = tracing.TurnTracer(stats, 0.8)
+  for delays in ((0.12, 0.01, 0.35, 0.15, 0.02), (0.2, 0.01, 0.5, 0.2, 0.03)):
+    tracer.mark("vad_stop")
+    for mark, delay in zip(
+      ("transcript", "llm_request", "llm_first_text", "tts_first_audio", "bot_started"),
+      delays,
+    ):
+      await asyncio.sleep(delay)
+      tracer.mark(mark)
+  print(stats.summary())
+
+  started = time.perf_counter()
+  for _ in range(100000):
+    tracer.mark("llm_first_text")
+  print(f"mark(): {(time.perf_counter() - started) / 100000 * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark turn tracing overhead")
+  parser.add_argument("--frames", type=int, default=20000)
+  parser.add_argument("--rounds", type=int, default=5)
+  asyncio.run(main(parser.parse_args()))
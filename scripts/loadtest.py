@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""Load test for the proxy, entirely on localhost.
+
+Starts a stub Pipecat bot that decodes every `frames_pb2.Frame` and echoes its
+audio straight back, then a proxy in front of it. For each concurrency level
+it connects that many simulated MeetingBaas clients, which stream PCM at real
+time. Each frame is stamped with a sequence number so the echo can be matched
+to the send time. Per level it reports round-trip latency percentiles,
+dropped frames, and the proxy's CPU and memory use, and the results are
+written as JSON for comparison across versions.
+
+  poetry run python scripts/loadtest.py --clients 1 10 50 --duration 20
+  poetry run python scripts/loadtest.py --wav meeting.wav -o before.json -- --workers 4
+
+Arguments after `--` are passed to the proxy. The proxy must pass client audio
+through unchanged (the default, where meeting and bot formats match) for the
+sequence stamps to survive the round trip.
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import math
+import os
+import random
+import struct
+import subprocess
+import sys
+import time
+import wave
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import protobufs.frames_pb2 as frames_pb2  # noqa: E402
+import websockets  # noqa: E402
+
+audio = importlib.import_module("meetingbaas-pipecat.proxy.audio")
+
+STAMP = struct.Struct("<II")  # client id, sequence number
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+async def stub_bot(port: int):
+  """A Pipecat stand-in that echoes every audio frame it receives"""
+
+  async def handle(ws):
+    async for message in ws:
+      frame = frames_pb2.Frame()
+      frame.ParseFromString(message)
+      if frame.HasField("audio"):
+        echo = frames_pb2.Frame()
+        echo.audio.audio = frame.audio.audio
+        echo.audio.sample_rate = frame.audio.sample_rate
+        echo.audio.num_channels = frame.audio.num_channels
+        await ws.send(echo.SerializeToString())
+
+  # Unlike pipecat's transport, which accepts a single client, one stub serves
+  # every simulated meeting
+  async with websockets.serve(handle, "127.0.0.1", port, max_size=None):
+    await asyncio.Future()
+
+
+def load_pcm(path: str | None, sample_rate: int) -> bytes:
+  """Mono int16 PCM from a WAV file, or two seconds of a speech-level tone"""
+  if path is None:
+    return b"".join(
+      struct.pack("<h", int(8000 * math.sin(2 * math.pi * 220 * i / sample_rate)))
+      for i in range(sample_rate * 2)
+    )
+  with wave.open(path, "rb") as f:
+    if f.getsampwidth() != 2 or f.getnchannels() != 1:
+      raise SystemExit(f"{path} must be 16-bit mono")
+    if f.getframerate() != sample_rate:
+      raise SystemExit(f"{path} is {f.getframerate()} Hz, expected {sample_rate}")
+    return f.readframes(f.getnframes())
+
+
+class Client:
+  """One simulated meeting, streaming `pcm` in real time and timing the echoes"""
+
+  def __init__(self, id: int, url: str, pcm: bytes, frame_size: int, frame_s: float):
+    self.id = id
+    self.url = url
+    self.pcm = pcm
+    self.frame_size = frame_size
+    self.frame_s = frame_s
+    self.sent: dict[int, float] = {}
+    self.latencies: list[float] = []
+    self.errors = 0
+
+  def frame(self, seq: int) -> bytes:
+    offset = seq * self.frame_size % (len(self.pcm) - self.frame_size)
+    chunk = self.pcm[offset : offset + self.frame_size]
+    return STAMP.pack(self.id, seq) + chunk[STAMP.size :]
+
+  async def run(self, duration: float):
+    try:
+      async with websockets.connect(self.url, max_size=None) as ws:
+        receiver = asyncio.create_task(self._receive(ws))
+        # Spread clients across the frame period like independent meetings
+        await asyncio.sleep(random.random() * self.frame_s)
+        start = time.perf_counter()
+        for seq in range(int(duration / self.frame_s)):
+          delay = start + seq * self.frame_s - time.perf_counter()
+          if delay > 0:
+            await asyncio.sleep(delay)
+          self.sent[seq] = time.perf_counter()
+          await ws.send(self.frame(seq))
+        # Give the last echoes time to arrive
+        await asyncio.sleep(1.0)
+        receiver.cancel()
+    except (OSError, websockets.ConnectionClosed) as e:
+      self.errors += 1
+      print(f"client {self.id}: {e}", file=sys.stderr)
+
+  async def _receive(self, ws):
+    async for message in ws:
+      now = time.perf_counter()
+      # Echoes may come back re-chunked, so only frames starting with a stamp
+      # are timed
+      if len(message) < STAMP.size:
+        continue
+      id, seq = STAMP.unpack_from(message)
+      if id == self.id and seq in self.sent:
+        self.latencies.append(now - self.sent.pop(seq))
+
+
+def _children(pid: int) -> list[int]:
+  """Process ids below `pid`, e.g. the proxy's workers"""
+  pids = []
+  for entry in Path("/proc").iterdir():
+    if entry.name.isdigit():
+      try:
+        stat = (entry / "stat").read_text()
+      except OSError:
+        continue
+      if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+        pids.append(int(entry.name))
+  return [p for child in pids for p in (child, *_children(child))]
+
+
+def process_usage(pid: int) -> tuple[float, int]:
+  """CPU seconds and resident bytes of `pid` and its children (Linux only)"""
+  cpu = 0.0
+  rss = 0
+  for p in (pid, *_children(pid)):
+    try:
+      fields = Path(f"/proc/{p}/stat").read_text().rsplit(")", 1)[1].split()
+    except OSError:
+      continue
+    cpu += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+    rss += int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+  return cpu, rss
+
+
+def percentile(values: list[float], q: float) -> float | None:
+  if not values:
+    return None
+  values = sorted(values)
+  return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+async def run_step(
+  count: int,
+  url: str,
+  pcm: bytes,
+  frame_size: int,
+  frame_s: float,
+  duration: float,
+  proxy_pid: int,
+) -> dict:
+  clients = [Client(i, url, pcm, frame_size, frame_s) for i in range(count)]
+  have_proc = Path(f"/proc/{proxy_pid}/stat").exists()
+  cpu_start, _ = process_usage(proxy_pid) if have_proc else (0.0, 0)
+  wall_start = time.perf_counter()
+
+  peak_rss = 0
+
+  async def sample_memory():
+    nonlocal peak_rss
+    while True:
+      peak_rss = max(peak_rss, process_usage(proxy_pid)[1])
+      await asyncio.sleep(0.5)
+
+  sampler = asyncio.create_task(sample_memory()) if have_proc else None
+  await asyncio.gather(*(client.run(duration) for client in clients))
+  if sampler:
+    sampler.cancel()
+  wall = time.perf_counter() - wall_start
+  cpu_end, _ = process_usage(proxy_pid) if have_proc else (0.0, 0)
+
+  latencies = [latency for client in clients for latency in client.latencies]
+  sent = sum(len(client.latencies) + len(client.sent) for client in clients)
+  received = len(latencies)
+
+  def ms(value):
+    return None if value is None else round(value * 1000, 3)
+
+  return {
+    "clients": count,
+    "duration_s": round(wall, 2),
+    "frames_sent": sent,
+    "frames_received": received,
+    "frames_dropped": sent - received,
+    "drop_ratio": round((sent - received) / sent, 5) if sent else None,
+    "client_errors": sum(client.errors for client in clients),
+    "latency_ms": {
+      "p50": ms(percentile(latencies, 50)),
+      "p95": ms(percentile(latencies, 95)),
+      "p99": ms(percentile(latencies, 99)),
+      "max": ms(max(latencies, default=None)),
+    },
+    "proxy_cpu_percent": round((cpu_end - cpu_start) / wall * 100, 1)
+    if have_proc
+    else None,
+    "proxy_peak_rss_mb": round(peak_rss / 2**20, 1) if have_proc else None,
+  }
+
+
+async def wait_for_port(port: int, timeout: float = 15.0):
+  deadline = time.monotonic() + timeout
+  while True:
+    try:
+      _, writer = await asyncio.open_connection("127.0.0.1", port)
+      writer.close()
+      return
+    except OSError:
+      if time.monotonic() > deadline:
+        raise SystemExit(f"Nothing listening on port {port} after {timeout}s")
+      await asyncio.sleep(0.2)
+
+
+def git_version() -> str | None:
+  try:
+    return subprocess.run(
+      ["git", "describe", "--always", "--dirty"],
+      cwd=ROOT,
+      capture_output=True,
+      text=True,
+      check=True,
+    ).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+async def async_main(args, proxy_args: list[str]):
+  frame_size = audio.frame_bytes(args.sample_rate, 1, args.frame_ms)
+  pcm = load_pcm(args.wav, args.sample_rate)
+  if len(pcm) < 2 * frame_size:
+    raise SystemExit("Not enough audio to stream")
+
+  bot = subprocess.Popen(
+    [sys.executable, __file__, "--stub-bot", str(args.bot_port)], cwd=ROOT
+  )
+  proxy_cmd = [
+    sys.executable,
+    "-c",
+    "import importlib; importlib.import_module('meetingbaas-pipecat.proxy.proxy').start()",
+    "-p",
+    str(args.proxy_port),
+    "--websocket-url",
+    f"ws://127.0.0.1:{args.bot_port}",
+    "--sample-rate",
+    str(args.sample_rate),
+    "--bot-sample-rate",
+    str(args.sample_rate),
+    "--frame-ms",
+    str(args.frame_ms),
+    *proxy_args,
+  ]
+  proxy_log = open(args.proxy_log, "w") if args.proxy_log else subprocess.DEVNULL
+  proxy = subprocess.Popen(proxy_cmd, cwd=ROOT, stdout=proxy_log, stderr=proxy_log)
+  steps = []
+  try:
+    await wait_for_port(args.bot_port)
+    await wait_for_port(args.proxy_port)
+    url = f"ws://127.0.0.1:{args.proxy_port}/"
+    for count in args.clients:
+      print(f"{count} clients for {args.duration}s...", file=sys.stderr)
+      step = await run_step(
+        count,
+        url,
+        pcm,
+        frame_size,
+        args.frame_ms / 1000,
+        args.duration,
+        proxy.pid,
+      )
+      steps.append(step)
+      latency = step["latency_ms"]
+      print(
+        f"  p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms, "
+        f"dropped {step['frames_dropped']}/{step['frames_sent']}, "
+        f"cpu {step['proxy_cpu_percent']}%, rss {step['proxy_peak_rss_mb']} MB",
+        file=sys.stderr,
+      )
+      await asyncio.sleep(args.pause)
+  finally:
+    for process in (proxy, bot):
+      process.terminate()
+    for process in (proxy, bot):
+      try:
+        process.wait(timeout=args.pause + 10)
+      except subprocess.TimeoutExpired:
+        process.kill()
+
+  return {
+    "version": git_version(),
+    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    "config": {
+      "sample_rate": args.sample_rate,
+      "frame_ms": args.frame_ms,
+      "duration_s": args.duration,
+      "wav": args.wav,
+      "proxy_args": proxy_args,
+      "cpus": os.cpu_count(),
+    },
+    "steps": steps,
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(
+    description="Load test the proxy with simulated meetings and a stub bot"
+  )
+  parser.add_argument(
+    "--clients",
+    type=int,
+    nargs="+",
+    default=[1, 10, 25, 50],
+    help="Concurrency levels to run, in order",
+  )
+  parser.add_argument(
+    "--duration", type=float, default=10, help="Seconds to stream at each level"
+  )
+  parser.add_argument(
+    "--pause", type=float, default=2, help="Seconds to wait between levels"
+  )
+  parser.add_argument("--wav", help="16-bit mono WAV to stream instead of a tone")
+  parser.add_argument("--sample-rate", type=int, default=16000)
+  parser.add_argument("--frame-ms", type=int, default=20)
+  parser.add_argument("--proxy-port", type=int, default=18766)
+  parser.add_argument("--bot-port", type=int, default=18765)
+  parser.add_argument("--proxy-log", help="Write the proxy's output to this file")
+  parser.add_argument(
+    "-o", "--output", default="loadtest.json", help="Where to write the results"
+  )
+  parser.add_argument("--stub-bot", type=int, metavar="PORT", help=argparse.SUPPRESS)
+  args, proxy_args = parser.parse_known_args()
+  if proxy_args[:1] == ["--"]:
+    proxy_args = proxy_args[1:]
+
+  if args.stub_bot:
+    try:
+      asyncio.run(stub_bot(args.stub_bot))
+    except KeyboardInterrupt:
+      pass
+    return
+
+  results = asyncio.run(async_main(args, proxy_args))
+  with open(args.output, "w") as f:
+    json.dump(results, f, indent=2)
+  print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,164 @@
+"""PCM helpers between the meeting and the bot, and the silence gate"""
+
+import importlib
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+audio = importlib.import_module("meetingbaas-pipecat.proxy.audio")
+
+
+def tone(rate: int, seconds: float, channels: int = 1, freq: float = 440.0) -> bytes:
+  t = np.arange(int(rate * seconds)) / rate
+  signal = (8000 * np.sin(2 * np.pi * freq * t)).astype("<i2")
+  return np.repeat(signal[:, None], channels, axis=1).tobytes()
+
+
+def split(data: bytes, sizes) -> list[bytes]:
+  """Cut `data` into pieces of the given sizes in turn, the rest in the last"""
+  pieces = []
+  i = 0
+  while i < len(data):
+    size = sizes[len(pieces) % len(sizes)]
+    pieces.append(data[i : i + size])
+    i += size
+  return pieces
+
+
+def as_samples(pcm: bytes) -> np.ndarray:
+  return np.frombuffer(pcm, dtype="<i2").astype(np.int32)
+
+
+@pytest.mark.parametrize(
+  "in_rate, in_channels, out_rate, out_channels",
+  [
+    (48000, 1, 16000, 1),
+    (16000, 1, 48000, 1),
+    (44100, 2, 16000, 1),
+    (16000, 1, 24000, 2),
+  ],
+)
+def test_chunked_conversion_matches_one_pass(
+  in_rate, in_channels, out_rate, out_channels
+):
+  pcm = tone(in_rate, 1.0, in_channels)
+  whole = audio.AudioConverter(in_rate, in_channels, out_rate, out_channels).convert(
+    pcm
+  )
+
+  converter = audio.AudioConverter(in_rate, in_channels, out_rate, out_channels)
+  # Odd sizes that split samples and frames across chunks
+  chunked = b"".join(converter.convert(p) for p in split(pcm, [641, 3, 1920, 777]))
+
+  assert len(chunked) == len(whole)
+  assert np.abs(as_samples(chunked) - as_samples(whole)).max() <= 1
+
+
+@pytest.mark.parametrize(
+  "in_rate, out_rate, chunk_samples",
+  [(48000, 16000, 960), (16000, 48000, 320), (44100, 16000, 441), (16000, 24000, 320)],
+)
+def test_output_length_per_chunk(in_rate, out_rate, chunk_samples):
+  converter = audio.AudioConverter(in_rate, 1, out_rate, 1)
+  pcm = tone(in_rate, 0.5)
+  consumed = produced = 0
+  for piece in split(pcm, [chunk_samples * 2]):
+    out = converter.convert(piece)
+    consumed += len(piece) // 2
+    produced += len(out) // 2
+    # Every output sample whose input is complete, and no more
+    assert produced == -(-consumed * out_rate // in_rate)
+  # Chunks of a whole number of output samples come out the same size
+  if chunk_samples * out_rate % in_rate == 0:
+    out = converter.convert(pcm[: chunk_samples * 2])
+    assert len(out) // 2 == chunk_samples * out_rate // in_rate
+
+
+def test_resampled_tone_keeps_its_level():
+  pcm = tone(48000, 0.5)
+  out = as_samples(audio.AudioConverter(48000, 1, 16000, 1).convert(pcm))
+  # Skip the filter's start-up
+  assert audio.rms(out[200:].astype("<i2").tobytes()) == pytest.approx(
+    8000 / np.sqrt(2), rel=0.05
+  )
+
+
+def test_same_format_passes_through():
+  converter = audio.AudioConverter(16000, 1, 16000, 1)
+  pcm = tone(16000, 0.02)
+  assert converter.convert(pcm) is pcm
+
+
+SPEECH = tone(16000, 0.02)
+QUIET = bytes(640)
+
+
+def gate_run(gate, pattern: str) -> tuple[str, list[int]]:
+  """Feed `pattern` (S speech, . silence) through `gate` and return the kinds
+  and positions of the frames that came out, in order"""
+  out = []
+  for i, kind in enumerate(pattern):
+    # Marked with their position in the last sample
+    frame = (SPEECH if kind == "S" else QUIET)[:-2] + bytes([i, 0])
+    out += gate.process(frame)
+  kinds = "".join("S" if audio.rms(frame) > 100 else "." for frame in out)
+  return kinds, [frame[-2] for frame in out]
+
+
+def test_gate_hangover_keeps_the_end_of_speech():
+  gate = audio.SilenceGate(threshold=300, hangover=3, preroll=0)
+  kinds, indices = gate_run(gate, "SS......S")
+  assert kinds == "SS...S"
+  assert indices == [0, 1, 2, 3, 4, 8]
+
+
+def test_gate_preroll_is_sent_ahead_of_the_onset():
+  gate = audio.SilenceGate(threshold=300, hangover=0, preroll=2)
+  kinds, indices = gate_run(gate, ".....S")
+  assert kinds == "..S"
+  assert indices == [3, 4, 5]
+
+
+def test_gate_keepalive_lets_some_silence_through():
+  gate = audio.SilenceGate(threshold=300, hangover=0, preroll=0, keepalive=4)
+  _, indices = gate_run(gate, "." * 12)
+  assert indices == [3, 7, 11]
+
+
+def test_gate_counts_dropped_frames():
+  gate = audio.SilenceGate(threshold=300, hangover=1, preroll=2)
+  gate_run(gate, "S......S..")
+  # 5 held back after the first hangover frame, 2 of them later sent as
+  # pre-roll, and 1 more after the second
+  assert gate.frames == 10
+  assert gate.dropped == 3 + 1
+  assert gate.drop_ratio == pytest.approx(0.4)
+
+
+def test_gated_frames_reach_the_metrics():
+  metrics = importlib.import_module("meetingbaas-pipecat.proxy.metrics")
+  gate = audio.SilenceGate(threshold=300, hangover=0, preroll=0)
+  gate_run(gate, "S....")
+  queue = SimpleNamespace(depth=0, dropped=0, flushed=0)
+  proxy_metrics = metrics.ProxyMetrics()
+  conn = proxy_metrics.open_connection(
+    "bot_1", queue, queue, SimpleNamespace(reconnects=0), gate
+  )
+  values = {
+    (sample, tuple(sorted(labels.items()))): value
+    for _, _, _, family in proxy_metrics.collect()
+    for sample, labels, value in family
+  }
+  assert values[("proxy_silence_gated_frames_total", ())] == 4
+  route = (("route", "bot_1"),)
+  assert values[("proxy_route_silence_gated_frames_total", route)] == 4
+
+  proxy_metrics.close_connection(conn)
+  gated = [
+    value
+    for name, _, _, family in proxy_metrics.collect()
+    if name == "proxy_route_silence_gated_frames_total"
+    for _, _, value in family
+  ]
+  assert gated == [4]
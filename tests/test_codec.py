@@ -0,0 +1,57 @@
+"""The proxy's fast audio encoder against the generated frames_pb2 code"""
+
+import importlib
+
+import pytest
+
+import protobufs.frames_pb2 as frames_pb2
+
+codec = importlib.import_module("meetingbaas-pipecat.proxy.codec")
+
+SAMPLE_RATES = [0, 1, 127, 128, 8000, 11025, 16000, 22050, 44100, 48000, 2**32 - 1]
+CHANNELS = [0, 1, 2, 8]
+PAYLOAD_SIZES = [0, 1, 2, 100, 127, 128, 320, 640, 1920, 16383, 16384, 100000]
+
+
+def pb2_encode(audio: bytes, sample_rate: int, channels: int) -> bytes:
+  frame = frames_pb2.Frame()
+  frame.audio.audio = audio
+  frame.audio.sample_rate = sample_rate
+  frame.audio.num_channels = channels
+  return frame.SerializeToString()
+
+
+@pytest.mark.parametrize("sample_rate", SAMPLE_RATES)
+@pytest.mark.parametrize("channels", CHANNELS)
+def test_encode_matches_pb2(sample_rate, channels):
+  encoder = codec.AudioFrameEncoder(sample_rate, channels)
+  for size in PAYLOAD_SIZES:
+    audio = bytes(range(256)) * (size // 256) + bytes(size % 256)
+    expected = pb2_encode(audio, sample_rate, channels)
+    for payload in (audio, bytearray(audio), memoryview(audio)):
+      assert encoder.encode(payload) == expected, size
+
+
+def test_encode_empty_audio():
+  encoder = codec.AudioFrameEncoder(16000, 1)
+  data = encoder.encode(b"")
+  assert data == pb2_encode(b"", 16000, 1)
+  assert codec.parse_frame(data).audio.audio == b""
+
+
+def test_header_cache_is_bounded():
+  encoder = codec.AudioFrameEncoder(16000, 1)
+  for size in range(codec._MAX_CACHED_HEADERS * 2):
+    assert encoder.encode(bytes(size)) == pb2_encode(bytes(size), 16000, 1)
+  assert len(encoder._headers) <= codec._MAX_CACHED_HEADERS
+
+
+def test_parse_frame_reads_encoded_audio():
+  audio = bytes(range(256)) * 2
+  data = codec.AudioFrameEncoder(16000, 1).encode(audio)
+  for message in (data, bytearray(data), memoryview(data)):
+    frame = codec.parse_frame(message)
+    assert frame.WhichOneof("frame") == "audio"
+    assert frame.audio.audio == audio
+    assert frame.audio.sample_rate == 16000
+    assert frame.audio.num_channels == 1
@@ -0,0 +1,53 @@
+"""What the context compactor keeps, without a client to summarize with"""
+
+import importlib
+
+import pytest
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
+
+context = importlib.import_module("meetingbaas-pipecat.bot.context")
+
+pytestmark = pytest.mark.asyncio
+
+PROMPT = {"role": "system", "content": "You are a helpful assistant."}
+INTRODUCE = {"role": "system", "content": "Please introduce yourself to the user."}
+
+
+def turns(count: int) -> list[dict]:
+  messages = []
+  for i in range(count):
+    messages.append({"role": "user", "content": f"Question {i} " + "word " * 50})
+    messages.append({"role": "assistant", "content": f"Answer {i} " + "word " * 50})
+  return messages
+
+
+async def compact(messages: list[dict]) -> list[dict]:
+  llm_context = OpenAILLMContext(messages)
+  compactor = context.ContextCompactor(llm_context, budget=500, recent=200)
+  await compactor.compact()
+  return llm_context.get_messages()
+
+
+async def test_only_the_prompt_is_pinned():
+  compacted = await compact([PROMPT, INTRODUCE] + turns(10))
+  assert compacted[0] == PROMPT
+  assert INTRODUCE not in compacted
+  assert compacted[-1]["content"].startswith("Answer 9")
+  assert sum(context.count_tokens(m) for m in compacted) <= 500
+
+
+async def test_repeated_instructions_are_dropped_from_the_compacted_context():
+  user = {"role": "user", "content": "Hello?"}
+  assistant = {"role": "assistant", "content": "Hi, I'm the assistant."}
+  messages = [PROMPT] + turns(10) + [user, INTRODUCE, INTRODUCE, assistant]
+  compacted = await compact(messages)
+  assert compacted[0] == PROMPT
+  assert compacted[-3:] == [user, INTRODUCE, assistant]
+  assert compacted.count(INTRODUCE) == 1
+
+
+async def test_within_budget_the_context_is_left_alone():
+  messages = [PROMPT, INTRODUCE] + turns(1) + [INTRODUCE]
+  compacted = await compact(messages)
+  # Not even deduped, which would change the list the aggregators hold
+  assert compacted == [PROMPT, INTRODUCE] + turns(1) + [INTRODUCE]
@@ -0,0 +1,53 @@
+"""Proxy metrics stay bounded as meetings come and go"""
+
+import importlib
+from types import SimpleNamespace
+
+metrics = importlib.import_module("meetingbaas-pipecat.proxy.metrics")
+
+
+def open_connection(proxy_metrics, route):
+  queue = SimpleNamespace(depth=1, dropped=2, flushed=0)
+  upstream = SimpleNamespace(reconnects=1)
+  conn = proxy_metrics.open_connection(route, queue, queue, upstream)
+  conn.sent("inbound", 320)
+  return conn
+
+
+def samples(proxy_metrics):
+  return {
+    (sample, tuple(sorted(labels.items()))): value
+    for _, _, _, family in proxy_metrics.collect()
+    for sample, labels, value in family
+  }
+
+
+def test_series_do_not_grow_with_connections():
+  proxy_metrics = metrics.ProxyMetrics()
+  for _ in range(3):
+    proxy_metrics.close_connection(open_connection(proxy_metrics, "bot_1"))
+  before = samples(proxy_metrics)
+  for _ in range(100):
+    proxy_metrics.close_connection(open_connection(proxy_metrics, "bot_1"))
+  after = samples(proxy_metrics)
+
+  assert before.keys() == after.keys()
+  assert not any("connection" in dict(labels) for _, labels in after)
+
+
+def test_route_counters_keep_finished_connections():
+  proxy_metrics = metrics.ProxyMetrics()
+  proxy_metrics.close_connection(open_connection(proxy_metrics, "bot_1"))
+  open_connection(proxy_metrics, "bot_1")
+  open_connection(proxy_metrics, "bot_2")
+  values = samples(proxy_metrics)
+
+  route = (("direction", "inbound"), ("route", "bot_1"))
+  assert values[("proxy_route_frames_total", route)] == 2
+  assert values[("proxy_route_bytes_total", route)] == 640
+  assert values[("proxy_route_dropped_frames_total", route)] == 4
+  assert values[("proxy_route_queue_depth", route)] == 1
+  assert values[("proxy_route_active_connections", (("route", "bot_1"),))] == 1
+  assert values[("proxy_route_connections_total", (("route", "bot_1"),))] == 2
+  assert values[("proxy_frames_total", (("direction", "inbound"),))] == 3
+  assert values[("proxy_upstream_reconnects_total", ())] == 3
@@ -0,0 +1,25 @@
+"""Control messages shared by the bot and the proxy"""
+
+import importlib
+
+import protobufs.frames_pb2 as frames_pb2
+
+codec = importlib.import_module("meetingbaas-pipecat.proxy.codec")
+protocol = importlib.import_module("meetingbaas-pipecat.protocol")
+
+
+def test_interruption_frame():
+  data = protocol.encode_interruption()
+  frame = frames_pb2.Frame()
+  frame.ParseFromString(data)
+  assert frame.WhichOneof("frame") == "text"
+  assert frame.text.name == protocol.INTERRUPTION_NAME
+  assert frame.text.text == ""
+  assert protocol.is_interruption(codec.parse_frame(data))
+
+
+def test_text_frames_are_not_interruptions():
+  data = frames_pb2.Frame(text={"name": "TextFrame", "text": "hi"}).SerializeToString()
+  assert not protocol.is_interruption(codec.parse_frame(data))
+  audio = codec.AudioFrameEncoder(16000, 1).encode(b"pcm")
+  assert not protocol.is_interruption(codec.parse_frame(audio))
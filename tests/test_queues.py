@@ -0,0 +1,140 @@
+"""The proxy's bounded audio queues and re-chunking"""
+
+import asyncio
+import importlib
+
+import numpy as np
+import pytest
+
+queues = importlib.import_module("meetingbaas-pipecat.proxy.queues")
+
+SILENT = bytes(640)
+
+
+def loud(n: int) -> bytes:
+  """A 20 ms frame well above the silence threshold, told apart by `n`"""
+  return np.full(320, 10000 + n, dtype="<i2").tobytes()
+
+
+def drain(queue) -> list:
+  return [queue._frames.popleft()[0] for _ in range(queue.depth)]
+
+
+def test_drop_oldest():
+  queue = queues.AudioQueue("test", 3, queues.OverflowPolicy.DROP_OLDEST)
+  for n in range(5):
+    queue.put(loud(n))
+  assert drain(queue) == [loud(2), loud(3), loud(4)]
+  assert queue.stats() == {
+    "depth": 0,
+    "max_depth": 3,
+    "enqueued": 5,
+    "dropped": 2,
+    "dropped_silence": 0,
+    "flushed": 0,
+  }
+
+
+def test_drop_silence_drops_the_oldest_silent_frame():
+  queue = queues.AudioQueue("test", 3, queues.OverflowPolicy.DROP_SILENCE)
+  for frame in (loud(0), SILENT, loud(1), loud(2)):
+    queue.put(frame)
+  assert drain(queue) == [loud(0), loud(1), loud(2)]
+  assert queue.dropped == queue.dropped_silence == 1
+
+
+def test_drop_silence_falls_back_to_the_oldest_frame():
+  queue = queues.AudioQueue("test", 2, queues.OverflowPolicy.DROP_SILENCE)
+  for n in range(3):
+    queue.put(loud(n))
+  assert drain(queue) == [loud(1), loud(2)]
+  assert queue.dropped == 1
+  assert queue.dropped_silence == 0
+
+
+def test_disconnect_raises_when_full():
+  queue = queues.AudioQueue("test", 2, queues.OverflowPolicy.DISCONNECT)
+  queue.put(loud(0))
+  queue.put(loud(1))
+  with pytest.raises(queues.AudioQueueOverflow):
+    queue.put(loud(2))
+  assert drain(queue) == [loud(0), loud(1)]
+  assert queue.dropped == 0
+
+
+def test_clear_counts_flushed_frames():
+  queue = queues.AudioQueue("test", 4)
+  for n in range(3):
+    queue.put(loud(n))
+  assert queue.clear() == 3
+  assert queue.depth == 0
+  assert queue.flushed == 3
+
+
+@pytest.mark.asyncio
+async def test_get_waits_for_a_frame():
+  queue = queues.AudioQueue("test", 2)
+  getter = asyncio.create_task(queue.get())
+  await asyncio.sleep(0)
+  assert not getter.done()
+  queue.put(loud(0))
+  assert await asyncio.wait_for(getter, 1) == loud(0)
+
+
+@pytest.mark.asyncio
+async def test_put_wait_waits_for_room_instead_of_dropping():
+  queue = queues.AudioQueue("test", 2, queues.OverflowPolicy.DROP_OLDEST)
+  await queue.put_wait(loud(0))
+  await queue.put_wait(loud(1))
+  putter = asyncio.create_task(queue.put_wait(loud(2)))
+  await asyncio.sleep(0.01)
+  assert not putter.done()
+
+  assert await queue.get() == loud(0)
+  await asyncio.wait_for(putter, 1)
+  assert [await queue.get() for _ in range(2)] == [loud(1), loud(2)]
+  assert queue.dropped == 0
+
+
+@pytest.mark.asyncio
+async def test_put_wait_resumes_after_clear():
+  queue = queues.AudioQueue("test", 1)
+  queue.put(loud(0))
+  putter = asyncio.create_task(queue.put_wait(loud(1)))
+  await asyncio.sleep(0.01)
+  assert not putter.done()
+  queue.clear()
+  await asyncio.wait_for(putter, 1)
+  assert await queue.get() == loud(1)
+
+
+def test_chunker_passes_frames_of_the_right_size_through():
+  chunker = queues.AudioChunker(4)
+  assert chunker.push(b"abcd") == [b"abcd"]
+  assert chunker.push(memoryview(b"efgh")) == [b"efgh"]
+
+
+def test_chunker_splits_and_joins():
+  chunker = queues.AudioChunker(4)
+  assert chunker.push(b"abcdefghij") == [b"abcd", b"efgh"]
+  assert chunker.push(b"k") == []
+  assert chunker.push(b"lmnop") == [b"ijkl", b"mnop"]
+  assert chunker.push(b"") == []
+
+
+def test_chunker_keeps_every_byte_in_order():
+  chunker = queues.AudioChunker(320)
+  data = bytes(range(256)) * 40
+  out = []
+  for size in (100, 320, 640, 1, 999, 7, 320, 3000):
+    piece, data = data[:size], data[size:]
+    out += chunker.push(piece)
+  assert all(len(frame) == 320 for frame in out)
+  assert b"".join(out) == (bytes(range(256)) * 40)[: len(out) * 320]
+
+
+def test_chunker_clear_drops_the_partial_frame():
+  chunker = queues.AudioChunker(4)
+  assert chunker.push(b"ab") == []
+  chunker.clear()
+  assert chunker.push(b"cdef") == [b"cdef"]
@@ -0,0 +1,89 @@
+"""Picking a bot backend for an incoming MeetingBaas connection"""
+
+import importlib
+import json
+
+import pytest
+
+routing = importlib.import_module("meetingbaas-pipecat.proxy.routing")
+
+DEFAULT = "ws://localhost:8765"
+ROUTES = {"bot_1": "ws://localhost:9001", "bot_2": "ws://localhost:9002"}
+
+
+def test_route_key():
+  assert routing.route_key("/bot_1") == "bot_1"
+  assert routing.route_key("/bot_1/") == "bot_1"
+  assert routing.route_key("/?bot=bot_2") == "bot_2"
+  # The query token wins over the path
+  assert routing.route_key("/bot_1?bot=bot_2") == "bot_2"
+  assert routing.route_key("/?room=bot_2", query_param="room") == "bot_2"
+  assert routing.route_key("/") is None
+  assert routing.route_key("/?bot=") is None
+
+
+def test_parse_route():
+  assert routing.parse_route("bot_1=ws://localhost:9001") == (
+    "bot_1",
+    "ws://localhost:9001",
+  )
+  assert routing.parse_route("/bot_1/=ws://h:1/?a=b") == ("bot_1", "ws://h:1/?a=b")
+  for value in ("bot_1", "=ws://localhost:9001", "bot_1="):
+    with pytest.raises(ValueError):
+      routing.parse_route(value)
+
+
+def test_load_routes_file(tmp_path):
+  path = tmp_path / "routes.json"
+  path.write_text(json.dumps({"/bot_1": ROUTES["bot_1"], "bot_2/": ROUTES["bot_2"]}))
+  assert routing.load_routes_file(str(path)) == ROUTES
+
+  for content in (["bot_1"], {"bot_1": 9001}):
+    path.write_text(json.dumps(content))
+    with pytest.raises(ValueError):
+      routing.load_routes_file(str(path))
+
+
+@pytest.mark.asyncio
+async def test_default_route():
+  router = routing.Router(ROUTES, default_url=DEFAULT)
+  assert await router.resolve("/") == DEFAULT
+  assert await router.resolve("/bot_1") == ROUTES["bot_1"]
+  assert await router.resolve("/?bot=bot_2") == ROUTES["bot_2"]
+
+
+@pytest.mark.asyncio
+async def test_unknown_route_is_rejected():
+  router = routing.Router(ROUTES, default_url=DEFAULT)
+  assert await router.resolve("/bot_3") is None
+  assert await router.resolve("/?bot=bot_3") is None
+
+
+@pytest.mark.asyncio
+async def test_no_route_table_sends_everything_to_the_default():
+  router = routing.Router(default_url=DEFAULT)
+  for path in ("/", "/bot_3", "/?bot=bot_3"):
+    assert await router.resolve(path) == DEFAULT
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("awaitable", [False, True])
+async def test_resolver(awaitable):
+  def lookup(path):
+    return "ws://resolved:1" if "dynamic" in path else None
+
+  async def lookup_async(path):
+    return lookup(path)
+
+  router = routing.Router(
+    ROUTES, default_url=DEFAULT, resolver=lookup_async if awaitable else lookup
+  )
+  assert await router.resolve("/dynamic") == "ws://resolved:1"
+  # A resolver that returns None defers to the table
+  assert await router.resolve("/bot_1") == ROUTES["bot_1"]
+  assert await router.resolve("/bot_3") is None
+
+  # With only a resolver, names it doesn't know are still rejected
+  router = routing.Router(default_url=DEFAULT, resolver=lookup)
+  assert await router.resolve("/bot_1") is None
+  assert await router.resolve("/") == DEFAULT
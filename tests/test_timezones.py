@@ -0,0 +1,58 @@
+"""Resolving what the user said to an IANA time zone"""
+
+import importlib
+
+import pytest
+
+timezones = importlib.import_module("meetingbaas-pipecat.bot.timezones")
+
+
+@pytest.mark.parametrize(
+  "location, zone",
+  [
+    ("Mumbai", "Asia/Kolkata"),
+    ("new york", "America/New_York"),
+    ("Tokyo, Japan", "Asia/Tokyo"),
+    ("PST", "America/Los_Angeles"),
+    ("Asia/Kolkata", "Asia/Kolkata"),
+    ("São Paulo", "America/Sao_Paulo"),
+    ("Austin Texas", "America/Chicago"),
+    ("Los Ang", "America/Los_Angeles"),
+    ("Tokoy", "Asia/Tokyo"),
+  ],
+)
+def test_resolve(location, zone):
+  assert timezones.resolve_timezone(location) == zone
+
+
+@pytest.mark.parametrize(
+  "location, zone",
+  [
+    # Once mistaken for the countries Canada, Israel and Gabon
+    ("Fresno, CA", "America/Los_Angeles"),
+    ("Cupertino, CA", "America/Los_Angeles"),
+    ("Springfield, IL", "America/Chicago"),
+    ("Columbus, GA", "America/New_York"),
+    # A city known to be in the country with that code
+    ("Toronto, CA", "America/Toronto"),
+    ("Tokyo, JP", "Asia/Tokyo"),
+    ("Berlin, DE", "Europe/Berlin"),
+    # The state over a namesake elsewhere
+    ("Paris, TX", "America/Chicago"),
+    ("Portland, ME", "America/New_York"),
+    ("London, ON", "America/Toronto"),
+    # States that span zones, or share their code, need a known city
+    ("Seattle, WA", "America/Los_Angeles"),
+    ("Perth, WA", "Australia/Perth"),
+    ("Nashville, TN", "America/Chicago"),
+  ],
+)
+def test_resolve_region_code(location, zone):
+  assert timezones.resolve_timezone(location) == zone
+
+
+@pytest.mark.parametrize(
+  "location", ["Spokane, WA", "Knoxville, TN", "Somewhere, ZZ", "CA", "IL", ""]
+)
+def test_unresolved(location):
+  assert timezones.resolve_timezone(location) is None
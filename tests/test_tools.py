@@ -0,0 +1,126 @@
+"""The tool runtime's cache and single-flight against a local weather server"""
+
+import asyncio
+import importlib
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+tools = importlib.import_module("meetingbaas-pipecat.bot.tools")
+
+pytestmark = pytest.mark.asyncio
+
+PARIS = {"location": "Paris", "format": "celsius"}
+
+
+@pytest_asyncio.fixture
+async def weather_server(monkeypatch):
+  """A stand-in for wttr.in that records the paths it was asked for.
+
+  `/slow` answers after the tool's timeout and `/nowhere` with an error.
+  """
+  requests = []
+
+  async def weather(request: web.Request) -> web.Response:
+    requests.append(request.path)
+    location = request.match_info["location"]
+    if location == "slow":
+      await asyncio.sleep(tools.runtime.tools["get_weather"].timeout * 2)
+    if location == "nowhere":
+      return web.Response(status=404, text="Unknown location")
+    await asyncio.sleep(0.05)
+    return web.Response(text="+70°F Sunny" if "u" in request.query else "+21°C Sunny")
+
+  app = web.Application()
+  app.router.add_get("/{location}", weather)
+  server = TestServer(app)
+  await server.start_server()
+  monkeypatch.setenv("WEATHER_API_URL", str(server.make_url("")).rstrip("/"))
+  yield requests
+  await server.close()
+
+
+@pytest_asyncio.fixture
+async def runtime():
+  """A runtime with the bot's tools and an empty cache"""
+  runtime = tools.ToolRuntime()
+  runtime.tools = dict(tools.runtime.tools)
+  yield runtime
+  await runtime.close()
+
+
+async def test_miss_then_hit(weather_server, runtime):
+  first = await runtime.call("get_weather", PARIS)
+  assert first == "The weather in paris is currently +21°C Sunny (Celsius)."
+  assert await runtime.call("get_weather", PARIS) == first
+  assert weather_server == ["/paris"]
+  assert runtime.stats() == {"calls": 2, "cache_hits": 1, "coalesced": 0, "cached": 1}
+
+
+async def test_spellings_share_an_entry(weather_server, runtime):
+  await runtime.call("get_weather", PARIS)
+  await runtime.call("get_weather", {"location": " paris ", "format": "Celsius"})
+  assert weather_server == ["/paris"]
+  assert runtime.hits == 1
+
+
+async def test_handler_sees_the_normalized_arguments(weather_server, runtime):
+  # Whichever spelling runs first, both get the answer in the unit they asked for
+  first = await runtime.call("get_weather", {"location": "Paris", "format": "Celsius"})
+  second = await runtime.call("get_weather", PARIS)
+  assert first == second
+  assert "+21°C" in first
+  assert runtime.hits == 1
+
+
+async def test_concurrent_calls_share_a_request(weather_server, runtime):
+  results = await asyncio.gather(
+    *(runtime.call("get_weather", PARIS) for _ in range(20))
+  )
+  assert len(set(results)) == 1
+  assert weather_server == ["/paris"]
+  assert runtime.coalesced == 19
+
+
+async def test_entries_expire(weather_server, runtime):
+  tool = runtime.tools["get_weather"]
+  runtime.tools["get_weather"] = tools.Tool(
+    tool.name, tool.handler, tool.schema, tool.timeout, ttl=0.1
+  )
+  await runtime.call("get_weather", PARIS)
+  await runtime.call("get_weather", PARIS)
+  await asyncio.sleep(0.15)
+  await runtime.call("get_weather", PARIS)
+  assert weather_server == ["/paris", "/paris"]
+  assert runtime.hits == 1
+
+
+async def test_errors_are_not_cached(weather_server, runtime):
+  arguments = {"location": "nowhere", "format": "celsius"}
+  for _ in range(2):
+    result = await runtime.call("get_weather", arguments)
+    assert result == "Failed to fetch the weather data for nowhere."
+  assert weather_server == ["/nowhere", "/nowhere"]
+  assert len(runtime.cache) == 0
+
+
+async def test_timeouts_are_not_cached(weather_server, runtime):
+  tool = runtime.tools["get_weather"]
+  runtime.tools["get_weather"] = tools.Tool(
+    tool.name, tool.handler, tool.schema, timeout=0.2, ttl=tool.ttl
+  )
+  arguments = {"location": "slow", "format": "celsius"}
+  result = await runtime.call("get_weather", arguments)
+  assert result == "Sorry, get weather took too long to respond."
+  assert len(runtime.cache) == 0
+
+
+async def test_missed_deadline_still_caches(weather_server, runtime):
+  result = await runtime.call("get_weather", PARIS, deadline=0.01)
+  assert result == "Sorry, get weather took too long to respond."
+  await asyncio.sleep(0.1)
+  assert len(runtime.cache) == 1
+  await runtime.call("get_weather", PARIS)
+  assert weather_server == ["/paris"]
@@ -0,0 +1,156 @@
+"""Reconnecting to a bot and replaying recent audio when its connection drops"""
+
+import asyncio
+import importlib
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+import websockets
+
+upstream = importlib.import_module("meetingbaas-pipecat.proxy.upstream")
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeBot:
+  """A websocket server recording what each connection received"""
+
+  def __init__(self):
+    self.connections: list[list[bytes]] = []
+    self.sockets = []
+    self.server = None
+    self.port = None
+
+  async def start(self, port: int = 0):
+    self.server = await websockets.serve(self._handle, "127.0.0.1", port)
+    self.port = self.server.sockets[0].getsockname()[1]
+
+  async def stop(self):
+    self.server.close()
+    await self.server.wait_closed()
+
+  async def _handle(self, websocket):
+    received = []
+    self.connections.append(received)
+    self.sockets.append(websocket)
+    async for message in websocket:
+      received.append(message)
+
+  @property
+  def url(self) -> str:
+    return f"ws://127.0.0.1:{self.port}"
+
+  async def wait_for(self, connections: int, messages: int):
+    """Until the `connections`-th connection has received `messages` messages"""
+    while len(self.connections) < connections or (
+      len(self.connections[connections - 1]) < messages
+    ):
+      await asyncio.sleep(0.01)
+
+
+@pytest_asyncio.fixture
+async def bot():
+  bot = FakeBot()
+  await bot.start()
+  yield bot
+  await bot.stop()
+
+
+@pytest_asyncio.fixture
+async def sleeps(monkeypatch):
+  """Backoff delays asked for by the upstream, which only wait a hundredth
+  as long"""
+  delays = []
+  sleep = asyncio.sleep
+
+  async def fake_sleep(delay, *args):
+    delays.append(delay)
+    await sleep(delay / 100)
+
+  monkeypatch.setattr(
+    upstream, "asyncio", SimpleNamespace(**{**vars(asyncio), "sleep": fake_sleep})
+  )
+  return delays
+
+
+async def open_upstream(bot, **kwargs) -> "upstream.Upstream":
+  conn = upstream.Upstream(bot.url, upstream.UpstreamPool(0), **kwargs)
+  await conn.open()
+  return conn
+
+
+async def test_send_reconnects_and_replays_recent_audio(bot, sleeps):
+  conn = await open_upstream(bot, replay_size=3)
+  for n in range(5):
+    await conn.send(bytes([n]))
+  await bot.wait_for(1, 5)
+
+  await bot.sockets[0].close()
+  await asyncio.sleep(0.05)
+  await conn.send(b"after")
+  await bot.wait_for(2, 4)
+
+  # The last `replay_size` messages, then the one that found the socket closed
+  assert bot.connections[1] == [b"\x02", b"\x03", b"\x04", b"after"]
+  assert conn.reconnects == 1
+  assert sleeps == [0.25]
+  await conn.close()
+
+
+async def test_messages_continue_across_a_reconnect(bot, sleeps):
+  conn = await open_upstream(bot)
+  messages = conn.messages()
+
+  await bot.wait_for(1, 0)
+  await bot.sockets[0].send(b"before")
+  assert await asyncio.wait_for(messages.__anext__(), 1) == b"before"
+
+  await bot.sockets[0].close()
+  reading = asyncio.create_task(messages.__anext__())
+  await bot.wait_for(2, 0)
+  await bot.sockets[1].send(b"after")
+  assert await asyncio.wait_for(reading, 1) == b"after"
+  assert conn.reconnects == 1
+  await messages.aclose()
+  await conn.close()
+
+
+async def test_reconnect_backs_off_until_the_bot_is_back(bot, sleeps):
+  conn = await open_upstream(bot, max_attempts=6)
+  await conn.send(b"hello")
+  await bot.wait_for(1, 1)
+  port = bot.port
+  await bot.stop()
+
+  async def restart_during_the_third_backoff():
+    while len(sleeps) < 3:
+      await asyncio.sleep(0.001)
+    await bot.start(port)
+
+  restart = asyncio.create_task(restart_during_the_third_backoff())
+  await conn.send(b"again")
+  await restart
+  await bot.wait_for(2, 2)
+
+  assert bot.connections[1] == [b"hello", b"again"]
+  assert sleeps == [0.25, 0.5, 1.0]
+  assert conn.reconnects == 1
+  await conn.close()
+
+
+async def test_gives_up_after_max_attempts(bot, sleeps):
+  conn = await open_upstream(bot, max_attempts=4, backoff_max=0.6)
+  await conn.send(b"hello")
+  await bot.stop()
+
+  with pytest.raises(upstream.UpstreamUnavailable):
+    await conn.send(b"again")
+  # Doubling from backoff_base, capped at backoff_max
+  assert sleeps == [0.25, 0.5, 0.6, 0.6]
+  # Later calls fail at once instead of trying again
+  with pytest.raises(upstream.UpstreamUnavailable):
+    async for _ in conn.messages():
+      pass
+  assert len(sleeps) == 4
+  assert conn.reconnects == 0
@@ -0,0 +1,86 @@
+"""Batched Silero inference gives every session the same result as running alone"""
+
+import importlib
+import threading
+
+import numpy as np
+import pytest
+
+vad = importlib.import_module("meetingbaas-pipecat.bot.vad")
+
+CHUNK = 512  # samples Silero takes at 16 kHz
+CHUNKS = 40
+
+
+def stream(seed: int) -> list[bytes]:
+  """Voiced-sounding bursts between pauses, different for every seed"""
+  rng = np.random.default_rng(seed)
+  t = np.arange(CHUNK * CHUNKS) / 16000
+  pitch = 100 + 40 * seed
+  voiced = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 8))
+  envelope = (np.sin(2 * np.pi * (0.8 + 0.3 * seed) * t) > 0).astype(float)
+  signal = 0.3 * voiced * envelope + 0.01 * rng.standard_normal(len(t))
+  pcm = (np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes()
+  return [pcm[i : i + CHUNK * 2] for i in range(0, len(pcm), CHUNK * 2)]
+
+
+def confidence(analyzer, chunk: bytes) -> float:
+  # A one-element array, straight from the model's output
+  return np.asarray(analyzer.voice_confidence(chunk)).item()
+
+
+def confidences(analyzer, chunks: list[bytes]) -> list[float]:
+  return [confidence(analyzer, chunk) for chunk in chunks]
+
+
+@pytest.fixture(scope="module")
+def streams():
+  return [stream(seed) for seed in range(4)]
+
+
+@pytest.fixture(scope="module")
+def unbatched(streams):
+  """Each stream through its own analyzer, one after the other"""
+  return [confidences(vad.SharedSileroVADAnalyzer(), chunks) for chunks in streams]
+
+
+def test_streams_differ(unbatched):
+  # Otherwise mixing up the streams' states would go unnoticed below
+  for a, b in zip(unbatched, unbatched[1:]):
+    assert np.abs(np.subtract(a, b)).max() > 0.1
+
+
+def test_batched_matches_unbatched(streams, unbatched):
+  batcher = vad.VADBatcher(vad.silero_session(), window_ms=20, max_batch=8)
+  results = [None] * len(streams)
+  # Run in lockstep so each batch holds a chunk of every stream
+  barrier = threading.Barrier(len(streams))
+
+  def run(i: int):
+    analyzer = vad.SharedSileroVADAnalyzer(batcher=batcher)
+    out = []
+    for chunk in streams[i]:
+      barrier.wait()
+      out.append(confidence(analyzer, chunk))
+    results[i] = out
+
+  threads = [threading.Thread(target=run, args=(i,)) for i in range(len(streams))]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  assert batcher.stats()["mean_batch"] > 1
+  for batched, alone in zip(results, unbatched):
+    np.testing.assert_allclose(batched, alone, atol=1e-4)
+
+
+def test_interleaved_unbatched_sessions_keep_their_state(streams, unbatched):
+  """Several analyzers on the one shared session, taking turns chunk by chunk"""
+  analyzers = [vad.SharedSileroVADAnalyzer() for _ in streams]
+  results = [[] for _ in streams]
+  for n in range(CHUNKS):
+    for i, analyzer in enumerate(analyzers):
+      results[i].append(confidence(analyzer, streams[i][n]))
+  for interleaved, alone in zip(results, unbatched):
+    np.testing.assert_allclose(interleaved, alone, atol=1e-6)